@@ -1,603 +1,281 @@
-import turtle
-import time
-import math
-import random
-
-#
-#  Shapes & Info --------------------------------------------------------------------
-#
-
-SPACESHIP_SPRITE_INFO = {'coordinates': [ ( (7,-20), (0,5), (-7,-20) ),
-                                         ], 'name': 'SPACESHIP_SHAPE'}
-
-SPACESHIP_ACCELERATE_SPRITE_INFO = {'coordinates': [ ( (7,-20), (0,5), (-7,-20) ),
-                                                     ( (7,-20), (0,-30), (-7,-20) ) ],
-                                    'name': 'SPACESHIP_ACCELERATION_SHAPE'}
-
-SPACESHIP_FLICKER_INFO = {'coordinates': [ () ],
-                          'name': 'SPACESHIP_FLICKER_SHAPE'}
-
-BULLET_SPRITE_INFO = {'coordinates': [ ((-1, -1), (-1, 1), (1, 1), (1, -1)) ],
-                      'name': 'BULLET_SHAPE'}
-
-ASTEROID_INFO = { 'speeds' : [None, 30, 50, 70],
-                  'radii': [None, 15, 30, 45],
-                  'turtle_sizes': [None, 1.5, 3.0, 4.5], 
-                  'points': [None, 50, 25, 10]}
-
-#
-#  Class / Struct definitions -------------------------------------------------
-#
-
-#
-#  Classes are useful ways to store similar data together
-#     Anything in the class can be accessed with a dot operator
-#     For example the vec2 (vector in 2 dimensions) class simply stores an X and a Y component
-#     so if we have a vec2 named direction, we could access just the x component with direction.x
-#     And we can create a new vec2 with the initialization function
-#         eg: direction = vec2(1.5, 3.0)
-#         This will call the __init__ function inside vec2,
-#         and direction will now store a vector with an x component of 1.5 and a y component of 3.0
-#     vec2 is also a special case where we can use the __add__ function.
-#     This will make it so if we have two vec2s and we use the + operator it will call our __add__
-#         eg: first =  vec2(1.0, 2.0)
-#             second = vec2(3.0, 4.0)
-#             first + second would return a new vec2 [4.0, 6.0] (because it adds the components)
-#     Similar idea with the __mul__ for multiply
-#
-#  There are other ways we could store vector2s,
-#    For example we could use an array [x,y], and assume the first index is x, and second is y
-#    Or a dictionary: {'x': 0.0, 'y': 0.0} and access it with ['x']
-#  Are there any pros and cons of each of these?
-
-class vec2:
-    x: float
-    y: float
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-    def __add__(self, vec):
-        x = self.x + vec.x
-        y = self.y + vec.y
-        return vec2(x,y)
-    def __mul__(self, scalar):
-        x = self.x * scalar
-        y = self.y * scalar
-        return vec2(x,y)
-
-#
-#   This is an "Entity" class which acts as our base class
-#   This means that anything that inherits this will have all the fields in an entity
-#   We'll see how this is useful when we see the other classes below
-#
-
-class Entity:
-    position: vec2 # Technically not required, but I like putting these here to show that each entity will have a position, velocity and radius
-    velocity: vec2
-    radius: float
-    def __init__(self, position, velocity, radius):
-        self.position = position
-        self.velocity = velocity
-        self.turtle = turtle.Turtle()
-        self.turtle.penup()
-        self.turtle.speed(0)
-        self.radius = radius
-
-#
-#   Here we have a class for the Player.
-#   The player inherits the Entity class (because it has it in the brackets)
-#   Which means that in addition to the fields we put in here, it will also have the fields
-#     inside of Entity. This saves a bunch of copied code and typing!
-#   
-
-class Player(Entity):
-    health: int
-    rotation: float
-    def __init__(self,health, position, velocity):
-        super().__init__(position, velocity, 20.0 ) # do the superclass's (Entity) initializer, ie: set position, velocity, turtle...
-        self.health = health
-        self.rotation = 0.0
-        self.ROTATION_SPEED = 50
-        self.ACCELERATION_SPEED = 20
-        self.invincibility_frames = 0
-        
-class Asteroid(Entity):
-    health: int
-    shape: int
-    active: bool
-    
-    def __init__(self,health, position, velocity, info):
-        super().__init__(position, velocity, (health * 10) * 1.5)
-        self.health = health
-        self.turtle.shape('circle')
-        self.turtle.shapesize(health * 1.5, health * 1.5)
-        self.turtle.color('white')
-        self.turtle.penup()
-        self.turtle.fillcolor('black')
-        self.active = True
-
-    # This is where classes really shine
-    # If we have a variable asteroid we can deactivate that specific asteroid by
-    # calling deactivate on it
-    #  eg:
-    #      a = Asteroid(...)
-    #      a.deactivate() (the self gets filled in automatically!)
-    #
-    # These are called class methods, which means these functions only really affect
-    #  this SPECIFIC asteroid. If we have two asteroids A and B, and we call A.deactivate(). B will
-    #  still be activated and moving around
-    #
-    # Can you think of other class functions we could move into here?
-    # One could be a split function for when we shoot it
-    #
-    # What about class functions for the player?
-    
-    def deactivate(self): 
-        self.turtle.ht()
-        self.active = False
-
-class Bullet(Entity):
-    active: bool
-    def __init__(self, position):
-        super().__init__(position, vec2(0.0, 0.0), 2)
-        self.turtle.shape(BULLET_SPRITE_INFO['name'])
-        self.active = False
-    def deactivate(self):
-        self.turtle.ht()
-        self.active = False
-        
-#
-#  Globals --------------------------------------------------------
-#
-
-# I'm putting these variables in a GlobalTimeInfo class so it is cleaner when I use them
-# globally. This way I'll have only one global TimeInfo statement later on than a bunch.
-# 
-
-class GlobalTimeInfo:
-    def __init__(self):
-        self.delta_time = 0.0 # time since the last window update
-        self.stop_watch = time.time()
-        self.MS_PER_FRAME = 1 / 60 # How often the screen is refreshed in milliseconds
-
-class GlobalScoreInfo:
-    def __init__(self):
-        self.current_score = 0
-        self.high_score = 0
-
-main_player = None
-
-# An array to store all the asteroids
-asteroid_buffer = []
-total_active_asteroids = 0
-ASTEROID_BUFFER_SIZE = 50
-
-# An array to store all the bullets
-bullet_buffer = []
-current_bullet_index = 0
-BULLET_BUFFER_SIZE = 6 # How many bullets we allow on the screen at once.
-BULLET_SPEED = 300
-
-game_running = None
-game_window = None
-WINDOW_WIDTH = 1200
-WINDOW_HEIGHT = 800
-
-score_drawer = None
-health_drawer = None
-
-#
-#  Utility Functions ----------------------------------------------------
-#
-
-# Returns a vector with length 1 from a rotation. Assumes rotatation in degrees
-def unit_vector_from_rotation(rotation):
-    return vec2( math.cos(math.radians(rotation)),
-                 math.sin(math.radians(rotation)) )
-
-def distance_between(first, second):
-    delta_x = first.x - second.x
-    delta_y = first.y - second.y
-    distance = ((delta_x ** 2) + (delta_y ** 2)) ** 0.5
-    return distance
-
-# Returns if two entities are colliding, using circular hitboxes
-def is_colliding(entity, other):
-    return distance_between(entity.position, other.position) < entity.radius + other.radius
-
-# Adds a shape to turtles so it can be used later with turtle.shape
-def add_shape_to_turtle(coordinates, name):
-    #check lengths
-    shape = turtle.Shape('compound', None)
-    for i in range(len(coordinates)):
-        shape.addcomponent(coordinates[i], 'black', 'white')
-    game_window.register_shape(name, shape)
-    return shape
-
-# Returns a random value between -1 and 1
-def random_bilateral():
-    return (random.random() - 0.5) * 2.0
-
-# Returns a random vec2 with x and y between [-scale, scale]
-def random_vec2_component_length(scale):
-    return vec2(random_bilateral() * scale, random_bilateral() * scale)
-
-#
-#  Text Drawer Functions ---------------------------------------------
-#
-
-def set_turtle_text(text, turtle):
-    turtle.clear()
-    turtle.write(text, align='left', font=('fixedsys', 15, 'normal'))
-
-#
-#  Player functions ---------------------------------------------------
-#
-
-def rotate_right():
-    main_player.rotation -= main_player.ROTATION_SPEED * TimeInfo.delta_time
-    # The reason we are multiplying by delta_time (the time since the last update)
-    #  is because it makes the player turn the same amount, no matter how fast your computer is running
-    #  If the game lags, then we want to make sure that we still rotate the same amount, even
-    #  if the screen hadn't updated in time. This is a relatively simple way of making the game
-    #  framerate independent
-    
-def rotate_left():
-    main_player.rotation += main_player.ROTATION_SPEED * TimeInfo.delta_time
-    
-def accelerate_player():
-    acceleration_vector = unit_vector_from_rotation(main_player.rotation)
-    main_player.velocity += acceleration_vector * main_player.ACCELERATION_SPEED * TimeInfo.delta_time
-    main_player.turtle.shape(SPACESHIP_ACCELERATE_SPRITE_INFO['name'])
-    
-def shoot():
-    global bullet_buffer
-    global current_bullet_index
-    global main_player
-    global BULLET_SPEED
-
-    # bullet_buffer acts as a circular array
-    # which just means when we add a new bullet, we go forward one slot in the array
-    # and replace that one.
-    # If we hit the end, we go around to the beginning again
-    # This way if we overwrite an active bullet, its the one that we shot first
-
-    # In the beginning it is all non-active bullets
-    # [ *Non-Active*, Non-Active, Non-Active, Non-Active ]
-    # Currently current_bullet_index points at the first index (marked with *)
-    # Then we shoot and move current_bullet_index up
-    # [ Active, *Non-Active*, Non-Active, Non-Active ]
-    # If we shoot two more times then we have this setup
-    # [ Active, Active, Active, *Non-Active* ]
-    # Next time we shoot it will wrap around to the beginning
-    # [ *Active*, Active, Active, Active ]
-    # At any point, any of these bullets could have hit an asteroid and deactivate
-    # [ *Active*, Non-Active, Active, Non-Active ]
-    
-    bullet_buffer[current_bullet_index].turtle.st() #show_turtle 
-    bullet_buffer[current_bullet_index].position = main_player.position
-    bullet_buffer[current_bullet_index].velocity = unit_vector_from_rotation(main_player.rotation) * BULLET_SPEED
-    bullet_buffer[current_bullet_index].active = True
-
-    # Move current_bullet_index up by one, but the modulo will make it wrap to the beginning
-    # if it its the end
-    current_bullet_index = (current_bullet_index + 1) % BULLET_BUFFER_SIZE
-
-# This is used to make the player flicker when getting hit
-def animate_player():
-    if main_player.invincibility_frames > 0.0:
-        fractional = main_player.invincibility_frames - int(main_player.invincibility_frames)
-        scaled = int(fractional * 5)
-        
-        is_invisible = scaled % 2
+# The startup timer is made before anything else is imported, so the imports get counted too
+from startup import StartupTimer
+startup_timer = StartupTimer()
 
-        if is_invisible:
-            main_player.turtle.shape(SPACESHIP_FLICKER_INFO['name'])
-        else:
-            if keys_pressed[UP_KEY]:
-                main_player.turtle.shape(SPACESHIP_ACCELERATE_SPRITE_INFO['name'])
-            else: 
-                main_player.turtle.shape(SPACESHIP_SPRITE_INFO['name'])
-        main_player.invincibility_frames -= TimeInfo.delta_time
-    
-#
-#   Key events --------------------------------------------------------------
-#
-
-RIGHT_KEY = 0 #indices into the arrays below
-LEFT_KEY = 1
-UP_KEY = 2
-SPACE_KEY = 3
-# Stores a boolean of whether the key is pressed or not
-keys_pressed = [False, False, False, False]
-keys = [RIGHT_KEY, LEFT_KEY, UP_KEY, SPACE_KEY]
-# Functions to call when a certain key is pressed
-key_events = [rotate_right, rotate_left, accelerate_player, lambda: None]
-def Right():
-    keys_pressed[RIGHT_KEY] = True
-def RightRelease():
-    keys_pressed[RIGHT_KEY] = False
-
-def Left():
-    keys_pressed[LEFT_KEY] = True
-def LeftRelease():
-    keys_pressed[LEFT_KEY] = False
-
-def Up():
-    keys_pressed[UP_KEY] = True
-def UpRelease():
-    keys_pressed[UP_KEY] = False
-
-def Space():
-    shoot()
-    keys_pressed[SPACE_KEY] = True
-
-# This is called every frame.
-# We loop over all the keys and check if any of them are pressed at the moment
-# If it is, we call the function that is saved in key_events.
-def process_inputs():    
-    for key in keys:
-        if keys_pressed[key]:
-            key_events[key]()
-
-#
-#  Initialization functions ---------------------------------------------------------------
-#
-
-def init_constants():
-
-    # Initialize the player
-    global main_player
-    main_player = Player(health=3, position=vec2(0.0, 0.0), velocity=vec2(0.0, 0.0))
-
-    # Initialize the score information
-    global ScoreInfo
-    ScoreInfo = GlobalScoreInfo()
-    global TimeInfo
-    TimeInfo = GlobalTimeInfo()
-
-    # Initialize the Turtle Window
-    global game_window
-    game_window = turtle.Screen()
-    game_window.listen()
-
-    # Register the key events
-    game_window.onkeypress(Right, 'Right')
-    game_window.onkeyrelease(RightRelease, 'Right')
-    game_window.onkeypress(Left,'Left')
-    game_window.onkeyrelease(LeftRelease,'Left')
-    game_window.onkeypress(Up,'Up')
-    game_window.onkeyrelease(UpRelease,'Up')
-    game_window.onkey(Space,'space')
-
-    # Add the shapes to turtles
-    add_shape_to_turtle(SPACESHIP_SPRITE_INFO['coordinates'], SPACESHIP_SPRITE_INFO['name'])
-    add_shape_to_turtle(SPACESHIP_ACCELERATE_SPRITE_INFO['coordinates'], SPACESHIP_ACCELERATE_SPRITE_INFO['name'])
-    add_shape_to_turtle(BULLET_SPRITE_INFO['coordinates'], BULLET_SPRITE_INFO['name'])
-    add_shape_to_turtle(SPACESHIP_FLICKER_INFO['coordinates'], SPACESHIP_FLICKER_INFO['name'])
-
-    # Set the screen width, height, colour
-    turtle.setup(WINDOW_WIDTH, WINDOW_HEIGHT)
-    game_window.bgcolor('black')
-
-    # We will be updated the screen manually, so we turn off the screen's updates
-    game_window.tracer(0, 0) 
-
-    # Initialize the bullet array
-    global bullet_buffer
-    for bullet in range(BULLET_BUFFER_SIZE):
-        bullet_buffer.append( Bullet(vec2(0.0, 0.0)) )
-
-    # Initialize the asteroids
-    global asteroid_buffer
-    global total_active_asteroids
-    global ASTEROID_BUFFER_SIZE
-    for i in range(ASTEROID_BUFFER_SIZE):
-        asteroid_buffer.append(
-            Asteroid(3,
-                     random_vec2_component_length(300),
-                     random_vec2_component_length(30),
-                     None))
-    for i in range(ASTEROID_BUFFER_SIZE - 5):
-        asteroid_buffer[i].deactivate()    
-    total_active_asteroids = 5
-
-    # Initialize score and health drawers
-    # Do you think this code could be cleaner up somehow?
-    global score_drawer
-    score_drawer=turtle.Turtle()
-    score_drawer.ht()
-    score_drawer.color('white')    
-    score_drawer.penup()
-    score_drawer.goto((-WINDOW_WIDTH / 2) + 20, WINDOW_HEIGHT / 2 - 30)
-    set_turtle_text('SCORE: 0', score_drawer)
-    
-    global health_drawer
-    health_drawer=turtle.Turtle()
-    health_drawer.ht()
-    health_drawer.color('white')    
-    health_drawer.penup()
-    health_drawer.goto((-WINDOW_WIDTH / 2) + 20, WINDOW_HEIGHT / 2 - 70)
-    set_turtle_text('HEALTH: ' + str(main_player.health), health_drawer)
-
-def reset_round(asteroid_count):
-    
-    # Clear all the bullets
-    for bullet in bullet_buffer:
-        bullet.active = False
-
-    # Create new asteroids
-    for i in range(asteroid_count):
-        position = random_vec2_component_length(300)
-        
-        # Make sure the created asteroid does not spawn ontop of the player        
-        while distance_between(main_player.position, position) < 300:
-            position = random_vec2_component_length(300)            
-        spawn_asteroid(3, position, random_vec2_component_length(ASTEROID_INFO['speeds'][3]))
-        
-    global total_active_asteroids
-    total_active_asteroids = asteroid_count
-                       
-
-#
-#  Asteroid and Bullet functions ----------------------------------------------------------
-#
-            
-def spawn_asteroid(stage, position, velocity):
-    # Find an empty slot in the buffer for our new asteroid
-    for i in range(len(asteroid_buffer)):
-        if not asteroid_buffer[i].active:
-            asteroid_buffer[i].active = True
-            asteroid_buffer[i].health = stage
-            asteroid_buffer[i].position = position
-            asteroid_buffer[i].velocity = velocity
-            asteroid_buffer[i].turtle.st()
-            size = ASTEROID_INFO['turtle_sizes'][stage]
-            asteroid_buffer[i].turtle.shapesize(size, size)
-            asteroid_buffer[i].radius = ASTEROID_INFO['radii'][stage]
-            return
-    assert False # buffer is full! Essentially crash if we dont find a slot
-    # We could also append to the list if we didn't find one!
-
-def handle_bullet_asteroid_collisions():
-    global total_active_asteroids
-    
-    # Check if each bullet hits any of the asteroids
-    
-    for bullet in bullet_buffer:
-        if bullet.active:
-            for asteroid in asteroid_buffer:
-                if asteroid.active and is_colliding(bullet, asteroid):
-                    
-                    # If it is then we deactivate both of them 
-                    total_active_asteroids -= 1
-
-                    asteroid.deactivate()
-                    bullet.deactivate()
-                    
-                    health = asteroid.health
-                    position = asteroid.position
-                    
-                    ScoreInfo.current_score += ASTEROID_INFO['points'][health]
-
-                    # If the asteroid was not the smallest, then we split it in two!
-                    if asteroid.health >= 2:
-                        spawn_asteroid(health - 1, position,
-                                       random_vec2_component_length(ASTEROID_INFO['speeds'][health]))
-                        spawn_asteroid(health - 1, position,
-                                       random_vec2_component_length(ASTEROID_INFO['speeds'][health]))
-
-                        total_active_asteroids += 2
-
-                    set_turtle_text("SCORE: " + str(ScoreInfo.current_score), score_drawer)
-    if total_active_asteroids == 0:
-        reset_round(5)
-
-#
-#  Movement and Physics Functions ---------------------------------------------------------
-#
-
-# Make the entity wrap around the sides of the screen
-def border_wrap_entity(entity):
-    if abs(entity.position.x) > WINDOW_WIDTH / 2 or abs(entity.position.y) > WINDOW_HEIGHT / 2:        
-        if entity.position.x > WINDOW_WIDTH / 2:
-            entity.position.x = -WINDOW_WIDTH / 2
-        elif entity.position.x < -WINDOW_WIDTH / 2:
-            entity.position.x = WINDOW_WIDTH / 2 
-            
-        if entity.position.y > WINDOW_HEIGHT / 2:
-            entity.position.y = -WINDOW_HEIGHT / 2
-        elif entity.position.y < -WINDOW_HEIGHT / 2:
-            entity.position.y = WINDOW_HEIGHT / 2
-                
-def move_turtles(entities):
-    for entity in entities:
-        
-        # Only move the entity if it is active
-        # hasattr will return false if it is not in the class
-        # Player does not have 'active', so it will not make this check!
-        if hasattr(entity, 'active') and entity.active is False:
-            continue
-
-        # Move the entity forward by its velocity
-        turtle = entity.turtle
-        newpos = vec2( entity.position.x + entity.velocity.x * TimeInfo.delta_time,
-                     entity.position.y + entity.velocity.y * TimeInfo.delta_time )
-        
-        turtle.goto( newpos.x, newpos.y )
-        entity.position = newpos
-
-        # Set the rotation if it has it
-        if hasattr(entity, 'rotation'):
-            turtle.setheading(entity.rotation)
-
-        border_wrap_entity(entity)
-
-def check_player_collisions():
-    if main_player.invincibility_frames > 0.0:
-        return
-    for asteroid in asteroid_buffer:
-        if asteroid.active and is_colliding(main_player, asteroid):
-            main_player.health -= 1
-            set_turtle_text("HEALTH: " + str(main_player.health), health_drawer)
-            main_player.invincibility_frames = 5.00 # seconds of invincibility
-
-        
+import time
+import argparse
+
+from simulation import World, step_world, run_headless, WORLD_WIDTH, WORLD_HEIGHT
+from scheduler import FrameScheduler
+from profiler import FrameProfiler, NULL_PROFILER
+from replay import InputRecorder, Recording, record_step, replay
+from inputs import InputQueue
+from snapshot import save_snapshot, load_snapshot
+from particles import ParticleSystem, PARTICLE_BUDGET
+from governor import FrameGovernor
+from pilots import PILOTS
+from shared_frames import (make_frame_buffer, frame_dtype_for, start_simulation,
+                           SnapshotReader, SharedInputs, STOP)
+startup_timer.mark('imports')
 
 #
 #  Main Function --------------------------------------------------------
 #  This is where we start the code!
 #
-        
-def __main__():
-    init_constants()
-    
-    time_elapsed = 0.0
-    global bullet_buffer
-    game_running = True
-    
-    while game_running:
-        # Only run the loop if its been MS_PER_FRAME time.
-        # This way we're not updating it as fast as we can!
-        # Keeps your computer from working too hard!
-        if time.time() - TimeInfo.stop_watch < TimeInfo.MS_PER_FRAME:
-            continue
-
-        # Update the timing info
-        # Basically calculate how much time has passed since the last time we updated the screen
-        current_time = time.time()
-        TimeInfo.delta_time = current_time - TimeInfo.stop_watch
-        while current_time - TimeInfo.stop_watch >= TimeInfo.MS_PER_FRAME:
-            TimeInfo.delta_time += TimeInfo.MS_PER_FRAME
-            TimeInfo.stop_watch += TimeInfo.MS_PER_FRAME
-        TimeInfo.stop_watch = current_time
-
-        
-        main_player.turtle.shape(SPACESHIP_SPRITE_INFO['name'])
-
-        # Get the keys that were pressed this frame        
-        process_inputs()
-        
-        # Check collisions
-        handle_bullet_asteroid_collisions()
-        check_player_collisions()
-
-        # Move the turtles!
-        move_turtles([main_player])
-        move_turtles(asteroid_buffer)
-        move_turtles(bullet_buffer)
-
-        # Animate the player
-        animate_player()
-
-        # Draw the screen
-        game_window.update()
+#  The game itself lives in simulation.py, and the drawing lives in turtle_view.py (or canvas_view.py).
+#  This file just puts them together: it makes a World, (maybe) makes a view for it,
+#  and keeps stepping the world until the player runs out of health.
+#
 
-        if main_player.health <= 0:
-            game_running = False
+# Makes the view that draws the world. Its keys go into input_queue.
+# We only import the views when we need them, so headless runs never touch turtle or Tk
+def make_view(world, renderer, input_queue):
+    if renderer == 'canvas':
+        from canvas_view import CanvasView
+        return CanvasView(world, input_queue)
+    from turtle_view import TurtleView
+    return TurtleView(world, input_queue)
+
+# startup is a StartupTimer, marked when the window is open and when the first frame is on the screen.
+# If first_frame_only is True we stop right after that first frame.
+# If governed is True, quality gets turned down when frames take too long (see governor.py)
+def run_windowed(world, scheduler, renderer='turtle', profile_path=None, step=step_world,
+                 startup=None, first_frame_only=False, particle_budget=PARTICLE_BUDGET, governed=True):
+    # Explosions and thrust flames are only worth working out when someone can see them
+    if particle_budget > 0 and world.particles is None:
+        world.particles = ParticleSystem(particle_budget)
+    input_queue = InputQueue(clock=scheduler.clock)
+    view = make_view(world, renderer, input_queue)
+    profiler = scheduler.profiler
+    if startup is not None:
+        startup.mark('window')
+
+    # Press P to save the profile so far
+    if profile_path is not None:
+        view.bind_key('p', lambda: profiler.dump(profile_path))
+
+    governor = FrameGovernor(scheduler, view.settings, clock=scheduler.clock) if governed else None
+    clock = scheduler.clock
+    work_time = 0.0 # spent stepping since the last frame was drawn
+
+    # Key presses wait in the queue until the start of the next step
+    def step_with_inputs(delta_time):
+        nonlocal work_time
+        started = clock()
+        input_queue.drain(world)
+        step(world, delta_time, profiler)
+        work_time += clock() - started
+
+    frames_shown = 0
+    def render(alpha):
+        nonlocal frames_shown, work_time
+        started = clock()
+        view.draw(profiler)
+        if governor is not None:
+            governor.frame_done(work_time + clock() - started)
+        work_time = 0.0
+        input_queue.frame_shown()
+        frames_shown += 1
+        if frames_shown == 1 and startup is not None:
+            startup.mark('first frame')
+
+    # The scheduler steps the world at a fixed rate, draws at its own rate,
+    # and sleeps in between so we're not using the computer when we don't need to
+    scheduler.run(step=step_with_inputs, render=render,
+                  should_stop=lambda: (world.is_game_over() or view.is_closed()
+                                       or (first_frame_only and frames_shown > 0)))
+
+    if profile_path is not None:
+        input_queue.report()
+        if governor is not None:
+            governor.report()
+    if startup is not None and (profile_path is not None or first_frame_only):
+        startup.report()
 
     # Pause on dying
-    time.sleep(2)
-        
+    if not first_frame_only:
+        time.sleep(2)
+
+# Like run_windowed, but the world steps by itself in a thread or another process (mode 'thread' or 'process'),
+# and the window only draws the frames it publishes (see shared_frames.py).
+# Returns the world as it was when the game ended
+def run_windowed_split(world, scheduler, mode, renderer='turtle', profile_path=None, step=step_world,
+                       startup=None, first_frame_only=False, particle_budget=PARTICLE_BUDGET, governed=True):
+    if particle_budget > 0 and world.particles is None:
+        world.particles = ParticleSystem(particle_budget)
+    frame_buffer = make_frame_buffer(frame_dtype_for(world))
+    particle_capacity = world.particles.capacity if world.particles is not None else 0
+    reader = SnapshotReader(frame_buffer, world.width, world.height, particle_capacity)
+    shared_inputs = SharedInputs(frame_buffer, reader.world)
+
+    # The simulation starts before the window opens, so a new process doesn't get a copy of Tk
+    simulation = start_simulation(world, frame_buffer, mode, scheduler.step_time,
+                                  scheduler.max_steps_per_frame, step)
+    input_queue = InputQueue(clock=scheduler.clock)
+    view = make_view(reader.world, renderer, input_queue)
+    # The simulation side doesn't get the profiler, only one thread can time frames at once
+    profiler = scheduler.profiler
+    if startup is not None:
+        startup.mark('window')
+    if profile_path is not None:
+        view.bind_key('p', lambda: profiler.dump(profile_path))
+    # Only drawing happens on this side, so only drawing counts towards the frame budget
+    governor = FrameGovernor(scheduler, view.settings, clock=scheduler.clock) if governed else None
+
+    frames_shown = 0
+    next_frame_time = scheduler.clock()
+    try:
+        while not (reader.world.is_game_over() or view.is_closed() or not simulation.is_alive()
+                   or (first_frame_only and frames_shown > 0)):
+            profiler.begin_frame()
+            profiler.start()
+            # The keys go straight into the shared memory, the simulation picks them up at its next step
+            input_queue.drain(shared_inputs)
+            profiler.mark('input')
+            if reader.update(scheduler.clock()):
+                started = scheduler.clock()
+                view.draw(profiler)
+                if governor is not None:
+                    governor.frame_done(scheduler.clock() - started)
+                input_queue.frame_shown()
+                frames_shown += 1
+                if frames_shown == 1 and startup is not None:
+                    startup.mark('first frame')
+            profiler.end_frame()
+
+            next_frame_time += scheduler.render_time
+            if next_frame_time < scheduler.clock():
+                next_frame_time = scheduler.clock() + scheduler.render_time
+            scheduler.sleep_until(next_frame_time)
+    finally:
+        frame_buffer.control[STOP] = 1
+        world = simulation.finish()
+        stats = reader.stats()
+        frame_buffer.close()
+
+    if profile_path is not None:
+        input_queue.report()
+        print('frames published', stats['frames_published'], '- drawn from', stats['frames_taken'],
+              '- never taken', stats['frames_missed'])
+        if governor is not None:
+            governor.report()
+    if startup is not None and (profile_path is not None or first_frame_only):
+        startup.report()
+
+    if not first_frame_only:
+        time.sleep(2)
+    return world
+
+def __main__():
+    parser = argparse.ArgumentParser(description='Asteroids with Python turtles')
+    parser.add_argument('--headless', action='store_true',
+                        help='run the simulation without a window, as fast as possible')
+    parser.add_argument('--ticks', type=int, default=None,
+                        help='stop a headless run after this many steps')
+    parser.add_argument('--sim-rate', type=float, default=60,
+                        help='simulation steps per second')
+    parser.add_argument('--render-rate', type=float, default=60,
+                        help='screen redraws per second')
+    parser.add_argument('--max-catch-up', type=int, default=5,
+                        help='most simulation steps to take in one go after falling behind')
+    parser.add_argument('--renderer', choices=['turtle', 'canvas'], default='turtle',
+                        help='draw with turtles, or straight onto the Tk canvas (faster with lots of asteroids)')
+    parser.add_argument('--profile', metavar='PATH', default=None,
+                        help='time every phase of every frame and save it to PATH (.json or .csv) on exit')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed for the random numbers, the same seed and inputs always play the same game')
+    parser.add_argument('--record', metavar='PATH', default=None,
+                        help='save every step\'s inputs to PATH so the game can be replayed')
+    parser.add_argument('--replay', metavar='PATH', default=None,
+                        help='re-simulate a recording without a window and check it plays out the same')
+    parser.add_argument('--resume', metavar='PATH', default=None,
+                        help='carry on from a world snapshot instead of starting a new game')
+    parser.add_argument('--snapshot', metavar='PATH', default=None,
+                        help='save a snapshot of the whole world to PATH when the game ends')
+    parser.add_argument('--world-size', metavar='WIDTHxHEIGHT', default=None,
+                        help='make the play area bigger than the window, eg 4800x3200. The view follows the player')
+    parser.add_argument('--particles', type=int, default=PARTICLE_BUDGET,
+                        help='the most explosion and thrust particles on the screen at once, 0 for none')
+    parser.add_argument('--split', choices=['thread', 'process'], default=None,
+                        help='step the world in its own thread or process, and only draw the frames it publishes')
+    parser.add_argument('--pilot', choices=list(PILOTS), default=None,
+                        help='let a pilot fly the ship instead of the keyboard, "auto" tries to win (see pilots.py)')
+    parser.add_argument('--fixed-quality', action='store_true',
+                        help='always draw everything, even when frames take longer than they should')
+    parser.add_argument('--time-startup', action='store_true',
+                        help='print how long it took to get the first frame on the screen, then quit')
+    args = parser.parse_args()
+    if args.resume and args.record:
+        parser.error('recordings start from a new game, so --record can\'t be used with --resume')
+    if args.split == 'process' and args.record:
+        parser.error('the recording would be made in the other process, use --split thread to record')
+    if args.split == 'process' and args.pilot:
+        parser.error('pilots can\'t be sent to the other process, use --split thread')
+    world_width, world_height = WORLD_WIDTH, WORLD_HEIGHT
+    if args.world_size:
+        try:
+            world_width, world_height = [float(size) for size in args.world_size.lower().split('x')]
+        except ValueError:
+            parser.error('--world-size should look like 4800x3200')
+
+    if args.replay:
+        result = replay(Recording(args.replay))
+        print('replayed', result['ticks'], 'ticks (' + str(round(result['game_seconds'], 1)) + 's of play) in',
+              round(result['seconds'], 3), 'seconds,', round(result['ticks_per_second']), 'ticks/s')
+        print('score', result['score'], '-', result['checkpoints_checked'], 'checkpoints checked')
+        if result['first_mismatch_tick'] is not None:
+            print('MISMATCH: the world first differed from the recording at tick', result['first_mismatch_tick'])
+            raise SystemExit(1)
+        return
 
-__main__()
+    profiler = FrameProfiler() if args.profile else NULL_PROFILER
+
+    if args.resume:
+        world = load_snapshot(args.resume)
+    else:
+        world = World(seed=args.seed, width=world_width, height=world_height)
+    startup_timer.mark('world')
+    step = step_world
+    recorder = None
+    if args.record:
+        recorder = InputRecorder(world)
+        step = lambda world, delta_time, profiler: record_step(world, delta_time, recorder, profiler)
+    if args.pilot:
+        # The pilot presses its keys right before each step, so a recording gets them like any other keys
+        pilot = PILOTS[args.pilot](args.seed)
+        step_without_pilot = step
+        def step(world, delta_time, profiler):
+            pilot.control(world)
+            step_without_pilot(world, delta_time, profiler)
+
+    try:
+        if args.headless:
+            start = time.perf_counter()
+            ticks = run_headless(world, delta_time=1 / args.sim_rate, max_ticks=args.ticks,
+                                 profiler=profiler, step=step)
+            elapsed = time.perf_counter() - start
+            print('ran', ticks, 'ticks in', round(elapsed, 3), 'seconds, score', world.ScoreInfo.current_score)
+        else:
+            scheduler = FrameScheduler(step_time=1 / args.sim_rate,
+                                       render_time=1 / args.render_rate,
+                                       max_steps_per_frame=args.max_catch_up,
+                                       profiler=profiler)
+            if args.split:
+                world = run_windowed_split(world, scheduler, args.split, args.renderer, args.profile, step,
+                                           startup_timer, args.time_startup, args.particles,
+                                           not args.fixed_quality)
+            else:
+                run_windowed(world, scheduler, args.renderer, args.profile, step,
+                             startup_timer, args.time_startup, args.particles, not args.fixed_quality)
+    finally:
+        if recorder is not None:
+            recorder.save(args.record, world)
+        if args.snapshot:
+            save_snapshot(world, args.snapshot)
+        # Save the profile even if the game was closed or crashed
+        if args.profile:
+            profiler.dump(args.profile)
+            profiler.report()
+
+if __name__ == '__main__':
+    __main__()
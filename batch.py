@@ -0,0 +1,167 @@
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import simulation
+from simulation import World, step_world
+from pilots import PILOTS
+
+#
+#  Batch runs ---------------------------------------------------------------------------
+#
+#  To tune the game (asteroid speeds, sizes, points, BULLET_SPEED...) we need to play it
+#  a *lot* of times and look at the numbers. This runs many headless games ("episodes") at once,
+#  spread over every CPU core with a ProcessPoolExecutor.
+#
+#  Each episode gets its own seed, worked out from the batch seed and the episode number,
+#  so episode 17 plays out the same no matter which process runs it or in what order.
+#
+#  Results come back as each episode finishes, and are written to a JSON lines file
+#  (one JSON object per line) straight away, so a long batch can be watched while it runs.
+#
+#  Changing the game's numbers for a batch:
+#     python batch.py --episodes 1000 --set BULLET_SPEED=350 --set "ASTEROID_INFO.speeds=[None, 40, 60, 80]"
+#
+
+# Works out the seed for one episode. SeedSequence mixes the numbers well, so
+# episodes 1 and 2 get seeds that have nothing to do with each other
+def episode_seed(batch_seed, episode):
+    return int(np.random.SeedSequence([batch_seed, episode]).generate_state(1)[0])
+
+#
+#  Changing the game's numbers -----------------------------------------------------------
+#
+#  Overrides are a dict like {'BULLET_SPEED': 350, 'ASTEROID_INFO.speeds': [None, 40, 60, 80]}
+#  Only the names in TUNABLE can be changed. The simulation looks each of those up every time it
+#  uses them (a World reads the buffer and world sizes when it is made), so changing them in the
+#  worker process changes the game. Anything else is either copied somewhere when simulation.py
+#  is loaded, or is only used for drawing, so changing it would quietly do nothing: those are
+#  turned down instead.
+#  We put the old values back after each episode, because a worker process runs many episodes,
+#  maybe with different overrides.
+#
+
+TUNABLE = ['ASTEROID_BUFFER_SIZE', 'ASTEROID_GROWTH_FACTOR', 'BULLET_BUFFER_SIZE', 'BULLET_SPEED',
+           'WORLD_WIDTH', 'WORLD_HEIGHT', 'ROUND_ASTEROIDS', 'ROUND_SPREAD', 'COLLISION_CELL_SIZE',
+           'ASTEROID_INFO.speeds', 'ASTEROID_INFO.radii', 'ASTEROID_INFO.points']
+
+# Raises a ValueError for a name an override can't change
+def check_override(name):
+    if name not in TUNABLE:
+        raise ValueError(name + ' can\'t be changed for a batch, only ' + ', '.join(TUNABLE))
+
+def apply_overrides(overrides):
+    previous = {}
+    for name in overrides:
+        check_override(name)
+    for name, value in overrides.items():
+        if '.' in name:
+            table_name, key = name.split('.', 1)
+            table = getattr(simulation, table_name)
+            previous[name] = table[key]
+            table[key] = value
+        else:
+            previous[name] = getattr(simulation, name)
+            setattr(simulation, name, value)
+    return previous
+
+# Turns 'NAME=VALUE' into (name, value). Raises a ValueError for anything it can't use
+def parse_override(text):
+    if '=' not in text:
+        raise ValueError('expected NAME=VALUE, got ' + repr(text))
+    name, value = text.split('=', 1)
+    name = name.strip()
+    check_override(name)
+    try:
+        return name, ast.literal_eval(value.strip())
+    except (ValueError, SyntaxError):
+        # literal_eval raises a SyntaxError for things like "[1, 2" or "fast"
+        raise ValueError(repr(value.strip()) + ' is not a Python value (a number, a string in quotes, a list...)') from None
+
+#
+#  Running one episode ---------------------------------------------------------------------
+#
+#  This is what runs in the worker processes. It has to be a normal top level function
+#  so it can be sent to another process.
+#
+
+def run_episode(episode, batch_seed, pilot_name, max_ticks, delta_time, overrides):
+    seed = episode_seed(batch_seed, episode)
+    previous = apply_overrides(overrides)
+    try:
+        start = time.perf_counter()
+        world = World(seed=seed)
+        pilot = PILOTS[pilot_name](seed)
+        while world.tick < max_ticks and not world.is_game_over():
+            pilot.control(world)
+            step_world(world, delta_time)
+        elapsed = time.perf_counter() - start
+    finally:
+        apply_overrides(previous)
+
+    died = bool(world.is_game_over())
+    return {'episode': episode,
+            'seed': seed,
+            'pilot': pilot_name,
+            'score': int(world.ScoreInfo.current_score),
+            'rounds_cleared': world.rounds_cleared,
+            'died': died,
+            'time_to_death': world.tick * delta_time if died else None,
+            'ticks': world.tick,
+            'wall_seconds': elapsed}
+
+# Runs every episode and yields each result as soon as it is done (not in episode order)
+def run_batch(episodes, batch_seed=0, pilot_name='random', max_ticks=60 * 60 * 5,
+              delta_time=1 / 60, overrides=None, workers=None):
+    overrides = overrides or {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_episode, episode, batch_seed, pilot_name,
+                                   max_ticks, delta_time, overrides)
+                   for episode in range(episodes)]
+        for future in as_completed(futures):
+            yield future.result()
+
+def __main__():
+    parser = argparse.ArgumentParser(description='Run lots of headless Asteroids games in parallel')
+    parser.add_argument('--episodes', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='how many processes to use (default: one per CPU core)')
+    parser.add_argument('--pilot', choices=list(PILOTS), default='random')
+    parser.add_argument('--max-ticks', type=int, default=60 * 60 * 5,
+                        help='stop an episode after this many steps even if the player is alive')
+    parser.add_argument('--sim-rate', type=float, default=60, help='simulation steps per second of game time')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='change a game constant for this batch, eg BULLET_SPEED=350 or "ASTEROID_INFO.points=[None, 100, 50, 20]"')
+    parser.add_argument('--output', default='batch_results.jsonl')
+    args = parser.parse_args()
+
+    try:
+        overrides = dict(parse_override(text) for text in args.set)
+    except ValueError as error:
+        parser.error('--set: ' + str(error))
+
+    start = time.perf_counter()
+    total_ticks = 0
+    scores = []
+    with open(args.output, 'w') as output:
+        for done, result in enumerate(run_batch(args.episodes, args.seed, args.pilot, args.max_ticks,
+                                                1 / args.sim_rate, overrides, args.workers), start=1):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            total_ticks += result['ticks']
+            scores.append(result['score'])
+            elapsed = time.perf_counter() - start
+            print('\r%d/%d episodes, %.0f episodes/s, %.0f ticks/s, mean score %.1f' %
+                  (done, args.episodes, done / elapsed, total_ticks / elapsed, sum(scores) / len(scores)),
+                  end='', file=sys.stderr)
+    print(file=sys.stderr)
+
+if __name__ == '__main__':
+    __main__()
@@ -0,0 +1,270 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from simulation import (World, Player, vec2, step_world, spawn_asteroid, shoot, reset_round,
+                        random_vec2_component_length, ASTEROID_INFO, BULLET_BUFFER_SIZE,
+                        RIGHT_KEY, UP_KEY)
+from pilots import AutoPilot
+
+#
+#  Benchmarks ------------------------------------------------------------------------
+#
+#  This runs the simulation (no window) in a few named scenarios and measures:
+#     - ticks per second
+#     - how long each tick took (p50 / p95 / p99 / worst, in milliseconds)
+#     - the most memory the simulation used at once (measured with tracemalloc)
+#     - how many vec2s got made each tick, on average. Each one is memory Python has to find and
+#       then give back a moment later ("churn")
+#
+#  It also measures how many bytes one vec2 and one Player take up.
+#
+#  The results are saved to a JSON file. Run it again later with --compare old.json
+#  to see what got faster or slower:
+#
+#     python benchmark.py --output before.json
+#     ... change some code ...
+#     python benchmark.py --output after.json --compare before.json
+#
+#  Every scenario starts with the same random seed, so every run simulates the same game.
+#
+
+TICK_TIME = 1 / 60
+
+#
+#  Scenarios ------------------------------------------------------------------------
+#
+#  Each scenario makes a World from the seed and returns it, along with a function that gets called
+#  before every tick (for shooting, steering...) or None.
+#
+#  The player is given so much health that they can't die, so every scenario runs for all its ticks.
+#
+
+UNKILLABLE = 10 ** 9
+
+def make_world(seed, asteroid_count, asteroid_capacity=None, bullet_capacity=BULLET_BUFFER_SIZE):
+    world = World(asteroid_capacity=asteroid_capacity or max(asteroid_count, 1),
+                  bullet_capacity=bullet_capacity, seed=seed)
+    world.main_player.health = UNKILLABLE
+    world.asteroid_pool.release_all()
+    rng = world.rng
+    for i in range(asteroid_count):
+        position = vec2(rng.uniform(-world.width / 2, world.width / 2),
+                        rng.uniform(-world.height / 2, world.height / 2))
+        spawn_asteroid(world, 3, position, random_vec2_component_length(ASTEROID_INFO['speeds'][3], rng))
+    return world
+
+# Spin and shoot every few ticks, like someone playing
+def spin_and_shoot(every):
+    def before_tick(world, tick):
+        world.keys_pressed[RIGHT_KEY] = True
+        if tick % every == 0:
+            shoot(world)
+    return before_tick
+
+# The normal start of a game: 5 big asteroids from reset_round
+def default_round(seed):
+    world = World(seed=seed)
+    world.main_player.health = UNKILLABLE
+    world.asteroid_pool.release_all()
+    reset_round(world, world.round_asteroids)
+    return world, spin_and_shoot(every=20)
+
+# Hold thrust and turn the whole time, so the player's own per-step code runs every tick
+def thrusting(seed):
+    world, before_tick = default_round(seed)
+    world.keys_pressed[UP_KEY] = True
+    return world, before_tick
+
+def asteroid_field(count):
+    def scenario(seed):
+        return make_world(seed, count), spin_and_shoot(every=20)
+    return scenario
+
+# Shoot every single tick, so the bullet buffer is always full and recycling its oldest bullet
+def bullet_spam(seed):
+    world = make_world(seed, 100)
+    return world, spin_and_shoot(every=1)
+
+# Lots of big asteroids, and every tick we put a bullet on top of as many asteroids as we can.
+# Every big one splits into two medium ones, which split into two small ones...
+# until the whole field is gone
+def split_cascade(seed):
+    world = make_world(seed, 300, asteroid_capacity=1200, bullet_capacity=64)
+    bullet_buffer = world.bullet_buffer
+    def before_tick(world, tick):
+        targets = np.flatnonzero(world.asteroid_buffer.active)[:len(bullet_buffer)]
+        for target in targets.tolist():
+            slot = world.bullet_pool.allocate()
+            bullet_buffer.position[slot] = world.asteroid_buffer.position[target]
+            bullet_buffer.velocity[slot] = (0.0, 0.0)
+    return world, before_tick
+
+# The autopilot flying through a big field: it asks the asteroid index for the nearest asteroids,
+# what is close by and what is straight ahead every tick, so this shows what those questions cost
+def autopilot_field(count):
+    def scenario(seed):
+        world = make_world(seed, count)
+        pilot = AutoPilot(seed)
+        return world, lambda world, tick: pilot.control(world)
+    return scenario
+
+SCENARIOS = {
+    'default_round': default_round,
+    'thrusting': thrusting,
+    'asteroids_100': asteroid_field(100),
+    'asteroids_1000': asteroid_field(1000),
+    'asteroids_10000': asteroid_field(10000),
+    'bullet_spam': bullet_spam,
+    'split_cascade': split_cascade,
+    'autopilot_1000': autopilot_field(1000),
+}
+
+#
+#  Running ---------------------------------------------------------------------------
+#
+
+def run_ticks(world, before_tick, ticks, tick_times=None):
+    for tick in range(ticks):
+        start = time.perf_counter()
+        if before_tick is not None:
+            before_tick(world, tick)
+        step_world(world, TICK_TIME)
+        if tick_times is not None:
+            tick_times[tick] = time.perf_counter() - start
+
+def run_scenario(name, ticks, seed):
+    setup = SCENARIOS[name]
+
+    # Timing run
+    world, before_tick = setup(seed)
+    tick_times = np.zeros(ticks)
+    start = time.perf_counter()
+    run_ticks(world, before_tick, ticks, tick_times)
+    elapsed = time.perf_counter() - start
+
+    # Memory run. tracemalloc slows everything down, so it gets its own run with the same seed
+    tracemalloc.start()
+    world, before_tick = setup(seed)
+    made = count_vec2s_made(lambda: run_ticks(world, before_tick, ticks))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(tick_times * 1000, [50, 95, 99])
+    return {'ticks': ticks,
+            'ticks_per_second': ticks / elapsed,
+            'tick_ms': {'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+                        'worst': float(tick_times.max() * 1000)},
+            'peak_memory_bytes': peak,
+            'vec2s_per_tick': made / ticks,
+            'score': world.ScoreInfo.current_score,
+            'active_asteroids': world.total_active_asteroids}
+
+# Runs function and returns how many vec2s were made while it ran.
+# sys.setprofile calls counter for every Python function call, and we count the calls to vec2's __init__
+def count_vec2s_made(function):
+    init_code = vec2.__init__.__code__
+    made = 0
+    def counter(frame, event, argument):
+        nonlocal made
+        if event == 'call' and frame.f_code is init_code:
+            made += 1
+    sys.setprofile(counter)
+    try:
+        function()
+    finally:
+        sys.setprofile(None)
+    return made
+
+# How many bytes count objects made by make_object take up, each (measured with tracemalloc)
+def bytes_per_object(make_object, count=10000):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [make_object() for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding them takes up 8 bytes per object, which isn't the objects' fault
+    return (after - before) / len(objects) - 8
+
+# Prints how each scenario changed since a previous results file.
+# Returns the names of the scenarios that got slower by more than threshold (0.1 = 10%)
+def compare(results, previous, threshold):
+    regressions = []
+    print()
+    print('scenario'.ljust(18), 'ticks/s'.rjust(12), 'before'.rjust(12), 'change'.rjust(8),
+          'p99 ms'.rjust(8), 'before'.rjust(8))
+    for name, result in results['scenarios'].items():
+        old = previous['scenarios'].get(name)
+        if old is None:
+            continue
+        change = result['ticks_per_second'] / old['ticks_per_second'] - 1.0
+        flag = ''
+        if change < -threshold:
+            regressions.append(name)
+            flag = '  <-- slower'
+        print(name.ljust(18),
+              ('%.0f' % result['ticks_per_second']).rjust(12),
+              ('%.0f' % old['ticks_per_second']).rjust(12),
+              ('%+.1f%%' % (change * 100)).rjust(8),
+              ('%.3f' % result['tick_ms']['p99']).rjust(8),
+              ('%.3f' % old['tick_ms']['p99']).rjust(8) + flag)
+    return regressions
+
+def __main__():
+    parser = argparse.ArgumentParser(description='Benchmark the Asteroids simulation')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='scenario to run (can be given more than once, default: all)')
+    parser.add_argument('--ticks', type=int, default=600, help='ticks to run each scenario for')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', metavar='PATH', default=None,
+                        help='a previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='how much slower (0.10 = 10%%) counts as a regression')
+    args = parser.parse_args()
+
+    results = {'python': platform.python_version(),
+               'numpy': np.__version__,
+               'machine': platform.machine(),
+               'seed': args.seed,
+               'scenarios': {}}
+
+    results['bytes_per_object'] = {
+        'vec2': bytes_per_object(lambda: vec2(1.5, 2.5)),
+        # A Player also makes its position, velocity and facing vec2s
+        'Player': bytes_per_object(lambda: Player(3, vec2(0.0, 0.0), vec2(0.0, 0.0))),
+    }
+    print('bytes per object:', ', '.join(name + ' ' + str(round(size))
+                                         for name, size in results['bytes_per_object'].items()))
+
+    print('scenario'.ljust(18), 'ticks/s'.rjust(12), 'p50 ms'.rjust(8), 'p95 ms'.rjust(8),
+          'p99 ms'.rjust(8), 'worst ms'.rjust(9), 'peak MB'.rjust(8), 'vec2s/tick'.rjust(11))
+    for name in args.scenario or list(SCENARIOS):
+        result = run_scenario(name, args.ticks, args.seed)
+        results['scenarios'][name] = result
+        tick_ms = result['tick_ms']
+        print(name.ljust(18),
+              ('%.0f' % result['ticks_per_second']).rjust(12),
+              ('%.3f' % tick_ms['p50']).rjust(8),
+              ('%.3f' % tick_ms['p95']).rjust(8),
+              ('%.3f' % tick_ms['p99']).rjust(8),
+              ('%.3f' % tick_ms['worst']).rjust(9),
+              ('%.2f' % (result['peak_memory_bytes'] / 2 ** 20)).rjust(8),
+              ('%.2f' % result['vec2s_per_tick']).rjust(11))
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+        if compare(results, previous, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    __main__()
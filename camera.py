@@ -0,0 +1,77 @@
+import numpy as np
+
+from simulation import WINDOW_WIDTH, WINDOW_HEIGHT
+from spatial import wrapped_delta
+
+#
+#  The camera --------------------------------------------------------------------------------
+#
+#  The world can be much bigger than the window (World(width=..., height=...)), so the views
+#  only draw the part of it around the player. The camera is where the middle of the window is
+#  in the world, and it follows main_player around.
+#
+#  When the world is no bigger than the window along x (or y), there is nothing to scroll,
+#  so the camera stays in the middle along that side and the game looks the way it always has.
+#
+#  Every frame the views ask the camera which entities are "visible": inside the window,
+#  plus the entity's radius, plus a margin. Only those get sent to the turtles or the canvas,
+#  everything else keeps moving in the simulation but costs nothing to draw:
+#
+#     +----------------------------- world ------------------------------+
+#     |     o                                          o                 |
+#     |             +--------- window ---------+                         |
+#     |        o    |     o                    |  o      <- margin: still drawn
+#     |             |            ^ player      |                         |
+#     |             |                   o      |              o          |
+#     |             +--------------------------+                         |
+#     |   o                   o                            o             |
+#     +------------------------------------------------------------------+
+#
+#  Positions handed to the views are from the camera (the middle of the window is 0, 0),
+#  the short way around the wrapping world.
+#
+
+# How far outside the window (in pixels) things still get drawn
+CULL_MARGIN = 20
+
+class Camera:
+    def __init__(self, width=WINDOW_WIDTH, height=WINDOW_HEIGHT, margin=CULL_MARGIN):
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.x = 0.0
+        self.y = 0.0
+
+        # How many entities were looked at and how many were visible, last frame
+        self.last_checked = 0
+        self.last_visible = 0
+
+    # Moves the middle of the window to the player, along each side the world can scroll
+    def follow(self, world):
+        main_player = world.main_player
+        self.x = main_player.position.x if world.width > self.width else 0.0
+        self.y = main_player.position.y if world.height > self.height else 0.0
+
+    # Where a point in the world is on the window, the short way around
+    def view_point(self, world, x, y):
+        x -= self.x
+        y -= self.y
+        x -= world.width * round(x / world.width)
+        y -= world.height * round(y / world.height)
+        return x, y
+
+    # Returns (positions from the camera, which ones are visible) for every entity in the arrays
+    def cull(self, world, positions, radii, active):
+        offsets = wrapped_delta(positions, np.array([self.x, self.y]), world.width, world.height)
+        reach = radii + self.margin
+        visible = (active & (np.abs(offsets[:, 0]) <= self.width / 2 + reach)
+                   & (np.abs(offsets[:, 1]) <= self.height / 2 + reach))
+        self.last_checked += len(positions)
+        self.last_visible += int(np.count_nonzero(visible))
+        return offsets, visible
+
+    # Call at the start of each frame, before cull()
+    def begin_frame(self, world):
+        self.follow(world)
+        self.last_checked = 0
+        self.last_visible = 0
@@ -0,0 +1,260 @@
+import math
+import tkinter
+
+import numpy as np
+
+from simulation import SPACESHIP_ACCELERATE_SPRITE_INFO, BULLET_SPRITE_INFO, ASTEROID_INFO, WINDOW_WIDTH, WINDOW_HEIGHT
+from profiler import NULL_PROFILER
+from camera import Camera
+from governor import DrawSettings
+from view_layers import SlotLayer, bind_keys, player_state
+
+#
+#  This is another way to draw a World, without any turtles at all.
+#
+#  Under the hood, turtle draws everything on a Tk "canvas". Every turtle is a few canvas items
+#  (polygons) plus a lot of extra bookkeeping: its shape, its pen, its undo history...
+#  and every goto goes through all of that before it finally moves the polygon.
+#
+#  The CanvasView skips the turtles and talks to the canvas directly:
+#     - every asteroid, bullet and the ship get their canvas item made once, up front
+#     - each frame we work out the new corners of *every* item at once with NumPy
+#     - then we only call canvas.coords() for the items that actually moved
+#
+#  It draws the same shapes as the turtle view (SPACESHIP_SPRITE_INFO, BULLET_SPRITE_INFO...),
+#  and like it only draws what the camera can see (see camera.py).
+#  Start the game with --renderer canvas to use it.
+#
+
+FONT = ('fixedsys', 15, 'normal')
+
+#
+#  Coordinates ----------------------------------------------------------------------
+#
+#  The world has (0, 0) in the middle of the screen and y going up.
+#  The canvas has (0, 0) in the top left corner and y going down.
+#
+
+def to_canvas(x, y):
+    return x + WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 - y
+
+# Turns a sprite polygon into flat canvas coordinates [x1, y1, x2, y2, ...]
+# Sprite shapes are drawn pointing up the y axis, then turned to face heading (in degrees),
+# exactly the way turtle turns its shapes
+def sprite_polygon_coordinates(polygon, x, y, heading):
+    forward_x = math.cos(math.radians(heading))
+    forward_y = math.sin(math.radians(heading))
+    coordinates = []
+    for shape_x, shape_y in polygon:
+        world_x = x + forward_y * shape_x + forward_x * shape_y
+        world_y = y - forward_x * shape_x + forward_y * shape_y
+        coordinates.extend(to_canvas(world_x, world_y))
+    return coordinates
+
+# The canvas corners of every bullet at once. Bullets never turn, so their square is always the same
+BULLET_OFFSETS = np.array([(shape_y, -shape_x) for shape_x, shape_y in BULLET_SPRITE_INFO['coordinates'][0]],
+                          dtype=float)
+
+def bullet_coordinates(pixels, stages):
+    corners = pixels[:, None, :] + BULLET_OFFSETS[None, :, :]
+    corners[:, :, 0] += WINDOW_WIDTH / 2
+    corners[:, :, 1] = WINDOW_HEIGHT / 2 - corners[:, :, 1]
+    return corners.reshape(len(pixels), -1)
+
+ASTEROID_RADII = np.array([0.0 if radius is None else radius for radius in ASTEROID_INFO['radii']])
+
+# The bounding box (left, top, right, bottom) of every asteroid's circle at once
+def asteroid_coordinates(pixels, stages):
+    radii = ASTEROID_RADII[stages]
+    x = pixels[:, 0] + WINDOW_WIDTH / 2
+    y = WINDOW_HEIGHT / 2 - pixels[:, 1]
+    return np.stack([x - radii, y - radii, x + radii, y + radii], axis=1)
+
+# A tiny square for every particle
+def particle_coordinates(pixels, stages):
+    x = pixels[:, 0] + WINDOW_WIDTH / 2
+    y = WINDOW_HEIGHT / 2 - pixels[:, 1]
+    return np.stack([x - 1, y - 1, x + 1, y + 1], axis=1)
+
+#
+#  Canvas layers ---------------------------------------------------------------------
+#
+
+# A group of canvas items, one for each slot in a buffer of entities (the bullets or the asteroids)
+# It only touches the items that changed, the same way as the SpriteLayer in turtle_view.py (see view_layers.py)
+class CanvasLayer(SlotLayer):
+    def __init__(self, canvas, make_item, item_coordinates):
+        super().__init__()
+        self.canvas = canvas
+        self.make_item = lambda: make_item(canvas)
+        self.item_coordinates = item_coordinates
+
+    # Moves, shows and hides items to match the entities. Returns how many items were touched
+    def sync(self, positions, active, stages):
+        pixels, changed_slots = self.changes(positions, active, stages)
+        if len(changed_slots) == 0:
+            return 0
+
+        coordinates = self.item_coordinates(pixels[changed_slots], stages[changed_slots]).tolist()
+        canvas = self.canvas
+        for i, slot in enumerate(changed_slots.tolist()):
+            item = self.picture(slot, self.make_item)
+            if active[slot]:
+                canvas.coords(item, *coordinates[i])
+                if not self.drawn_visible[slot]:
+                    canvas.itemconfigure(item, state='normal')
+            else:
+                canvas.itemconfigure(item, state='hidden')
+
+        self.remember(changed_slots, pixels, active, stages)
+        return len(changed_slots)
+
+def make_asteroid_item(canvas):
+    return canvas.create_oval(0, 0, 0, 0, outline='white', fill='black', state='hidden', tags='asteroid')
+
+def make_particle_item(canvas):
+    return canvas.create_rectangle(0, 0, 0, 0, outline='', fill='white', state='hidden', tags='particle')
+
+def make_bullet_item(canvas):
+    return canvas.create_polygon(0, 0, 0, 0, 0, 0, 0, 0, outline='white', fill='black', state='hidden',
+                                 tags='bullet')
+
+# Every canvas item is tagged with its layer, and this is the order they are stacked in, bottom to top.
+# Tk puts every new item on top of everything else, so after new items are made
+# the canvas view raises each layer in turn to put them back in this order (see restack)
+LAYER_ORDER = ['asteroid', 'bullet', 'particle', 'ship', 'hud']
+
+#
+#  The Canvas View ---------------------------------------------------------------------
+#
+
+class CanvasView:
+    def __init__(self, world, input_queue):
+        self.world = world
+        self.closed = False
+
+        self.root = tkinter.Tk()
+        self.root.title('Asteroids')
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
+        self.canvas = tkinter.Canvas(self.root, width=WINDOW_WIDTH, height=WINDOW_HEIGHT,
+                                     background='black', highlightthickness=0)
+        self.canvas.pack()
+
+        # Register the key events (see view_layers.py)
+        bind_keys(input_queue,
+                  lambda name, function: self.root.bind('<KeyPress-' + name + '>', function),
+                  lambda name, function: self.root.bind('<KeyRelease-' + name + '>', function))
+
+        self.asteroid_layer = CanvasLayer(self.canvas, make_asteroid_item, asteroid_coordinates)
+        self.bullet_layer = CanvasLayer(self.canvas, make_bullet_item, bullet_coordinates)
+        # There are never more particle items than the particle budget (see particles.py)
+        self.particle_layer = CanvasLayer(self.canvas, make_particle_item, particle_coordinates)
+
+        # One polygon for each part of the biggest ship sprite (the body and the flame)
+        self.ship_items = []
+        for polygon in SPACESHIP_ACCELERATE_SPRITE_INFO['coordinates']:
+            self.ship_items.append(self.canvas.create_polygon(0, 0, 0, 0, 0, 0, outline='white',
+                                                              fill='black', state='hidden', tags='ship'))
+        self.drawn_player = None
+
+        # Initialize score and health text
+        self.score_item = self.canvas.create_text(20, 30, anchor='sw', fill='white', font=FONT, text='', tags='hud')
+        self.health_item = self.canvas.create_text(20, 70, anchor='sw', fill='white', font=FONT, text='', tags='hud')
+        self.drawn_score = None
+        self.drawn_health = None
+
+        # Follows the player around worlds bigger than the window
+        self.camera = Camera(WINDOW_WIDTH, WINDOW_HEIGHT)
+
+        # What we're allowed to draw, turned down when frames take too long (see governor.py)
+        self.settings = DrawSettings()
+        self.frames_drawn = 0
+
+        self.last_frame_redraws = 0
+
+    def close(self):
+        self.closed = True
+
+    def is_closed(self):
+        return self.closed
+
+    # Calls function when key is pressed and let go
+    def bind_key(self, key, function):
+        self.root.bind('<KeyRelease-' + key + '>', lambda event: function())
+
+    # How many canvas items the layers have made so far
+    def items_created(self):
+        return self.asteroid_layer.created + self.bullet_layer.created + self.particle_layer.created
+
+    # Puts the layers back in LAYER_ORDER
+    def restack(self):
+        for tag in LAYER_ORDER:
+            self.canvas.tag_raise(tag)
+
+    def draw_player(self):
+        state, sprite = player_state(self.world, self.camera)
+        if state == self.drawn_player:
+            return 0
+        x, y, heading, name = state
+        polygons = sprite['coordinates']
+        for i, item in enumerate(self.ship_items):
+            if i < len(polygons) and len(polygons[i]) > 0:
+                self.canvas.coords(item, *sprite_polygon_coordinates(polygons[i], x, y, heading))
+                self.canvas.itemconfigure(item, state='normal')
+            else:
+                self.canvas.itemconfigure(item, state='hidden')
+        self.drawn_player = state
+        return 1
+
+    def draw_asteroids(self):
+        asteroid_buffer = self.world.asteroid_buffer
+        positions, visible = self.camera.cull(self.world, asteroid_buffer.position, asteroid_buffer.radius,
+                                              asteroid_buffer.active)
+        visible = self.settings.asteroids_to_draw(visible, asteroid_buffer.health)
+        return self.asteroid_layer.sync(positions, visible, asteroid_buffer.health)
+
+    def draw_bullets(self):
+        bullet_buffer = self.world.bullet_buffer
+        positions, visible = self.camera.cull(self.world, bullet_buffer.position, bullet_buffer.radius,
+                                              bullet_buffer.active)
+        return self.bullet_layer.sync(positions, visible, bullet_buffer.health)
+
+    def draw_particles(self):
+        particles = self.world.particles
+        if particles is None:
+            return 0
+        positions, visible = self.camera.cull(self.world, particles.position, particles.radius, particles.active)
+        visible = self.settings.particles_to_draw(visible)
+        return self.particle_layer.sync(positions, visible, particles.kind)
+
+    # When frames are running long the score and health are only looked at every settings.hud_every frames
+    def draw_hud(self):
+        redraws = 0
+        if not self.settings.hud_due(self.frames_drawn):
+            return redraws
+        score = self.world.ScoreInfo.current_score
+        if score != self.drawn_score:
+            self.canvas.itemconfigure(self.score_item, text='SCORE: ' + str(score))
+            self.drawn_score = score
+            redraws += 1
+
+        health = self.world.main_player.health
+        if health != self.drawn_health:
+            self.canvas.itemconfigure(self.health_item, text='HEALTH: ' + str(health))
+            self.drawn_health = health
+            redraws += 1
+        return redraws
+
+    # Make the canvas match the world, then draw the screen
+    def draw(self, profiler=NULL_PROFILER):
+        profiler.start()
+        self.camera.begin_frame(self.world)
+        created = self.items_created()
+        self.last_frame_redraws = (self.draw_player() + self.draw_asteroids()
+                                   + self.draw_bullets() + self.draw_particles() + self.draw_hud())
+        if self.items_created() != created:
+            self.restack()
+        profiler.mark('draw')
+        self.root.update() # draws the canvas and handles any key presses
+        profiler.mark('update')
+        self.frames_drawn += 1
@@ -0,0 +1,97 @@
+import asyncio
+import random
+
+from simulation import LEFT_KEY, RIGHT_KEY, UP_KEY
+from netcode import SNAPSHOT_HEADER, NO_BASELINE, EMPTY_STATE, decode_snapshot, pack_input, states_equal
+from server import FRAME_LENGTH
+
+#
+#  A client that plays by itself -----------------------------------------------------------
+#
+#  Connects to a server (server.py), mashes random keys, and keeps its own copy of the world
+#  rebuilt from the snapshots the server sends. Used by the loopback test, and handy for
+#  filling up a server to see how it copes.
+#
+#  Every snapshot is a delta from a tick the client said it had, so the client keeps the last
+#  few states it got, by tick, to apply the next delta to.
+#
+
+STATE_HISTORY = 64
+
+class BotClient:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.keys_pressed = [False, False, False, False]
+        self.states = {}        # tick -> NetState
+        self.tick = NO_BASELINE # the newest tick received
+        self.state = EMPTY_STATE
+        self.bytes_received = 0
+        self.snapshots_received = 0
+        self.missing_baselines = 0 # deltas from a tick we didn't have (can't happen unless the server is wrong)
+        self.send = None
+        self.transport = None
+
+    async def connect_tcp(self, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        self.transport = writer
+        self.send = lambda message: writer.write(FRAME_LENGTH.pack(len(message)) + message)
+        self.reader_task = asyncio.create_task(self.read_tcp(reader))
+
+    async def read_tcp(self, reader):
+        try:
+            while True:
+                length, = FRAME_LENGTH.unpack(await reader.readexactly(FRAME_LENGTH.size))
+                self.receive(await reader.readexactly(length))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def connect_udp(self, host, port):
+        loop = asyncio.get_running_loop()
+        self.transport, protocol = await loop.create_datagram_endpoint(
+            lambda: ClientDatagramProtocol(self), remote_addr=(host, port))
+        self.send = self.transport.sendto
+
+    # A snapshot from the server. Answers straight away with the keys and the ack for it
+    def receive(self, data):
+        self.bytes_received += len(data)
+        self.snapshots_received += 1
+        tick, baseline_tick = SNAPSHOT_HEADER.unpack_from(data, 0)[:2]
+        if baseline_tick == NO_BASELINE:
+            baseline = EMPTY_STATE
+        elif baseline_tick in self.states:
+            baseline = self.states[baseline_tick]
+        else:
+            self.missing_baselines += 1
+            return
+        # Over UDP an old snapshot can turn up after a newer one. It's no use to us
+        if self.tick != NO_BASELINE and tick <= self.tick:
+            return
+        tick, baseline_tick, state = decode_snapshot(data, baseline)
+        self.states[tick] = state
+        self.states.pop(tick - STATE_HISTORY, None)
+        self.tick = tick
+        self.state = state
+        self.send_input()
+
+    def send_input(self):
+        if self.send is None:
+            return
+        for key in (LEFT_KEY, RIGHT_KEY, UP_KEY):
+            if self.rng.random() < 0.1:
+                self.keys_pressed[key] = not self.keys_pressed[key]
+        shots = 1 if self.rng.random() < 0.2 else 0
+        self.send(pack_input(self.keys_pressed, shots, self.tick))
+
+    def state_matches(self, state):
+        return states_equal(self.state, state)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+class ClientDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, client):
+        self.client = client
+
+    def datagram_received(self, data, address):
+        self.client.receive(data)
@@ -0,0 +1,185 @@
+import time
+from collections import deque
+
+import numpy as np
+
+#
+#  Keeping up when the computer can't ----------------------------------------------------------
+#
+#  Each frame has a budget: the time until the next one is due (scheduler.render_time). When stepping
+#  and drawing take longer than that, frames come late, the scheduler has to catch up with a burst of
+#  steps, and the game stutters.
+#
+#  The governor watches how much of the budget the last few frames used (their "load", 1.0 means
+#  exactly all of it). When the average gets too high it gives up a little bit of quality, and when
+#  there has been plenty of time to spare for a while it takes it back. The levels go in order,
+#  each one giving up one more thing on top of the ones before:
+#
+#     level 0  full quality
+#     level 1  the score and health only get rewritten now and then
+#     level 2  draw half as often (the world still steps just as often)
+#     level 3  only draw some of the particles
+#     level 4  don't draw the smallest asteroids
+#
+#     load
+#          |          ______
+#     high |- - - - -/- - - -\- - - - - - - - - - -   above this on average: down a level
+#          |        /         \
+#     low  |- - - -/- - - - - -\- - - - - - - - - -   below this for a while: back up a level
+#          |______/             \_________________
+#                                            frames
+#
+#  After every change the governor waits settle_frames before deciding again, so the frames it
+#  looks at were all drawn at the new level. Coming back up needs restore_frames calm frames in a row,
+#  so one quiet moment in a busy fight doesn't flip quality up and straight back down again.
+#
+#  A frame is only calm if it would fit in the budget of the level we'd go back up to. At half render
+#  rate the budget is twice as long, so a frame that is mostly drawing uses half as much of it,
+#  without anything having got quicker. Measured against its own budget it would look calm, we'd go
+#  back up, be too slow again, and go round and round.
+#
+#  None of this changes the world: the simulation steps exactly the same whatever the level is.
+#
+
+FULL_QUALITY = 0
+SKIP_HUD = 1
+HALF_RENDER_RATE = 2
+FEWER_PARTICLES = 3
+NO_SMALL_ASTEROIDS = 4
+LEVEL_NAMES = ['full quality', 'skip hud redraws', 'half render rate', 'fewer particles', 'no small asteroids']
+
+HUD_EVERY = 30         # frames between score and health rewrites, from level 1
+RENDER_SLOWDOWN = 2    # render_time is this many times longer, from level 2
+PARTICLE_SHARE = 2     # draw one particle in every PARTICLE_SHARE, from level 3
+SMALL_ASTEROID_STAGE = 2 # asteroids smaller than this stage aren't drawn, at level 4
+
+# What the views are allowed to draw. The governor changes these, the views read them every frame
+class DrawSettings:
+    hud_every: int
+    particle_share: int
+    smallest_asteroid_stage: int
+    def __init__(self):
+        self.hud_every = 1
+        self.particle_share = 1
+        self.smallest_asteroid_stage = 1
+
+    # Whether the HUD should be looked at on this frame
+    def hud_due(self, frame_number):
+        return frame_number % self.hud_every == 0
+
+    def particles_to_draw(self, visible):
+        if self.particle_share > 1:
+            visible = visible & (np.arange(len(visible)) % self.particle_share == 0)
+        return visible
+
+    def asteroids_to_draw(self, visible, stages):
+        if self.smallest_asteroid_stage > 1:
+            visible = visible & (stages >= self.smallest_asteroid_stage)
+        return visible
+
+# One change of level, and why
+class GovernorDecision:
+    frame: int
+    time: float
+    from_level: int
+    to_level: int
+    load: float
+    def __init__(self, frame, time, from_level, to_level, load):
+        self.frame = frame
+        self.time = time
+        self.from_level = from_level
+        self.to_level = to_level
+        self.load = load
+
+    def as_dict(self):
+        return {'frame': self.frame, 'time': self.time, 'from': LEVEL_NAMES[self.from_level],
+                'to': LEVEL_NAMES[self.to_level], 'load': self.load}
+
+class FrameGovernor:
+    def __init__(self, scheduler, settings, window=30, high_load=0.9, low_load=0.5,
+                 settle_frames=30, restore_frames=120, max_level=NO_SMALL_ASTEROIDS,
+                 clock=time.perf_counter, history=256):
+        self.scheduler = scheduler
+        self.settings = settings
+        self.base_render_time = scheduler.render_time
+        self.high_load = high_load
+        self.low_load = low_load
+        self.settle_frames = settle_frames
+        self.restore_frames = restore_frames
+        self.max_level = max_level
+        self.clock = clock
+        self.start_time = clock()
+
+        self.level = FULL_QUALITY
+        self.loads = deque(maxlen=window) # the load of the last `window` frames
+        self.frames = 0
+        self.frames_since_change = 0
+        self.calm_frames = 0
+        self.decisions = deque(maxlen=history) # the last `history` GovernorDecisions
+        self.frames_at_level = [0] * len(LEVEL_NAMES)
+
+    @property
+    def level_name(self):
+        return LEVEL_NAMES[self.level]
+
+    # The average load of the last few frames
+    def rolling_load(self):
+        return sum(self.loads) / len(self.loads) if self.loads else 0.0
+
+    # The time between frames at a level
+    def render_time_at(self, level):
+        return self.base_render_time * (RENDER_SLOWDOWN if level >= HALF_RENDER_RATE else 1)
+
+    # Makes the settings and the scheduler match a level
+    def apply(self, level):
+        settings = self.settings
+        settings.hud_every = HUD_EVERY if level >= SKIP_HUD else 1
+        self.scheduler.render_time = self.render_time_at(level)
+        settings.particle_share = PARTICLE_SHARE if level >= FEWER_PARTICLES else 1
+        settings.smallest_asteroid_stage = SMALL_ASTEROID_STAGE if level >= NO_SMALL_ASTEROIDS else 1
+
+    def change_level(self, level):
+        self.decisions.append(GovernorDecision(self.frames, self.clock() - self.start_time,
+                                               self.level, level, self.rolling_load()))
+        self.level = level
+        self.apply(level)
+        self.loads.clear()
+        self.frames_since_change = 0
+        self.calm_frames = 0
+
+    # Call once a frame, with the seconds spent working on it (stepping and drawing).
+    # Returns the level to draw the next frame at
+    def frame_done(self, work_time):
+        self.frames += 1
+        self.frames_since_change += 1
+        self.frames_at_level[self.level] += 1
+        load = work_time / self.scheduler.render_time
+        self.loads.append(load)
+        # How much of the budget one level up in quality this frame would have used
+        load_above = work_time / self.render_time_at(max(self.level - 1, FULL_QUALITY))
+        self.calm_frames = self.calm_frames + 1 if load_above < self.low_load else 0
+        if self.frames_since_change < self.settle_frames:
+            return self.level
+
+        if self.rolling_load() > self.high_load and self.level < self.max_level:
+            self.change_level(self.level + 1)
+        elif self.calm_frames >= self.restore_frames and self.level > FULL_QUALITY:
+            self.change_level(self.level - 1)
+        return self.level
+
+    def summary(self):
+        return {'level': self.level, 'level_name': self.level_name, 'frames': self.frames,
+                'rolling_load': self.rolling_load(),
+                'frames_at_level': dict(zip(LEVEL_NAMES, self.frames_at_level)),
+                'decisions': [decision.as_dict() for decision in self.decisions]}
+
+    def report(self):
+        print('quality level', self.level, '(' + self.level_name + ') after', self.frames, 'frames,',
+              len(self.decisions), 'changes')
+        for name, frames in zip(LEVEL_NAMES, self.frames_at_level):
+            if frames:
+                print('   ', name.ljust(20), str(frames).rjust(8), 'frames')
+        for decision in self.decisions:
+            print('    frame', str(decision.frame).rjust(7), ('%.1fs' % decision.time).rjust(8),
+                  LEVEL_NAMES[decision.from_level], '->', LEVEL_NAMES[decision.to_level],
+                  '(load %.2f)' % decision.load)
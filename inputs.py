@@ -0,0 +1,142 @@
+import time
+from collections import deque
+
+import numpy as np
+
+from simulation import SPACE_KEY, request_shot
+
+#
+#  The input queue ----------------------------------------------------------------------
+#
+#  Tk calls our key functions whenever it gets around to handling events, which is in the middle
+#  of drawing a frame (inside update()). If those functions changed the world straight away,
+#  a key press could land halfway through a frame, at a different point every time.
+#
+#  Instead the key functions only write down what happened, and when:
+#
+#     key pressed  ->  push(key, pressed)  ->  [event, event, ...]
+#
+#  and right before every step the queue is drained into the world:
+#
+#     drain(world)  ->  keys_pressed / request_shot  ->  step_world
+#
+#  So every key press takes effect at the start of a step, no matter when Tk handled it.
+#
+#  Each event also remembers:
+#     time          -> when Tk gave it to us
+#     applied_time  -> when it was drained into the world (and which tick)
+#     shown_time    -> when the first frame drawn after that was finished
+#
+#  shown_time - time is the "input latency": how long from pressing a key to seeing it on the screen.
+#  (Tk's own event timestamps use a different clock, so time is when our function ran,
+#  which is the earliest Python finds out about the key)
+#
+
+class InputEvent:
+    key: int
+    pressed: bool
+    time: float
+    applied_time: float
+    applied_tick: int
+    shown_time: float
+    def __init__(self, key, pressed, time):
+        self.key = key
+        self.pressed = pressed
+        self.time = time
+        self.applied_time = None
+        self.applied_tick = None
+        self.shown_time = None
+
+class InputQueue:
+    def __init__(self, clock=time.perf_counter, history=3600):
+        self.clock = clock
+        self.pending = deque() # pushed, not drained yet
+        self.applied = []      # drained into the world, not drawn yet
+        self.pressed_tick = {} # key -> the tick it was last pressed down on, so taps last a step
+
+        # The latencies of the last `history` events, in seconds
+        self.step_latencies = deque(maxlen=history)  # key press -> the step it took effect in
+        self.shown_latencies = deque(maxlen=history) # key press -> the frame that showed it
+        self.event_count = 0
+
+    # Called from the key functions. Only writes the event down, the world isn't touched
+    def push(self, key, pressed=True):
+        self.pending.append(InputEvent(key, pressed, self.clock()))
+
+    # Applies every waiting event to the world, in the order they happened. Call this right before stepping.
+    # Pressing space asks for a shot; every other key is held down until it is let go.
+    #
+    # A quick tap can be pressed and let go between two steps. Applying both straight away would
+    # leave the key up, and no step would ever see it. So a key that is let go before the world has
+    # taken a step with it down stays down, and the let go (and anything after it for that key)
+    # waits until the world's tick has moved on:
+    #
+    #     events       Left down, Left up
+    #     drain tick 7 Left down   (up waits)     step 7 turns left
+    #     drain tick 8 Left up                    step 8 doesn't
+    #
+    # With --split the window drains once a frame instead of once a step, and world.tick is the
+    # newest step it has heard about, so the let go still waits for at least one new step.
+    def drain(self, world):
+        if not self.pending:
+            return 0
+        now = self.clock()
+        count = 0
+        waiting = [] # events for a later drain
+        waiting_keys = set()
+        while self.pending:
+            event = self.pending.popleft()
+            if event.key in waiting_keys:
+                waiting.append(event)
+                continue
+            if event.key == SPACE_KEY:
+                if event.pressed:
+                    request_shot(world)
+            elif not event.pressed and self.pressed_tick.get(event.key, -1) >= world.tick:
+                waiting.append(event)
+                waiting_keys.add(event.key)
+                continue
+            else:
+                world.keys_pressed[event.key] = event.pressed
+                if event.pressed:
+                    self.pressed_tick[event.key] = world.tick
+            event.applied_time = now
+            event.applied_tick = world.tick
+            self.step_latencies.append(now - event.time)
+            self.applied.append(event)
+            count += 1
+        self.pending.extend(waiting)
+        self.event_count += count
+        return count
+
+    # Call this after a frame has been drawn. Every event applied since the last frame is now on the screen
+    def frame_shown(self):
+        if not self.applied:
+            return
+        now = self.clock()
+        for event in self.applied:
+            event.shown_time = now
+            self.shown_latencies.append(now - event.time)
+        self.applied.clear()
+
+    # p50, p95 and worst latency in milliseconds, for getting into a step and for getting onto the screen
+    def summary(self):
+        summary = {'events': self.event_count}
+        for name, latencies in [('to_step', self.step_latencies), ('to_screen', self.shown_latencies)]:
+            if len(latencies) == 0:
+                summary[name] = None
+                continue
+            milliseconds = np.array(latencies) * 1000.0
+            p50, p95 = np.percentile(milliseconds, [50, 95])
+            summary[name] = {'p50': float(p50), 'p95': float(p95), 'worst': float(milliseconds.max())}
+        return summary
+
+    def report(self):
+        summary = self.summary()
+        print('input latency over', summary['events'], 'key events')
+        print('from key to'.ljust(12), 'p50'.rjust(8), 'p95'.rjust(8), 'worst'.rjust(8), '(ms)')
+        for name in ['to_step', 'to_screen']:
+            stats = summary[name]
+            if stats is None:
+                continue
+            print(name[3:].ljust(12), *[('%.3f' % stats[key]).rjust(8) for key in ['p50', 'p95', 'worst']])
@@ -0,0 +1,172 @@
+import struct
+import zlib
+
+import numpy as np
+
+from simulation import UP_KEY
+from replay import pack_keys, unpack_keys
+
+#
+#  What goes over the network ----------------------------------------------------------------
+#
+#  The server (server.py) runs the only real World. Clients only send what keys they are holding,
+#  and the server sends back what the world looks like. This file turns both of those into bytes.
+#
+#  Sending the whole world every tick is a lot of bytes, and most of it hasn't changed much: the
+#  asteroids have only moved a pixel or two, most bullet slots are still empty... So instead:
+#     - every client tells the server the last tick it got (its "ack")
+#     - the server remembers what it sent for the last few ticks
+#     - and sends only how the world is different from what the client already has ("delta compression")
+#  If the client hasn't acked anything the server can still find, it compares against an empty world,
+#  which is the same as sending everything.
+#
+#  The world as seen by the network is a NetState: three arrays of records, where row i is slot i
+#  (the ship with id i, asteroid slot i, bullet slot i). Positions are whole 16ths of a pixel
+#  in 2 byte integers, which is plenty to draw with and half the size of a float.
+#
+#  Client -> server, one message per tick:
+#     INPUT: keys held (one bit each, like replay.pack_keys), shots fired, last tick received
+#
+#  Server -> client, one message per tick:
+#     SNAPSHOT_HEADER: tick, the tick it is a delta from (NO_BASELINE for none), score, and how many
+#                      ship, asteroid and bullet slots there are
+#     then every slot's record XORed with the baseline's, zlib compressed (see delta_bytes).
+#     An asteroid record with stage 0, a bullet record with active 0 or a ship record with no ALIVE flag
+#     means that slot is empty.
+#
+
+INPUT = struct.Struct('<BBI')
+SNAPSHOT_HEADER = struct.Struct('<IIqHII')
+NO_BASELINE = 0xFFFFFFFF
+
+POSITION_SCALE = 16 # positions are sent as whole 1/16ths of a pixel
+
+# Positions go from -width/2 to width/2, so this is the widest (or tallest) world whose positions
+# fit in 2 byte integers, about 4096 pixels. Past that they would wrap around to the other side
+MAX_WORLD_SIZE = 2 * np.iinfo(np.int16).max / POSITION_SCALE
+
+# Ship flags
+ALIVE = 1
+THRUSTING = 2
+INVINCIBLE = 4
+
+SHIP_RECORD = np.dtype([('x', '<i2'), ('y', '<i2'), ('rotation', '<u2'),
+                        ('health', 'i1'), ('flags', 'u1')])
+ASTEROID_RECORD = np.dtype([('x', '<i2'), ('y', '<i2'), ('stage', 'u1')])
+BULLET_RECORD = np.dtype([('x', '<i2'), ('y', '<i2'), ('active', 'u1')])
+
+KINDS = [('ships', SHIP_RECORD), ('asteroids', ASTEROID_RECORD), ('bullets', BULLET_RECORD)]
+
+class NetState:
+    def __init__(self, ships, asteroids, bullets, score=0):
+        self.ships = ships
+        self.asteroids = asteroids
+        self.bullets = bullets
+        self.score = score
+
+def empty_records(dtype, n):
+    return np.zeros(n, dtype=dtype)
+
+EMPTY_STATE = NetState(empty_records(SHIP_RECORD, 0), empty_records(ASTEROID_RECORD, 0),
+                       empty_records(BULLET_RECORD, 0))
+
+# Raises a ValueError if the world is too big for its positions to be sent
+def check_world_fits(world):
+    if world.width > MAX_WORLD_SIZE or world.height > MAX_WORLD_SIZE:
+        raise ValueError('a %gx%g world is too big to send, it can be at most %g pixels along each side'
+                         % (world.width, world.height, MAX_WORLD_SIZE))
+
+def quantize(positions):
+    return np.rint(positions * POSITION_SCALE).astype(np.int16)
+
+# What a world and its ships look like to the network. ships is {id: Ship} (see server.py)
+def capture_state(world, ships, ship_slots):
+    asteroid_buffer = world.asteroid_buffer
+    asteroids = empty_records(ASTEROID_RECORD, len(asteroid_buffer))
+    active = asteroid_buffer.active
+    position = quantize(asteroid_buffer.position)
+    asteroids['x'] = np.where(active, position[:, 0], 0)
+    asteroids['y'] = np.where(active, position[:, 1], 0)
+    asteroids['stage'] = np.where(active, asteroid_buffer.health, 0)
+
+    bullet_buffer = world.bullet_buffer
+    bullets = empty_records(BULLET_RECORD, len(bullet_buffer))
+    active = bullet_buffer.active
+    position = quantize(bullet_buffer.position)
+    bullets['x'] = np.where(active, position[:, 0], 0)
+    bullets['y'] = np.where(active, position[:, 1], 0)
+    bullets['active'] = active
+
+    records = empty_records(SHIP_RECORD, ship_slots)
+    for ship_id, ship in ships.items():
+        player = ship.player
+        record = records[ship_id]
+        flags = ALIVE if player.health > 0 else 0
+        if player.health > 0:
+            record['x'] = round(player.position.x * POSITION_SCALE)
+            record['y'] = round(player.position.y * POSITION_SCALE)
+            record['rotation'] = round(player.rotation % 360 * 65536 / 360) % 65536
+            record['health'] = min(player.health, 127)
+            if ship.keys_pressed[UP_KEY]:
+                flags |= THRUSTING
+            if player.invincibility_frames > 0.0:
+                flags |= INVINCIBLE
+        record['flags'] = flags
+    return NetState(records, asteroids, bullets, world.ScoreInfo.current_score)
+
+# records made exactly n long, with empty slots added on the end (or cut off)
+def resized(records, dtype, n):
+    if len(records) < n:
+        return np.concatenate([records, empty_records(dtype, n)[len(records):]])
+    return records[:n]
+
+# The bytes of records as a (field byte, row) table: byte 0 of every row, then byte 1 of every row...
+def byte_columns(records):
+    return records.view(np.uint8).reshape(len(records), records.dtype.itemsize).T
+
+# The records of current XORed with the same slots of baseline, laid out in byte columns.
+# A row that hasn't changed becomes all zeros, and a position that only moved a little only changes
+# its low byte, so the columns are mostly long runs of zeros, which zlib squashes down to almost nothing
+def delta_bytes(current, baseline, dtype):
+    baseline = resized(baseline, dtype, len(current))
+    return (byte_columns(current) ^ byte_columns(baseline)).tobytes()
+
+def encode_snapshot(tick, current, baseline_tick=NO_BASELINE, baseline=EMPTY_STATE):
+    arrays = [getattr(current, name) for name, dtype in KINDS]
+    header = SNAPSHOT_HEADER.pack(tick, baseline_tick, current.score, *[len(records) for records in arrays])
+    deltas = [delta_bytes(records, getattr(baseline, name), dtype) for records, (name, dtype) in zip(arrays, KINDS)]
+    return header + zlib.compress(b''.join(deltas), 1)
+
+# Returns (tick, baseline tick, NetState) from a snapshot message.
+# baseline is the NetState the client has for the baseline tick (EMPTY_STATE for NO_BASELINE)
+def decode_snapshot(data, baseline):
+    tick, baseline_tick, score, *counts = SNAPSHOT_HEADER.unpack_from(data, 0)
+    deltas = np.frombuffer(zlib.decompress(data[SNAPSHOT_HEADER.size:]), dtype=np.uint8)
+    offset = 0
+    arrays = []
+    for (name, dtype), count in zip(KINDS, counts):
+        size = count * dtype.itemsize
+        columns = deltas[offset:offset + size].reshape(dtype.itemsize, count)
+        offset += size
+        records = resized(getattr(baseline, name), dtype, count)
+        rows = np.ascontiguousarray((byte_columns(records) ^ columns).T)
+        arrays.append(rows.view(dtype).reshape(count))
+    return tick, baseline_tick, NetState(*arrays, score=score)
+
+def states_equal(a, b):
+    for name, dtype in KINDS:
+        first = getattr(a, name)
+        second = getattr(b, name)
+        size = max(len(first), len(second))
+        if not np.array_equal(resized(first, dtype, size), resized(second, dtype, size)):
+            return False
+    return a.score == b.score
+
+def pack_input(keys_pressed, shots, ack_tick):
+    return INPUT.pack(pack_keys(keys_pressed), min(shots, 255), ack_tick)
+
+# Fills keys_pressed in from the message and returns (shots, ack tick)
+def unpack_input(data, keys_pressed):
+    keys, shots, ack_tick = INPUT.unpack_from(data, 0)
+    unpack_keys(keys, keys_pressed)
+    return shots, ack_tick
@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+
+#
+#  Particles ---------------------------------------------------------------------------------
+#
+#  Little dots that fly out of an asteroid when it breaks, and out the back of the ship when it
+#  thrusts. They are only for looking at: they never hit anything, and they have their own
+#  random numbers, so a game plays out exactly the same with or without them.
+#
+#  A turtle for every dot would be far too slow, so the particles live in arrays, like the
+#  asteroids and bullets (see EntityArrays), and all of them move in one go each step.
+#
+#  There are only ever `capacity` of them. New particles go into the slots one after another,
+#  round and round like a clock hand:
+#
+#     slot:   0   1   2   3   4   5   6   7
+#                         ^ next_slot
+#
+#  so when every slot is in use, the next particle goes over the one that was made longest ago.
+#  A huge chain of explosions still costs at most `capacity` particles to move and draw.
+#
+#  The simulation only calls explode() and thrust() if the world has a ParticleSystem
+#  (world.particles), and the views make one. Headless runs don't have one and pay nothing.
+#
+
+PARTICLE_BUDGET = 256 # the most particles alive at once
+
+# Kinds of particle
+EXPLOSION = 1
+THRUST = 2
+
+EXPLOSION_PARTICLES = [0, 6, 10, 14] # per asteroid stage, bigger asteroids make more
+EXPLOSION_SPEED = (40.0, 140.0)
+EXPLOSION_LIFETIME = (0.3, 0.8) # seconds
+
+THRUST_RATE = 40.0 # particles a second while thrusting
+THRUST_SPEED = (80.0, 140.0)
+THRUST_LIFETIME = (0.15, 0.35)
+THRUST_SPREAD = 0.35 # radians either side of straight backwards
+SHIP_TAIL = 20 # how far behind the middle of the ship the flame starts
+
+PARTICLE_DRAG = 1.5 # how quickly particles slow down (1 / seconds)
+
+class ParticleSystem:
+    def __init__(self, capacity=PARTICLE_BUDGET, seed=None):
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+
+        self.position = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.age = np.zeros(capacity)
+        self.lifetime = np.ones(capacity)
+        self.kind = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.radius = np.zeros(capacity) # so the camera can cull them like everything else
+
+        self.next_slot = 0
+        self.thrust_carry = 0.0 # thrust particles owed, from steps too short to make a whole one
+
+        self.emitted = 0
+        self.recycled = 0 # emitted over a particle that was still alive
+
+    @property
+    def live_count(self):
+        return int(np.count_nonzero(self.active))
+
+    # The next `count` slots around the clock
+    def allocate(self, count):
+        count = min(count, self.capacity)
+        slots = (self.next_slot + np.arange(count)) % self.capacity
+        self.next_slot = (self.next_slot + count) % self.capacity
+        self.emitted += count
+        self.recycled += int(np.count_nonzero(self.active[slots]))
+        return slots
+
+    # Starts count particles at (x, y), heading out at angles (radians) with speeds between speed[0] and speed[1],
+    # on top of base_velocity
+    def emit(self, count, x, y, base_velocity, angles, speed, lifetime, kind):
+        slots = self.allocate(count)
+        count = len(slots)
+        speeds = self.rng.uniform(speed[0], speed[1], count)
+        self.position[slots] = (x, y)
+        self.velocity[slots, 0] = base_velocity[0] + np.cos(angles[:count]) * speeds
+        self.velocity[slots, 1] = base_velocity[1] + np.sin(angles[:count]) * speeds
+        self.age[slots] = 0.0
+        self.lifetime[slots] = self.rng.uniform(lifetime[0], lifetime[1], count)
+        self.kind[slots] = kind
+        self.active[slots] = True
+
+    # A ring of particles flying out of a broken asteroid of this stage
+    def explode(self, x, y, stage):
+        count = EXPLOSION_PARTICLES[stage]
+        angles = self.rng.uniform(0.0, 2 * math.pi, count)
+        self.emit(count, x, y, (0.0, 0.0), angles, EXPLOSION_SPEED, EXPLOSION_LIFETIME, EXPLOSION)
+
+    # Flame out of the back of a ship facing rotation (degrees), for a step of delta_time
+    def thrust(self, position, velocity, rotation, delta_time):
+        self.thrust_carry += THRUST_RATE * delta_time
+        count = int(self.thrust_carry)
+        if count == 0:
+            return
+        self.thrust_carry -= count
+        backwards = math.radians(rotation) + math.pi
+        tail_x = position.x + math.cos(backwards) * SHIP_TAIL
+        tail_y = position.y + math.sin(backwards) * SHIP_TAIL
+        angles = backwards + self.rng.uniform(-THRUST_SPREAD, THRUST_SPREAD, count)
+        self.emit(count, tail_x, tail_y, (velocity.x, velocity.y), angles, THRUST_SPEED, THRUST_LIFETIME, THRUST)
+
+    # Moves, slows down and ages every particle at once, and lets the old ones go.
+    # Particles wrap around the edges of a width by height world like everything else
+    def update(self, delta_time, width, height):
+        if not self.active.any():
+            return
+        active = self.active
+        self.position += self.velocity * delta_time
+        self.velocity *= max(0.0, 1.0 - PARTICLE_DRAG * delta_time)
+        self.age += delta_time
+        active &= self.age < self.lifetime
+
+        size = np.array([width, height])
+        outside = np.abs(self.position) > size / 2
+        if outside.any():
+            self.position -= np.copysign(size, self.position) * outside
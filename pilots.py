@@ -0,0 +1,164 @@
+import math
+import random
+
+import numpy as np
+
+import simulation
+from simulation import (RIGHT_KEY, LEFT_KEY, UP_KEY, request_shot,
+                        nearest_asteroids, asteroids_within, asteroid_ahead)
+from spatial import wrapped_delta
+
+#
+#  Pilots fly the ship when nobody is at the keyboard.
+#
+#  A pilot is anything with a control(world) function. It gets called right before every
+#  step, and presses keys the same way the keyboard does: by changing world.keys_pressed
+#  and calling request_shot(world).
+#
+#  Every pilot gets a seed, so the same pilot with the same seed flies the same way every time.
+#
+
+# Holds down a random set of keys for a random amount of time, then picks again
+class RandomPilot:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.ticks_until_change = 0
+        self.shoot_chance = 0.05
+
+    def control(self, world):
+        if self.ticks_until_change <= 0:
+            turn = self.rng.choice([None, RIGHT_KEY, LEFT_KEY])
+            world.keys_pressed[RIGHT_KEY] = turn == RIGHT_KEY
+            world.keys_pressed[LEFT_KEY] = turn == LEFT_KEY
+            world.keys_pressed[UP_KEY] = self.rng.random() < 0.3
+            self.ticks_until_change = self.rng.randint(5, 60)
+        self.ticks_until_change -= 1
+
+        if self.rng.random() < self.shoot_chance:
+            request_shot(world)
+
+# Sits still, spins in a circle and shoots every few ticks
+class SpinAndShootPilot:
+    def __init__(self, seed, every=15):
+        self.every = every
+
+    def control(self, world):
+        world.keys_pressed[RIGHT_KEY] = True
+        if world.tick % self.every == 0:
+            request_shot(world)
+
+# Does nothing at all, useful to see how long it takes the asteroids to win
+class IdlePilot:
+    def __init__(self, seed):
+        pass
+
+    def control(self, world):
+        pass
+
+# Actually tries to win. Every tick it asks the asteroid index (see "Asking where the asteroids are"
+# in simulation.py) instead of looking at every asteroid:
+#   - of the few closest asteroids, the ones heading straight for the ship come first, soonest first.
+#     If none are, it goes for whichever one it can shoot soonest
+#   - it turns to where that asteroid will be when the bullet gets there, and shoots
+#     when it is lined up, or when anything at all is straight ahead
+#   - when an asteroid is about to hit it from behind, it thrusts out of the way
+class AutoPilot:
+    def __init__(self, seed, candidates=6, shot_range=450, danger_radius=140, aim_tolerance=3.0,
+                 top_speed=60, margin=10, warning_time=1.0):
+        self.candidates = candidates       # how many of the nearest asteroids to think about
+        self.shot_range = shot_range       # only shoot at asteroids this close
+        self.danger_radius = danger_radius # only run from asteroids this close (plus their size)
+        self.aim_tolerance = aim_tolerance # degrees off target before we bother turning
+        self.top_speed = top_speed         # don't thrust faster than this
+        self.margin = margin               # passing closer than this (plus both sizes) counts as a hit
+        self.warning_time = warning_time   # seconds before a hit that we start running
+        self.time_since_shot = math.inf
+
+    # Where the asteroids in slots are from the ship, the short way around, and how fast they are coming at us
+    def relative_motion(self, world, slots):
+        asteroid_buffer = world.asteroid_buffer
+        main_player = world.main_player
+        player_position = np.array([main_player.position.x, main_player.position.y])
+        deltas = wrapped_delta(asteroid_buffer.position[slots], player_position, world.width, world.height)
+        velocities = asteroid_buffer.velocity[slots] - (main_player.velocity.x, main_player.velocity.y)
+        return deltas, velocities
+
+    # For each asteroid in slots, how many seconds until it hits the ship, or infinity if it is going to miss
+    def times_to_impact(self, world, deltas, velocities, slots):
+        speeds_squared = np.einsum('ij,ij->i', velocities, velocities)
+        closest_times = np.zeros(len(slots))
+        np.divide(-np.einsum('ij,ij->i', deltas, velocities), speeds_squared, out=closest_times,
+                  where=speeds_squared > 0.0)
+        misses = deltas + velocities * closest_times[:, np.newaxis]
+        reach = world.asteroid_buffer.radius[slots] + world.main_player.radius + self.margin
+        # Only ones getting closer (closest_times > 0) and passing within reach hit us
+        hits = (closest_times > 0.0) & (np.einsum('ij,ij->i', misses, misses) < reach * reach)
+        return np.where(hits, closest_times, np.inf)
+
+    # Which way to point to hit each asteroid (degrees), and how long the bullet takes to get there
+    def aims(self, world, deltas, slots):
+        # Where it will be by the time a bullet going straight at where it is now would get there
+        # (simulation.BULLET_SPEED, not a copy, so batch.py's --set BULLET_SPEED=... changes it here too)
+        flight_times = np.hypot(deltas[:, 0], deltas[:, 1]) / simulation.BULLET_SPEED
+        ahead = deltas + world.asteroid_buffer.velocity[slots] * flight_times[:, np.newaxis]
+        return np.degrees(np.arctan2(ahead[:, 1], ahead[:, 0])), flight_times
+
+    # How far to turn to face each rotation, -180 to 180 degrees, positive is to the left
+    def turns_towards(self, world, rotations):
+        return (rotations - world.main_player.rotation + 180.0) % 360.0 - 180.0
+
+    # Seconds to wait between shots. Bullets only go away when they hit something, or when every one is
+    # flying and shooting again takes back the oldest. Shooting any faster than this would take back
+    # bullets before they have gone shot_range, so they could never reach what they were shot at
+    def shot_interval(self, world):
+        return self.shot_range / (simulation.BULLET_SPEED * len(world.bullet_buffer))
+
+    def control(self, world):
+        main_player = world.main_player
+        keys_pressed = world.keys_pressed
+        keys_pressed[LEFT_KEY] = keys_pressed[RIGHT_KEY] = keys_pressed[UP_KEY] = False
+
+        slots, distances = nearest_asteroids(world, main_player.position, self.candidates)
+        if len(slots) == 0:
+            return
+
+        # Pick a target: the ones heading for us first, soonest first, then the rest by how soon we
+        # could shoot them (the time to turn to them plus the bullet's flight time)
+        deltas, velocities = self.relative_motion(world, slots)
+        rotations, flight_times = self.aims(world, deltas, slots)
+        turns = self.turns_towards(world, rotations)
+        times_to_hit = np.abs(turns) / main_player.ROTATION_SPEED + flight_times
+        target = np.lexsort((times_to_hit, self.times_to_impact(world, deltas, velocities, slots)))[0]
+        turn = turns[target]
+        if turn > self.aim_tolerance:
+            keys_pressed[LEFT_KEY] = True
+        elif turn < -self.aim_tolerance:
+            keys_pressed[RIGHT_KEY] = True
+
+        # Shoot when we're aimed where the target is going to be, or when anything at all is straight ahead
+        self.time_since_shot += world.delta_time # how long the last step was, the next will be the same
+        on_target = abs(turn) <= self.aim_tolerance and flight_times[target] * simulation.BULLET_SPEED <= self.shot_range
+        if (self.time_since_shot >= self.shot_interval(world)
+                and (on_target or asteroid_ahead(world, self.shot_range) is not None)):
+            request_shot(world)
+            self.time_since_shot = 0.0
+
+        # Run from anything about to hit us from behind. Thrust only pushes forwards, so only things behind count
+        if math.hypot(main_player.velocity.x, main_player.velocity.y) >= self.top_speed:
+            return
+        threats, threat_distances = asteroids_within(world, main_player.position,
+                                                     self.danger_radius + world.asteroid_index.max_radius)
+        if len(threats) == 0:
+            return
+        deltas, velocities = self.relative_motion(world, threats)
+        coming = self.times_to_impact(world, deltas, velocities, threats) <= self.warning_time
+        behind = np.abs(self.turns_towards(world, self.aims(world, deltas, threats)[0])) > 120.0
+        if (coming & behind).any():
+            keys_pressed[UP_KEY] = True
+
+PILOTS = {
+    'auto': AutoPilot,
+    'random': RandomPilot,
+    'spin': SpinAndShootPilot,
+    'idle': IdlePilot,
+}
@@ -0,0 +1,132 @@
+from collections import deque
+
+#
+#  A pool hands out slots (indices) in a buffer, and takes them back when we are done with them.
+#
+#  Before this, spawning an asteroid looked through the whole buffer from the start until it
+#  found a slot that was not active. That gets slower the more asteroids there are, and when
+#  every slot was full the game crashed.
+#
+#  The pool keeps a "free list": a list of every slot nobody is using. Getting a slot is just
+#  taking one off the end of the list, and giving it back is putting it on the end again.
+#  Neither of those cares how big the buffer is, so they take the same time with 50 slots
+#  or 50,000.
+#
+#  When the free list is empty the pool can either:
+#     - grow the buffer to growth_factor times as many slots (at least one more)
+#     - or, if recycle_oldest is on, take back the slot that was handed out the longest time ago
+#       (this is what the bullets do: if you shoot too many, your oldest bullet disappears)
+#
+#  Growing copies every array in the buffer, so it grows by a factor rather than a fixed number
+#  of slots. With a factor of 2, going from 50 slots to 6400 takes 7 grows instead of 127, and
+#  all the copying together adds up to less than one more copy of the final buffer:
+#
+#     50 -> 100 -> 200 -> 400 -> 800 -> 1600 -> 3200 -> 6400
+#     copied: 50 + 100 + ... + 3200 = 6350 slots, fewer than 6400
+#
+#  The storage is anything with an "active" array and a resize(capacity) function,
+#  like the EntityArrays in simulation.py.
+#
+
+class PoolExhaustedError(Exception):
+    pass
+
+class EntityPool:
+    def __init__(self, storage, growth_factor=None, recycle_oldest=False):
+        self.storage = storage
+        self.growth_factor = growth_factor # None if the buffer never grows
+        self.recycle_oldest = recycle_oldest
+
+        capacity = len(storage.active)
+        # Reversed so that pop() hands out slot 0 first, then 1, then 2...
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+        # Every time a slot is handed out its generation goes up by one.
+        # This lets us tell "slot 3 from the bullet I shot a second ago" apart from
+        # "slot 3 from a bullet I shot just now".
+        self.generation = [0] * capacity
+        # The order slots were handed out in, as (slot, generation) pairs. Only used for recycling
+        self.allocation_order = deque()
+
+        # Statistics
+        self.live_count = 0
+        self.high_water_mark = 0
+        self.allocations = 0
+        self.recycled = 0
+        self.grows = 0
+
+    def capacity(self):
+        return len(self.generation)
+
+    def grow(self, extra_slots):
+        old_capacity = self.capacity()
+        new_capacity = old_capacity + extra_slots
+        self.storage.resize(new_capacity)
+        self.generation.extend([0] * extra_slots)
+        # Push the new slots so the lowest one comes off the free list first
+        self.free_slots.extend(range(new_capacity - 1, old_capacity - 1, -1))
+        self.grows += 1
+
+    # Takes back the slot that was handed out the longest time ago and is still in use
+    def take_oldest(self):
+        while self.allocation_order:
+            slot, generation = self.allocation_order.popleft()
+            if self.storage.active[slot] and self.generation[slot] == generation:
+                self.release(slot)
+                self.recycled += 1
+                return self.free_slots.pop()
+        raise PoolExhaustedError('no slots in use to recycle')
+
+    # Returns the index of a slot that is now ours to use, and marks it active
+    def allocate(self):
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        elif self.growth_factor is not None:
+            capacity = self.capacity()
+            self.grow(max(1, int(capacity * self.growth_factor) - capacity))
+            slot = self.free_slots.pop()
+        elif self.recycle_oldest:
+            slot = self.take_oldest()
+        else:
+            raise PoolExhaustedError('all ' + str(self.capacity()) + ' slots are in use')
+
+        self.storage.active[slot] = True
+        self.generation[slot] += 1
+        self.allocations += 1
+        self.live_count += 1
+        if self.live_count > self.high_water_mark:
+            self.high_water_mark = self.live_count
+
+        if self.recycle_oldest:
+            self.allocation_order.append((slot, self.generation[slot]))
+            # Slots that were released normally leave old pairs behind in allocation_order.
+            # Every so often we throw those away so it doesn't keep growing forever
+            if len(self.allocation_order) > 2 * self.capacity():
+                self.allocation_order = deque(
+                    (old_slot, generation) for old_slot, generation in self.allocation_order
+                    if self.storage.active[old_slot] and self.generation[old_slot] == generation)
+        return slot
+
+    # Gives a slot back to the pool. Giving back a slot that is not in use does nothing,
+    # so it is safe if two things try to release the same slot in one frame
+    def release(self, slot):
+        if not self.storage.active[slot]:
+            return
+        self.storage.active[slot] = False
+        self.free_slots.append(slot)
+        self.live_count -= 1
+
+    # Gives back every slot at once
+    def release_all(self):
+        self.storage.active[:] = False
+        self.free_slots = list(range(self.capacity() - 1, -1, -1))
+        self.allocation_order.clear()
+        self.live_count = 0
+
+    def stats(self):
+        return {'capacity': self.capacity(),
+                'live': self.live_count,
+                'high_water_mark': self.high_water_mark,
+                'allocations': self.allocations,
+                'recycled': self.recycled,
+                'grows': self.grows}
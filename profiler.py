@@ -0,0 +1,138 @@
+import csv
+import json
+import time
+
+import numpy as np
+
+#
+#  The frame profiler measures how long each part ("phase") of a frame takes.
+#
+#  Each phase calls profiler.mark('name') when it finishes. The time since the last
+#  start() or mark() gets added to that phase for the current frame:
+#
+#      profiler.start()
+#      process_inputs(world)
+#      profiler.mark('input')        <- time spent in process_inputs
+#      handle_collisions(world)
+#      profiler.mark('collisions')   <- time spent in handle_collisions
+#
+#  When a frame ends its times are saved into a "ring buffer": an array with room for
+#  `capacity` frames. When it's full we start writing over the oldest frame again,
+#  so the profiler never uses more memory no matter how long the game runs.
+#
+#  When we don't want to profile we use NULL_PROFILER instead, whose functions do nothing at all.
+#  That way the calls can stay in the game loop and cost next to nothing.
+#
+
+PHASES = ['input', 'collisions', 'movement', 'animation', 'draw', 'update']
+
+# Where each histogram bucket starts, in milliseconds. A bucket goes up to where the next one starts,
+# and the last one has no end, so a frame that took seconds (a stall, a breakpoint) is still counted
+HISTOGRAM_BUCKETS_MS = [0.0, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 33.0, 66.0, 1000.0]
+
+class FrameProfiler:
+    def __init__(self, phases=PHASES, capacity=3600):
+        self.phases = list(phases)
+        self.phase_index = {phase: i for i, phase in enumerate(self.phases)}
+        self.capacity = capacity
+
+        # samples[frame, phase] -> seconds spent in that phase during that frame
+        self.samples = np.zeros((capacity, len(self.phases)))
+        self.frame_count = 0
+
+        self.current = [0.0] * len(self.phases)
+        self.last_time = time.perf_counter()
+
+    def start(self):
+        self.last_time = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.current[self.phase_index[phase]] += now - self.last_time
+        self.last_time = now
+
+    def begin_frame(self):
+        self.current = [0.0] * len(self.phases)
+        self.last_time = time.perf_counter()
+
+    def end_frame(self):
+        self.samples[self.frame_count % self.capacity] = self.current
+        self.frame_count += 1
+
+    # Returns the frames we still have, oldest first, in milliseconds
+    def recorded_frames(self):
+        if self.frame_count <= self.capacity:
+            frames = self.samples[:self.frame_count]
+        else:
+            oldest = self.frame_count % self.capacity
+            frames = np.concatenate([self.samples[oldest:], self.samples[:oldest]])
+        return frames * 1000.0
+
+    # Returns {phase: {'p50': ..., 'p95': ..., 'p99': ..., 'worst': ..., 'worst_frame': ...}}
+    # All the times are in milliseconds. 'frame' is the whole frame (every phase added up)
+    def summary(self):
+        frames = self.recorded_frames()
+        first_frame = self.frame_count - len(frames)
+        columns = {phase: frames[:, i] for i, phase in enumerate(self.phases)}
+        columns['frame'] = frames.sum(axis=1)
+
+        summary = {}
+        for phase, times in columns.items():
+            if len(times) == 0:
+                summary[phase] = None
+                continue
+            p50, p95, p99 = np.percentile(times, [50, 95, 99])
+            worst = int(np.argmax(times))
+            summary[phase] = {'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+                              'worst': float(times[worst]),
+                              'worst_frame': first_frame + worst}
+        return summary
+
+    # Returns {phase: counts} of how many frames fell into each HISTOGRAM_BUCKETS_MS bucket
+    def histograms(self):
+        frames = self.recorded_frames()
+        histograms = {}
+        for i, phase in enumerate(self.phases):
+            counts, edges = np.histogram(frames[:, i], bins=HISTOGRAM_BUCKETS_MS + [np.inf])
+            histograms[phase] = counts.tolist()
+        return histograms
+
+    # Saves the timings to a file.
+    # .csv gets one row per frame, anything else gets JSON with the summary and histograms
+    def dump(self, path):
+        frames = self.recorded_frames()
+        if str(path).endswith('.csv'):
+            first_frame = self.frame_count - len(frames)
+            with open(path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['frame'] + [phase + '_ms' for phase in self.phases])
+                for i, row in enumerate(frames.tolist()):
+                    writer.writerow([first_frame + i] + row)
+        else:
+            with open(path, 'w') as file:
+                json.dump({'frames': self.frame_count,
+                           'frames_kept': len(frames),
+                           'summary_ms': self.summary(),
+                           'histogram_buckets_ms': HISTOGRAM_BUCKETS_MS,
+                           'histograms': self.histograms()},
+                          file, indent=2)
+
+    # Prints a little table of the summary
+    def report(self):
+        print('phase'.ljust(12), 'p50'.rjust(8), 'p95'.rjust(8), 'p99'.rjust(8), 'worst'.rjust(8), '(ms)')
+        for phase, stats in self.summary().items():
+            if stats is None:
+                continue
+            print(phase.ljust(12), *[('%.3f' % stats[key]).rjust(8) for key in ['p50', 'p95', 'p99', 'worst']])
+
+class NullProfiler:
+    def start(self):
+        pass
+    def mark(self, phase):
+        pass
+    def begin_frame(self):
+        pass
+    def end_frame(self):
+        pass
+
+NULL_PROFILER = NullProfiler()
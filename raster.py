@@ -0,0 +1,428 @@
+import argparse
+import struct
+import time
+
+import numpy as np
+
+from simulation import (World, SPACESHIP_SPRITE_INFO, SPACESHIP_ACCELERATE_SPRITE_INFO, BULLET_SPRITE_INFO,
+                        ASTEROID_INFO, WINDOW_WIDTH, WINDOW_HEIGHT, step_world, player_sprite_info, is_flickered_out)
+from replay import Recording, unpack_keys
+from pilots import PILOTS
+from particles import ParticleSystem, PARTICLE_BUDGET
+
+#
+#  Drawing without a window ----------------------------------------------------------------
+#
+#  The views draw into a Tk window, and update() can only do so many frames a second.
+#  To turn a replay into a video, or to give an agent pictures instead of numbers,
+#  we want pixels much faster than that, and without a screen at all.
+#
+#  A Rasterizer draws worlds straight into NumPy arrays ("frame buffers"): one byte per pixel,
+#  0 for black and 255 for white, at any resolution. It draws the same shapes as the views:
+#  the ship from SPACESHIP_SPRITE_INFO, square bullets and round asteroids.
+#
+#  Nothing is drawn one shape at a time. Every shape is turned into a list of pixel offsets once,
+#  when the Rasterizer is made (a "stamp"):
+#
+#     an asteroid of stage 1 at 300 x 200:    . # # # .
+#                                             # . . . #
+#                                             # . * . #    <- light up every # around the *
+#                                             # . . . #
+#                                             . # # # .
+#
+#  and drawing is adding the stamp to the positions of *every* asteroid at once, and setting all
+#  of those pixels to 255 in one go. The ship turns, so its stamp is points along its edges,
+#  turned to its heading first. Things near an edge wrap around to the other side, like in the game.
+#
+#  Frames go in batches: frames[i] is the picture of the i-th world, so one call can draw a list of
+#  Worlds, or every world in a VectorEnv (see vector_env.py).
+#
+
+WHITE = 255
+
+# The pixel offsets (row, column) of a circle of radius (in pixels) radius_x by radius_y.
+# Outlines are about one pixel thick, like the canvas draws them. The middle pixel is always
+# in, so even a circle smaller than a pixel still shows up
+def circle_stamp(radius_x, radius_y, filled):
+    reach_x = int(np.ceil(radius_x))
+    reach_y = int(np.ceil(radius_y))
+    rows, columns = np.mgrid[-reach_y:reach_y + 1, -reach_x:reach_x + 1]
+    distance = np.sqrt((columns / max(radius_x, 1e-9)) ** 2 + (rows / max(radius_y, 1e-9)) ** 2)
+    inside = distance <= 1.0
+    if not filled:
+        inside &= (1.0 - distance) * min(radius_x, radius_y) < 1.0
+    inside[reach_y, reach_x] = True
+    return np.stack([rows[inside], columns[inside]], axis=1)
+
+# Points along the edges of a sprite's polygons, in sprite coordinates, close enough together
+# that no pixel gets skipped at the given scale (pixels per world unit)
+def outline_points(polygons, scale):
+    points = []
+    for polygon in polygons:
+        corners = np.array(polygon, dtype=float)
+        if len(corners) == 0:
+            continue
+        for start, end in zip(corners, np.roll(corners, -1, axis=0)):
+            steps = max(1, int(np.ceil(np.hypot(*(end - start)) * scale * 2)))
+            fraction = np.arange(steps)[:, None] / steps
+            points.append(start + (end - start) * fraction)
+    if not points:
+        return np.zeros((0, 2))
+    return np.concatenate(points)
+
+#
+#  One table of stamps ----------------------------------------------------------------------
+#
+#  Drawing a VectorEnv, there are thousands of asteroids of each stage, and adding one stamp to all
+#  of them at once is as quick as it gets. Drawing a single World, there are only a few of each,
+#  and the dozen or so NumPy calls per kind of thing cost far more than the pixels they light up.
+#
+#  So for Worlds every stamp also goes end to end in one table, and everything gets a stamp number:
+#
+#     stamp number    0          1           2           3          4
+#     is a          particle  asteroid 1  asteroid 2  asteroid 3   bullet
+#     table         [.][. . . . . . . .][. . . . . .][. . . .][. . . . . . . . .]
+#                    ^ stamp n starts at stamp_start[n] and is stamp_length[n] long
+#
+#  An asteroid's stamp number is just its stage. Then the asteroids, bullets and particles of a world
+#  (or of a whole list of worlds) are one list of positions and one list of stamp numbers,
+#  and all of them are drawn in one go.
+#
+
+PARTICLE = 0
+BULLET = len(ASTEROID_INFO['radii']) # straight after the last asteroid stage
+
+# Draws the whole of a world_width by world_height world into width by height pixels
+class Rasterizer:
+    def __init__(self, width=WINDOW_WIDTH, height=WINDOW_HEIGHT, filled=False,
+                 world_width=WINDOW_WIDTH, world_height=WINDOW_HEIGHT):
+        self.width = width
+        self.height = height
+        self.world_width = world_width
+        self.world_height = world_height
+        self.scale_x = width / world_width
+        self.scale_y = height / world_height
+
+        # One stamp per asteroid stage (stage 0 is "no asteroid" and never drawn)
+        self.asteroid_stamps = [None]
+        for radius in ASTEROID_INFO['radii'][1:]:
+            self.asteroid_stamps.append(circle_stamp(radius * self.scale_x, radius * self.scale_y, filled))
+
+        # Bullets are a small square that never turns
+        half = np.abs(np.array(BULLET_SPRITE_INFO['coordinates'][0], dtype=float)).max()
+        reach_x = int(half * self.scale_x)
+        reach_y = int(half * self.scale_y)
+        rows, columns = np.mgrid[-reach_y:reach_y + 1, -reach_x:reach_x + 1]
+        self.bullet_stamp = np.stack([rows.ravel(), columns.ravel()], axis=1)
+
+        stamps = [np.zeros((1, 2), dtype=np.int64)] + self.asteroid_stamps[1:] + [self.bullet_stamp]
+        self.stamp_table = np.concatenate(stamps).astype(np.int64)
+        self.stamp_length = np.array([len(stamp) for stamp in stamps], dtype=np.int64)
+        self.stamp_start = np.cumsum(self.stamp_length) - self.stamp_length
+
+        scale = max(self.scale_x, self.scale_y)
+        self.ship_outlines = {info['name']: outline_points(info['coordinates'], scale)
+                              for info in (SPACESHIP_SPRITE_INFO, SPACESHIP_ACCELERATE_SPRITE_INFO)}
+
+    def new_frames(self, count):
+        return np.zeros((count, self.height, self.width), dtype=np.uint8)
+
+    # The (row, column) pixel of world positions (any shape ending in [x, y])
+    def to_pixels(self, positions):
+        columns = np.floor((positions[..., 0] + self.world_width / 2) * self.scale_x).astype(np.int64)
+        rows = np.floor((self.world_height / 2 - positions[..., 1]) * self.scale_y).astype(np.int64)
+        return rows, columns
+
+    # Lights up stamp around every position. frame_index says which frame each position goes in
+    def draw_stamps(self, frames, frame_index, positions, stamp):
+        if len(positions) == 0:
+            return
+        rows, columns = self.to_pixels(positions)
+        rows = (rows[:, None] + stamp[None, :, 0]) % self.height
+        columns = (columns[:, None] + stamp[None, :, 1]) % self.width
+        # Indexing the flat frame buffer with one number per pixel is much quicker than with three
+        flat = (frame_index[:, None] * self.height + rows) * self.width + columns
+        frames.reshape(-1)[flat.ravel()] = WHITE
+
+    # Lights up the stamp of every position, each with its own stamp number (see the table above)
+    def draw_numbered_stamps(self, frames, frame_index, positions, stamp_numbers):
+        rows, columns = self.to_pixels(positions)
+        lengths = self.stamp_length[stamp_numbers]
+        # Which position each pixel belongs to, and where in the table its offset is:
+        # a position's first pixel is at its stamp's start, and the rest follow on from it
+        owner = np.repeat(np.arange(len(positions)), lengths)
+        first_pixel = np.cumsum(lengths) - lengths
+        offsets = self.stamp_table[np.arange(len(owner)) + (self.stamp_start[stamp_numbers] - first_pixel)[owner]]
+        rows = (rows[owner] + offsets[:, 0]) % self.height
+        columns = (columns[owner] + offsets[:, 1]) % self.width
+        frames.reshape(-1)[(frame_index[owner] * self.height + rows) * self.width + columns] = WHITE
+
+    def draw_asteroids(self, frames, frame_index, positions, stages):
+        for stage in range(1, len(self.asteroid_stamps)):
+            these = stages == stage
+            self.draw_stamps(frames, frame_index[these], positions[these], self.asteroid_stamps[stage])
+
+    def draw_bullets(self, frames, frame_index, positions):
+        self.draw_stamps(frames, frame_index, positions, self.bullet_stamp)
+
+    # Draws one ship shape (a key of ship_outlines) at each position, turned to each heading (in degrees).
+    # The shape is turned the same way as sprite_polygon_coordinates in canvas_view.py
+    def draw_ships(self, frames, frame_index, positions, headings, sprite_name):
+        outline = self.ship_outlines[sprite_name]
+        if len(positions) == 0 or len(outline) == 0:
+            return
+        radians = np.radians(headings)
+        forward_x = np.cos(radians)[:, None]
+        forward_y = np.sin(radians)[:, None]
+        shape_x = outline[None, :, 0]
+        shape_y = outline[None, :, 1]
+        points = np.empty((len(positions), len(outline), 2))
+        points[:, :, 0] = positions[:, None, 0] + forward_y * shape_x + forward_x * shape_y
+        points[:, :, 1] = positions[:, None, 1] - forward_x * shape_x + forward_y * shape_y
+        rows, columns = self.to_pixels(points)
+        flat = (frame_index[:, None] * self.height + rows % self.height) * self.width + columns % self.width
+        frames.reshape(-1)[flat.ravel()] = WHITE
+
+    #
+    #  Drawing whole worlds --------------------------------------------------------------
+    #
+
+    # Draws a list of Worlds, worlds[i] into frames[i]. Makes the frames if none are given
+    def render_worlds(self, worlds, frames=None):
+        if frames is None:
+            frames = self.new_frames(len(worlds))
+        frames[:len(worlds)] = 0
+
+        # Every asteroid, bullet and particle of every world, in one list
+        frame_index = []
+        positions = []
+        stamp_numbers = []
+        for i, world in enumerate(worlds):
+            asteroids = world.asteroid_buffer
+            bullets = world.bullet_buffer
+            asteroid_slots = np.flatnonzero(asteroids.active)
+            bullet_slots = np.flatnonzero(bullets.active)
+            positions += [asteroids.position[asteroid_slots], bullets.position[bullet_slots]]
+            stamp_numbers += [asteroids.health[asteroid_slots], np.full(len(bullet_slots), BULLET)]
+            count = len(asteroid_slots) + len(bullet_slots)
+            if world.particles is not None:
+                particle_slots = np.flatnonzero(world.particles.active)
+                positions.append(world.particles.position[particle_slots])
+                stamp_numbers.append(np.full(len(particle_slots), PARTICLE))
+                count += len(particle_slots)
+            frame_index.append(np.full(count, i))
+        self.draw_numbered_stamps(frames, np.concatenate(frame_index), np.concatenate(positions),
+                                  np.concatenate(stamp_numbers).astype(np.int64))
+
+        # Ships with the same picture get drawn together. A flickering ship isn't drawn at all
+        for sprite_name in self.ship_outlines:
+            indices = [i for i, world in enumerate(worlds)
+                       if world.main_player.health > 0 and player_sprite_info(world)['name'] == sprite_name]
+            if not indices:
+                continue
+            players = [worlds[i].main_player for i in indices]
+            positions = np.array([(player.position.x, player.position.y) for player in players])
+            headings = np.array([player.rotation for player in players])
+            self.draw_ships(frames, np.array(indices), positions, headings, sprite_name)
+        return frames[:len(worlds)]
+
+    def render_world(self, world, frame=None):
+        return self.render_worlds([world], None if frame is None else frame[None])[0]
+
+    # Draws every world of a VectorEnv, world w into frames[w]
+    def render_env(self, env, frames=None):
+        if frames is None:
+            frames = self.new_frames(env.num_worlds)
+        frames[:] = 0
+        worlds, slots = np.nonzero(env.asteroid_active)
+        self.draw_asteroids(frames, worlds, env.asteroid_position[worlds, slots], env.asteroid_stage[worlds, slots])
+        worlds, slots = np.nonzero(env.bullet_active)
+        self.draw_bullets(frames, worlds, env.bullet_position[worlds, slots])
+        # The VectorEnv doesn't remember who is thrusting, so every ship gets the plain picture
+        visible = np.flatnonzero((env.player_health > 0) & ~is_flickered_out(env.invincibility))
+        self.draw_ships(frames, visible, env.player_position[visible], env.player_rotation[visible],
+                        SPACESHIP_SPRITE_INFO['name'])
+        return frames
+
+#
+#  Pictures for training ----------------------------------------------------------------
+#
+#  Wraps a VectorEnv so reset() and step() give frames[w] (a height x width picture per world)
+#  instead of the usual rows of numbers. The frames are drawn into the same array every step,
+#  so copy them if you keep them.
+#
+
+class PixelEnv:
+    def __init__(self, env, rasterizer):
+        self.env = env
+        self.rasterizer = rasterizer
+        self.frames = rasterizer.new_frames(env.num_worlds)
+
+    def reset(self, mask=None):
+        self.env.reset(mask)
+        return self.rasterizer.render_env(self.env, self.frames)
+
+    def step(self, actions):
+        observations, rewards, dones = self.env.step(actions)
+        return self.rasterizer.render_env(self.env, self.frames), rewards, dones
+
+#
+#  Saving frames ---------------------------------------------------------------------------
+#
+#  A FrameWriter saves frames to one file, batch_size frames at a time:
+#     .raw -> just the pixels, frame after frame (width * height bytes each)
+#     .ppm -> a PPM image per frame, one after the other (most image tools and ffmpeg read these)
+#     .npy -> a NumPy array of shape (frames, height, width), for np.load
+#
+#  A .npy file starts with the shape, which we don't know until the end, so the header gets
+#  enough room for any number of frames and is filled in properly by close()
+#
+
+NPY_HEADER_SIZE = 128
+
+def npy_header(count, height, width):
+    description = repr({'descr': '|u1', 'fortran_order': False, 'shape': (count, height, width)})
+    # magic, version 1.0, header length, then the description padded with spaces up to NPY_HEADER_SIZE
+    prefix = b'\x93NUMPY\x01\x00' + struct.pack('<H', NPY_HEADER_SIZE - 10)
+    return prefix + description.encode('latin1').ljust(NPY_HEADER_SIZE - 11) + b'\n'
+
+class FrameWriter:
+    def __init__(self, path, width, height, batch_size=256, format=None):
+        self.format = format or str(path).rsplit('.', 1)[-1].lower()
+        if self.format not in ('raw', 'ppm', 'npy'):
+            raise ValueError('frames can be saved as raw, ppm or npy, not ' + self.format)
+        self.width = width
+        self.height = height
+        self.file = open(path, 'wb')
+        self.batch = np.zeros((batch_size, height, width), dtype=np.uint8)
+        self.batched = 0
+        self.count = 0
+        if self.format == 'npy':
+            self.file.write(npy_header(0, height, width))
+        self.ppm_header = ('P6\n' + str(width) + ' ' + str(height) + '\n255\n').encode('ascii')
+
+    # Somewhere to draw the next frame into. Call done() after drawing it
+    def next_frame(self):
+        if self.batched == len(self.batch):
+            self.flush()
+        return self.batch[self.batched]
+
+    def done(self):
+        self.batched += 1
+
+    def write(self, frames):
+        for frame in frames:
+            self.next_frame()[:] = frame
+            self.done()
+
+    def flush(self):
+        frames = self.batch[:self.batched]
+        if self.format == 'ppm':
+            # PPM pixels are red, green, blue, so every grey byte goes in three times
+            rgb = np.repeat(frames[:, :, :, None], 3, axis=3).reshape(len(frames), -1)
+            for pixels in rgb:
+                self.file.write(self.ppm_header)
+                self.file.write(pixels.tobytes())
+        else:
+            frames.tofile(self.file)
+        self.count += self.batched
+        self.batched = 0
+
+    def close(self):
+        self.flush()
+        if self.format == 'npy':
+            self.file.seek(0)
+            self.file.write(npy_header(self.count, self.height, self.width))
+        self.file.close()
+
+#
+#  Exporting a game -------------------------------------------------------------------------
+#
+
+# Plays a game (a replay, or a pilot with a seed) and draws every step into writer.
+# Returns how many frames were drawn and how long the drawing itself took
+def export_frames(rasterizer, writer, recording=None, pilot_name='random', seed=0, max_ticks=1000,
+                  particle_budget=PARTICLE_BUDGET):
+    if recording is not None:
+        world = recording.make_world()
+        keys = recording.ticks['keys'].tolist()
+        shots = recording.ticks['shots'].tolist()
+        delta_times = recording.ticks['delta_time'].tolist()
+        max_ticks = min(max_ticks, len(keys)) if max_ticks else len(keys)
+    else:
+        world = World(seed=seed)
+        pilot = PILOTS[pilot_name](seed)
+    if particle_budget > 0:
+        world.particles = ParticleSystem(particle_budget, seed)
+
+    drawing = 0.0
+    frames = 0
+    while frames < max_ticks and not world.is_game_over():
+        if recording is not None:
+            unpack_keys(keys[frames], world.keys_pressed)
+            world.pending_shots = shots[frames]
+            step_world(world, delta_times[frames])
+        else:
+            pilot.control(world)
+            step_world(world, 1 / 60)
+        frame = writer.next_frame() # saves the batch when it is full, which isn't drawing
+        start = time.perf_counter()
+        rasterizer.render_world(world, frame)
+        drawing += time.perf_counter() - start
+        writer.done()
+        frames += 1
+    return frames, drawing
+
+def __main__():
+    parser = argparse.ArgumentParser(description='Draw Asteroids games into image files without a window')
+    parser.add_argument('--width', type=int, default=WINDOW_WIDTH // 2)
+    parser.add_argument('--height', type=int, default=WINDOW_HEIGHT // 2)
+    parser.add_argument('--filled', action='store_true', help='draw solid asteroids instead of outlines')
+    parser.add_argument('--output', metavar='PATH', default=None, help='a .raw, .ppm or .npy file to save frames to')
+    parser.add_argument('--batch-size', type=int, default=256, help='frames saved to the file at a time')
+    parser.add_argument('--replay', metavar='PATH', default=None, help='draw a recording made with Asteroids.py --record')
+    parser.add_argument('--pilot', choices=list(PILOTS), default='random')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ticks', type=int, default=1000)
+    parser.add_argument('--particles', type=int, default=PARTICLE_BUDGET, help='particle budget, 0 for none')
+    parser.add_argument('--env-worlds', type=int, default=None,
+                        help='instead, time drawing this many VectorEnv worlds a step')
+    args = parser.parse_args()
+
+    rasterizer = Rasterizer(args.width, args.height, args.filled)
+
+    if args.env_worlds:
+        from vector_env import VectorEnv
+        pixel_env = PixelEnv(VectorEnv(args.env_worlds, seed=args.seed), rasterizer)
+        pixel_env.reset()
+        rng = np.random.default_rng(args.seed)
+        drawing = 0.0
+        for i in range(args.ticks):
+            actions = np.stack([rng.integers(-1, 2, args.env_worlds), rng.random(args.env_worlds) < 0.3,
+                                rng.random(args.env_worlds) < 0.1], axis=1)
+            pixel_env.env.step(actions)
+            start = time.perf_counter()
+            rasterizer.render_env(pixel_env.env, pixel_env.frames)
+            drawing += time.perf_counter() - start
+        frames = args.env_worlds * args.ticks
+        print(frames, 'frames of', args.width, 'x', args.height, 'drawn in', round(drawing, 3), 'seconds:',
+              round(frames / drawing), 'frames/s')
+        return
+
+    if args.output is None:
+        parser.error('--output is needed unless timing with --env-worlds')
+    writer = FrameWriter(args.output, args.width, args.height, args.batch_size)
+    recording = Recording(args.replay) if args.replay else None
+    if recording is not None:
+        # A recording of a bigger world gets the whole world squashed into the frame
+        rasterizer = Rasterizer(args.width, args.height, args.filled, recording.width, recording.height)
+    start = time.perf_counter()
+    frames, drawing = export_frames(rasterizer, writer, recording, args.pilot, args.seed, args.ticks,
+                                     args.particles)
+    writer.close()
+    elapsed = time.perf_counter() - start
+    print(frames, 'frames of', args.width, 'x', args.height, 'saved to', args.output, 'in', round(elapsed, 3),
+          'seconds, drawing alone:', round(frames / drawing) if drawing > 0 else 0, 'frames/s')
+
+if __name__ == '__main__':
+    __main__()
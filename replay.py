@@ -0,0 +1,176 @@
+import hashlib
+import struct
+import time
+
+import numpy as np
+
+from simulation import World, step_world
+from profiler import NULL_PROFILER
+
+#
+#  Recording and replaying games ------------------------------------------------------------
+#
+#  A World made with the same seed, and given exactly the same inputs on exactly the same
+#  steps, plays out exactly the same. So to save a whole game we don't need to save where
+#  every asteroid was on every frame, only:
+#     - the seed and the size of the buffers (to make the same World again)
+#     - for every step: which keys were held down, how many shots were fired, and the delta_time
+#
+#  That is 11 bytes a step, about 40KB for a whole minute of play.
+#
+#  Every so often we also save a "checksum" of the whole world: a short fingerprint made from
+#  every position, velocity, health... If replaying gives a different checksum at the same step,
+#  something in the simulation has changed (or is not deterministic) and we know which step it started on.
+#
+#  File layout (all little endian):
+#     header:       magic 'ASRP', version, seed, asteroid capacity, bullet capacity, world width and height,
+#                   checkpoint interval, number of ticks, number of checkpoints
+#     ticks:        one TICK_DTYPE record per step
+#     checkpoints:  (tick, 16 byte checksum) for every checkpoint
+#
+
+MAGIC = b'ASRP'
+VERSION = 4
+HEADER = struct.Struct('<4sHqIIddIII') # the seed is signed: random.Random is happy with a negative one
+CHECKPOINT = struct.Struct('<I16s')
+
+TICK_DTYPE = np.dtype([('keys', 'u1'), ('shots', '<u2'), ('delta_time', '<f8')])
+TICK = struct.Struct('<BHd') # one TICK_DTYPE record
+
+# Turns the keys_pressed list into one number, one bit per key
+def pack_keys(keys_pressed):
+    bits = 0
+    for i, pressed in enumerate(keys_pressed):
+        if pressed:
+            bits |= 1 << i
+    return bits
+
+def unpack_keys(bits, keys_pressed):
+    for i in range(len(keys_pressed)):
+        keys_pressed[i] = bool(bits & (1 << i))
+
+# A 16 byte fingerprint of everything in the world that affects what happens next
+def world_checksum(world):
+    checksum = hashlib.blake2b(digest_size=16)
+    main_player = world.main_player
+    checksum.update(struct.pack('<qddddddqqq', main_player.health,
+                                main_player.position.x, main_player.position.y,
+                                main_player.velocity.x, main_player.velocity.y,
+                                main_player.rotation, main_player.invincibility_frames,
+                                world.ScoreInfo.current_score, world.tick, world.pending_shots))
+    # Where the random numbers are up to: two worlds that used a different number of them
+    # pick different asteroids from then on, even if everything else is the same so far
+    rng_version, rng_state, gauss_next = world.rng.getstate()
+    checksum.update(np.array(rng_state, dtype=np.uint32).tobytes())
+    checksum.update(struct.pack('<d', float('nan') if gauss_next is None else gauss_next))
+    for buffer in (world.asteroid_buffer, world.bullet_buffer):
+        active = buffer.active
+        checksum.update(np.ascontiguousarray(active).tobytes())
+        checksum.update(np.ascontiguousarray(buffer.position[active]).tobytes())
+        checksum.update(np.ascontiguousarray(buffer.velocity[active]).tobytes())
+        checksum.update(np.ascontiguousarray(buffer.health[active]).tobytes())
+    return checksum.digest()
+
+#
+#  Recording --------------------------------------------------------------------------
+#
+
+class InputRecorder:
+    def __init__(self, world, checkpoint_interval=60):
+        self.seed = world.seed
+        self.asteroid_capacity = len(world.asteroid_buffer)
+        self.bullet_capacity = len(world.bullet_buffer)
+        self.width = world.width
+        self.height = world.height
+        self.checkpoint_interval = checkpoint_interval
+        self.ticks = bytearray()
+        self.checkpoints = [(world.tick, world_checksum(world))]
+
+    # Call this right before step_world to remember the inputs that step will use
+    def record(self, world, delta_time):
+        self.ticks += TICK.pack(pack_keys(world.keys_pressed), world.pending_shots, delta_time)
+
+    # Call this right after step_world
+    def after_step(self, world):
+        if world.tick % self.checkpoint_interval == 0 or world.is_game_over():
+            self.checkpoints.append((world.tick, world_checksum(world)))
+
+    def save(self, path, world=None):
+        # Always finish with a checkpoint of the final state
+        if world is not None and self.checkpoints[-1][0] != world.tick:
+            self.checkpoints.append((world.tick, world_checksum(world)))
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, self.seed, self.asteroid_capacity, self.bullet_capacity,
+                                   self.width, self.height, self.checkpoint_interval, len(self.ticks) // TICK_DTYPE.itemsize,
+                                   len(self.checkpoints)))
+            file.write(self.ticks)
+            for tick, checksum in self.checkpoints:
+                file.write(CHECKPOINT.pack(tick, checksum))
+
+# Steps the world and records the step. Use this in place of step_world while recording
+def record_step(world, delta_time, recorder, profiler=NULL_PROFILER):
+    recorder.record(world, delta_time)
+    step_world(world, delta_time, profiler)
+    recorder.after_step(world)
+
+#
+#  Replaying --------------------------------------------------------------------------
+#
+
+class Recording:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            data = file.read()
+        (magic, version, self.seed, self.asteroid_capacity, self.bullet_capacity, self.width, self.height,
+         self.checkpoint_interval, tick_count, checkpoint_count) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(str(path) + ' is not an Asteroids recording')
+        if version != VERSION:
+            raise ValueError('recording version ' + str(version) + ' is not supported')
+
+        offset = HEADER.size
+        self.ticks = np.frombuffer(data, dtype=TICK_DTYPE, count=tick_count, offset=offset)
+        offset += tick_count * TICK_DTYPE.itemsize
+        self.checkpoints = {}
+        for i in range(checkpoint_count):
+            tick, checksum = CHECKPOINT.unpack_from(data, offset + i * CHECKPOINT.size)
+            self.checkpoints[tick] = checksum
+
+    def make_world(self):
+        return World(asteroid_capacity=self.asteroid_capacity, bullet_capacity=self.bullet_capacity,
+                     seed=self.seed, width=self.width, height=self.height)
+
+# Re-simulates a recording as fast as possible and checks every checkpoint.
+# Returns a dict with how it went, including the first tick whose checksum didn't match (or None)
+def replay(recording):
+    world = recording.make_world()
+    mismatch = None
+    checked = 0
+    if 0 in recording.checkpoints and recording.checkpoints[0] != world_checksum(world):
+        mismatch = 0
+
+    keys = recording.ticks['keys'].tolist()
+    shots = recording.ticks['shots'].tolist()
+    delta_times = recording.ticks['delta_time'].tolist()
+
+    start = time.perf_counter()
+    for i in range(len(keys)):
+        unpack_keys(keys[i], world.keys_pressed)
+        world.pending_shots = shots[i]
+        step_world(world, delta_times[i])
+
+        expected = recording.checkpoints.get(world.tick)
+        if expected is not None:
+            checked += 1
+            if mismatch is None and expected != world_checksum(world):
+                mismatch = world.tick
+    elapsed = time.perf_counter() - start
+
+    return {'ticks': len(keys),
+            'seconds': elapsed,
+            'ticks_per_second': len(keys) / elapsed if elapsed > 0 else float('inf'),
+            'game_seconds': sum(delta_times),
+            'checkpoints_checked': checked,
+            'first_mismatch_tick': mismatch,
+            'score': world.ScoreInfo.current_score,
+            'world': world}
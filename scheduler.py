@@ -0,0 +1,98 @@
+import time
+
+from profiler import NULL_PROFILER
+
+#
+#  The frame scheduler decides when to step the world and when to draw it.
+#
+#  The old main loop checked the clock over and over ("is it time yet? is it time yet?")
+#  which keeps one CPU core at 100% doing nothing useful. It also stepped the world by however
+#  much time had passed, so a slow frame meant a bigger step and a slightly different game.
+#
+#  Instead we:
+#     - always step the world by the same step_time (a "fixed timestep").
+#       Time that has passed but not been simulated yet is kept in the accumulator,
+#       and we take as many steps as fit into it.
+#     - draw the screen on its own schedule (render_time), which can be faster or slower than stepping
+#     - if we fall way behind (the window was dragged, the computer was busy...) we only take
+#       max_steps_per_frame steps and forget the rest, instead of trying to catch up forever
+#     - sleep until the next step or draw is due, instead of spinning
+#
+#  time.sleep can wake up a little late, so we sleep until spin_time before the deadline
+#  and then check the clock for the last little bit. Set spin_time to 0 to never spin.
+#
+#  Each call to tick() is one frame for the profiler, no matter how many steps it took.
+#
+
+class FrameScheduler:
+    def __init__(self, step_time=1 / 60, render_time=1 / 60, max_steps_per_frame=5,
+                 spin_time=0.001, clock=time.perf_counter, sleep=time.sleep,
+                 profiler=NULL_PROFILER):
+        self.step_time = step_time
+        self.render_time = render_time
+        self.max_steps_per_frame = max_steps_per_frame
+        self.spin_time = spin_time
+        self.clock = clock
+        self.sleep = sleep
+        self.profiler = profiler
+
+        self.accumulator = 0.0
+        self.previous_time = None
+        self.next_render_time = None
+
+        # Statistics
+        self.steps = 0
+        self.renders = 0
+        self.dropped_time = 0.0 # simulation time we gave up on after falling behind
+
+    # Waits until the clock reaches deadline
+    def sleep_until(self, deadline):
+        remaining = deadline - self.clock()
+        if remaining > self.spin_time:
+            self.sleep(remaining - self.spin_time)
+        while self.clock() < deadline:
+            pass
+
+    # Does one pass of the loop: takes however many steps are due, draws if a draw is due.
+    # step is called with step_time. render is called with how far we are between the last step
+    # and the next one (0.0 to 1.0), in case it wants to smooth out movement.
+    # Returns the time the next step or draw is due.
+    def tick(self, step, render):
+        now = self.clock()
+        if self.previous_time is None:
+            self.previous_time = now
+            self.next_render_time = now
+        self.accumulator += now - self.previous_time
+        self.previous_time = now
+        self.profiler.begin_frame()
+
+        steps_taken = 0
+        while self.accumulator >= self.step_time and steps_taken < self.max_steps_per_frame:
+            step(self.step_time)
+            self.accumulator -= self.step_time
+            steps_taken += 1
+        self.steps += steps_taken
+
+        # If we hit the limit there is still a pile of time left over. Throw it away,
+        # otherwise every frame after this one will also be trying to catch up
+        if self.accumulator >= self.step_time:
+            self.dropped_time += self.accumulator - self.accumulator % self.step_time
+            self.accumulator %= self.step_time
+
+        if now >= self.next_render_time:
+            render(self.accumulator / self.step_time)
+            self.renders += 1
+            self.next_render_time += self.render_time
+            # If drawing fell behind, start again from now instead of drawing a burst of frames
+            if self.next_render_time < now:
+                self.next_render_time = now + self.render_time
+
+        self.profiler.end_frame()
+
+        next_step_time = now + (self.step_time - self.accumulator)
+        return min(next_step_time, self.next_render_time)
+
+    # Keeps stepping and drawing until should_stop() returns True
+    def run(self, step, render, should_stop):
+        while not should_stop():
+            self.sleep_until(self.tick(step, render))
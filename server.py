@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+from simulation import World, Player, vec2, BULLET_BUFFER_SIZE, step_world
+from netcode import (INPUT, NO_BASELINE, capture_state, check_world_fits, encode_snapshot, unpack_input)
+
+#
+#  The game server -------------------------------------------------------------------------
+#
+#  One World, lots of ships. Every player connects with a client (see client.py), and the
+#  server is the only one that actually runs the game ("authoritative"): clients just send
+#  which keys they are holding, and get told what happened.
+#
+#  Every tick the server:
+#     1. gives each ship the keys its client last sent
+#     2. steps the world, with every ship in it
+#     3. sends every client what changed since the last tick that client said it got (see netcode.py)
+#
+#  Clients can talk to the server over TCP (a connection that never loses or reorders anything)
+#  or UDP (separate packets that might go missing). Over TCP every message starts with its
+#  length as a 4 byte number, because TCP is one long stream of bytes with no gaps in it.
+#  UDP packets are limited to about 64KB, so very big asteroid fields need TCP.
+#
+#  The ships share the score, and the bullets (there are BULLET_BUFFER_SIZE bullets for each ship).
+#
+
+FRAME_LENGTH = struct.Struct('<I') # the length before every TCP message
+
+# Ticks the server remembers what it sent for. A client whose ack is older than this gets everything again
+SNAPSHOT_HISTORY = 64
+
+# One player in the world. step_world takes a list of these and steps each one's player
+# with its own keys (see each_player in simulation.py), and the asteroids and bullets once
+class Ship:
+    def __init__(self, ship_id, position):
+        self.id = ship_id
+        self.player = Player(health=3, position=position, velocity=vec2(0.0, 0.0))
+        self.keys_pressed = [False, False, False, False]
+        self.pending_shots = 0
+
+#
+#  Clients ---------------------------------------------------------------------------------
+#
+
+class ClientSession:
+    def __init__(self, ship, send):
+        self.ship = ship
+        self.send = send # function that sends one message to this client
+        self.acked_tick = NO_BASELINE
+        self.bytes_sent = 0
+
+class GameServer:
+    def __init__(self, tick_rate=30, max_ships=16, seed=None):
+        self.tick_time = 1 / tick_rate
+        self.max_ships = max_ships
+        self.world = World(bullet_capacity=BULLET_BUFFER_SIZE * max_ships, seed=seed)
+        check_world_fits(self.world)
+        self.ships = {}
+        self.free_ids = list(range(max_ships - 1, -1, -1))
+        self.sessions = []
+
+        # tick -> the NetState sent on that tick, for the last SNAPSHOT_HISTORY ticks
+        self.history = {}
+
+        # Statistics, one entry per tick
+        self.tick_work = deque(maxlen=3600)     # seconds spent stepping, encoding and sending
+        self.tick_lateness = deque(maxlen=3600) # seconds late the tick started
+        self.tick_bytes = deque(maxlen=3600)    # bytes sent to all the clients together
+        self.tick_clients = deque(maxlen=3600)
+
+        self.tcp_server = None
+        self.udp_transport = None
+        self.udp_sessions = {}
+
+    # A new ship for a new client. Ships start spread out around the middle of the screen
+    def join(self, send):
+        if not self.free_ids:
+            return None
+        ship_id = self.free_ids.pop()
+        angle = np.radians(ship_id * 360 / self.max_ships)
+        ship = Ship(ship_id, vec2(float(np.cos(angle)) * 100, float(np.sin(angle)) * 100))
+        self.ships[ship_id] = ship
+        session = ClientSession(ship, send)
+        self.sessions.append(session)
+        return session
+
+    def leave(self, session):
+        if session in self.sessions:
+            self.sessions.remove(session)
+            del self.ships[session.ship.id]
+            self.free_ids.append(session.ship.id)
+
+    # An INPUT message from a client. The keys are used from the next tick on
+    def receive(self, session, data):
+        if len(data) < INPUT.size:
+            return
+        ship = session.ship
+        shots, ack_tick = unpack_input(data, ship.keys_pressed)
+        ship.pending_shots += shots
+        # Acks can arrive out of order over UDP, only ever move forwards
+        if ack_tick != NO_BASELINE and (session.acked_tick == NO_BASELINE or ack_tick > session.acked_tick):
+            session.acked_tick = ack_tick
+
+    def tick(self):
+        world = self.world
+        step_world(world, self.tick_time, ships=list(self.ships.values()))
+
+        state = capture_state(world, self.ships, self.max_ships)
+        tick = world.tick
+        self.history[tick] = state
+        self.history.pop(tick - SNAPSHOT_HISTORY, None)
+
+        sent = 0
+        for session in self.sessions:
+            baseline = self.history.get(session.acked_tick)
+            if baseline is None:
+                message = encode_snapshot(tick, state)
+            else:
+                message = encode_snapshot(tick, state, session.acked_tick, baseline)
+            session.send(message)
+            session.bytes_sent += len(message)
+            sent += len(message)
+        return sent
+
+    # Runs the game at a fixed tick rate until it has done max_ticks ticks (forever if None)
+    async def run(self, max_ticks=None):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        ticks = 0
+        while max_ticks is None or ticks < max_ticks:
+            deadline = start + ticks * self.tick_time
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            began = time.perf_counter()
+            self.tick_lateness.append(max(0.0, loop.time() - deadline))
+            self.tick_bytes.append(self.tick())
+            self.tick_clients.append(len(self.sessions))
+            self.tick_work.append(time.perf_counter() - began)
+            ticks += 1
+            # Let the clients' messages in even if we are running behind
+            await asyncio.sleep(0)
+
+    #
+    #  Listening -------------------------------------------------------------------------
+    #
+
+    async def handle_tcp_client(self, reader, writer):
+        def send(message):
+            writer.write(FRAME_LENGTH.pack(len(message)) + message)
+        session = self.join(send)
+        if session is None:
+            writer.close()
+            return
+        try:
+            while True:
+                length, = FRAME_LENGTH.unpack(await reader.readexactly(FRAME_LENGTH.size))
+                self.receive(session, await reader.readexactly(length))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.leave(session)
+            writer.close()
+
+    async def listen(self, host='127.0.0.1', tcp_port=0, udp_port=0):
+        self.tcp_server = await asyncio.start_server(self.handle_tcp_client, host, tcp_port)
+        loop = asyncio.get_running_loop()
+        self.udp_transport, protocol = await loop.create_datagram_endpoint(
+            lambda: ServerDatagramProtocol(self), local_addr=(host, udp_port))
+        return self.tcp_server.sockets[0].getsockname()[1], self.udp_transport.get_extra_info('sockname')[1]
+
+    def close(self):
+        if self.tcp_server is not None:
+            self.tcp_server.close()
+        if self.udp_transport is not None:
+            self.udp_transport.close()
+
+    def report(self):
+        work = np.array(self.tick_work) * 1000
+        lateness = np.array(self.tick_lateness) * 1000
+        return {'ticks': len(work),
+                'clients': max(self.tick_clients, default=0),
+                'bytes_per_tick': float(np.mean(self.tick_bytes)) if self.tick_bytes else 0.0,
+                'tick_ms_p50': float(np.percentile(work, 50)) if len(work) else 0.0,
+                'tick_ms_p95': float(np.percentile(work, 95)) if len(work) else 0.0,
+                'late_ms_p95': float(np.percentile(lateness, 95)) if len(lateness) else 0.0}
+
+# Every UDP address that sends us an INPUT gets a ship
+class ServerDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        server = self.server
+        session = server.udp_sessions.get(address)
+        if session is None:
+            session = server.join(lambda message: self.transport.sendto(message, address))
+            if session is None:
+                return
+            server.udp_sessions[address] = session
+        server.receive(session, data)
+
+#
+#  Loopback test -------------------------------------------------------------------------
+#
+#  Runs the server and some bot clients in the same program, talking over 127.0.0.1,
+#  and reports how many bytes a tick it sends and how long ticks take as the number of clients goes up.
+#  Every client also rebuilds the world from the deltas, and we check it matches what the server sent.
+#
+
+async def loopback_test(client_count, protocol='tcp', ticks=300, tick_rate=30, seed=1):
+    from client import BotClient
+    server = GameServer(tick_rate=tick_rate, max_ships=max(client_count, 1), seed=seed)
+    tcp_port, udp_port = await server.listen()
+    clients = [BotClient(seed=seed + i) for i in range(client_count)]
+    for client in clients:
+        if protocol == 'udp':
+            await client.connect_udp('127.0.0.1', udp_port)
+        else:
+            await client.connect_tcp('127.0.0.1', tcp_port)
+    # Wait for the clients to join
+    while len(server.sessions) < client_count:
+        for client in clients:
+            client.send_input()
+        await asyncio.sleep(0.01)
+
+    await server.run(ticks)
+    await asyncio.sleep(0.1) # let the last snapshots arrive
+
+    report = server.report()
+    full_size = len(encode_snapshot(server.world.tick, server.history[server.world.tick]))
+    report['full_snapshot_bytes'] = full_size
+    report['bytes_per_client_tick'] = report['bytes_per_tick'] / max(client_count, 1)
+    # Every client's copy of the world should match what the server had on that tick
+    report['clients_in_sync'] = all(client.tick in server.history and
+                                    client.state_matches(server.history[client.tick]) for client in clients)
+    for client in clients:
+        client.close()
+    await asyncio.sleep(0.05) # let the server see them go
+    server.close()
+    return report
+
+def __main__():
+    parser = argparse.ArgumentParser(description='Multiplayer Asteroids server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--tcp-port', type=int, default=7777)
+    parser.add_argument('--udp-port', type=int, default=7777)
+    parser.add_argument('--tick-rate', type=float, default=30)
+    parser.add_argument('--max-ships', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--loopback-test', metavar='COUNTS', default=None,
+                        help='instead of serving, test with bot clients on this computer, eg 1,2,4,8,16')
+    parser.add_argument('--protocol', choices=['tcp', 'udp'], default='tcp', help='for --loopback-test')
+    parser.add_argument('--ticks', type=int, default=300, help='for --loopback-test')
+    args = parser.parse_args()
+
+    if args.loopback_test:
+        print('clients  bytes/tick  bytes/client/tick  full snapshot  tick ms p50  tick ms p95  late ms p95  in sync')
+        for count in [int(count) for count in args.loopback_test.split(',')]:
+            report = asyncio.run(loopback_test(count, args.protocol, args.ticks, args.tick_rate))
+            print(str(count).rjust(7), ('%.0f' % report['bytes_per_tick']).rjust(11),
+                  ('%.0f' % report['bytes_per_client_tick']).rjust(18),
+                  str(report['full_snapshot_bytes']).rjust(14),
+                  ('%.3f' % report['tick_ms_p50']).rjust(12), ('%.3f' % report['tick_ms_p95']).rjust(12),
+                  ('%.3f' % report['late_ms_p95']).rjust(12), str(report['clients_in_sync']).rjust(8))
+        return
+
+    async def serve():
+        server = GameServer(args.tick_rate, args.max_ships, args.seed)
+        tcp_port, udp_port = await server.listen(args.host, args.tcp_port, args.udp_port)
+        print('serving on', args.host, 'tcp', tcp_port, 'udp', udp_port)
+        await server.run()
+    asyncio.run(serve())
+
+if __name__ == '__main__':
+    __main__()
@@ -0,0 +1,451 @@
+import time
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from simulation import Player, GlobalScoreInfo, EntityArrays, vec2, step_world, most_asteroids, UP_KEY
+from scheduler import FrameScheduler
+from particles import ParticleSystem
+from profiler import NULL_PROFILER
+from spatial import wrapped_delta
+
+#
+#  Simulating and drawing at the same time ----------------------------------------------------
+#
+#  Normally one loop does both (see scheduler.py): step, step, draw, step, draw... While Tk is
+#  busy drawing a big frame, no steps happen, and while the world takes a slow step, nothing gets drawn.
+#
+#  Here the simulation runs on its own, in a thread or in a whole separate process, and the window
+#  side never touches the World at all. After every step the simulation writes a small copy of
+#  just what needs drawing (a "frame"): where everything is, which way it faces, which shape it is,
+#  and the score and health. The frames live in shared memory, which both sides can see.
+#
+#  There are three frames' worth of room, a "triple buffer":
+#
+#     simulation                                                     window
+#        |  writes        publish() swaps          take_latest() swaps  |  reads
+#        +-------> [ back ] <------> [ middle ] <------> [ front ] <----+
+#
+#  The simulation only ever writes into back, and the window only ever reads from front, so
+#  neither one can see a frame that is half written. When a frame is finished, publish() swaps
+#  back and middle, so middle is always the newest whole frame. When the window wants to draw,
+#  take_latest() swaps middle and front, if there is something new there.
+#  The lock is only held while two numbers get swapped, never while a frame is written or read,
+#  so neither side ever waits for the other one to finish its work. If the window is slow,
+#  frames it never got around to reading just get written over.
+#
+#  Frames only come every step (1/60 of a second), but the window may draw more often than that,
+#  or at odd moments in between. So the window keeps the frame before the newest one too, and
+#  draws everything part of the way between the two ("interpolating"):
+#
+#     previous frame              newest frame
+#          o - - - - - - - x - - - - - - o
+#                          ^ drawn here, how far along depends on the time now
+#
+#  That means what is on the screen is about one step behind the simulation, and it moves smoothly
+#  even when steps and draws don't line up. Only things in the same slot with the same pool
+#  generation (see pool.py) get moved between frames, a new asteroid in an old slot just appears.
+#
+#  The window side gets a SnapshotWorld, which has the same fields as a World that the views read,
+#  so turtle_view.py and canvas_view.py draw it without knowing the difference.
+#
+
+# Where things are in the small block of numbers at the start of the shared memory
+BACK, MIDDLE, FRONT = 0, 1, 2 # which of the 3 frames each side is using
+FRESH = 3     # 1 when middle has a frame the window hasn't taken yet
+PUBLISHED = 4 # frames published so far
+STOP = 5      # set by the window when it is closed, the simulation stops at its next step
+FINISHED = 6  # set by the simulation when it has stopped
+SHOTS = 7     # how many times space has been pressed, ever
+KEYS = 8      # 4 numbers, 1 for each key held down
+CONTROL_SIZE = 16
+CONTROL_BYTES = CONTROL_SIZE * 8
+
+# One asteroid, bullet or particle. stage is the asteroid's size, or the particle's kind
+ENTITY_RECORD = np.dtype([('slot', '<u4'), ('generation', '<u4'), ('x', '<f8'), ('y', '<f8'),
+                          ('radius', '<f4'), ('stage', '<i4')], align=True)
+
+HEADER_DTYPE = np.dtype([('tick', '<i8'), ('time', '<f8'), # time is when it was published (time.perf_counter)
+                         ('score', '<i8'), ('health', '<i8'), ('game_over', '?'), ('thrusting', '?'),
+                         ('x', '<f8'), ('y', '<f8'), ('rotation', '<f8'), ('invincibility_frames', '<f8'),
+                         ('asteroid_count', '<u4'), ('bullet_count', '<u4'), ('particle_count', '<u4')],
+                        align=True)
+
+# Only the things that are showing go in a frame, packed together, so the capacities are
+# the most that can be alive at once, not how many slots the world has
+def frame_dtype(asteroid_capacity, bullet_capacity, particle_capacity):
+    return np.dtype([('header', HEADER_DTYPE),
+                     ('asteroids', ENTITY_RECORD, (asteroid_capacity,)),
+                     ('bullets', ENTITY_RECORD, (bullet_capacity,)),
+                     ('particles', ENTITY_RECORD, (max(particle_capacity, 1),))],
+                    align=True)
+
+# Room for everything in this world. The asteroid buffer can grow while the game runs, so the frame
+# has room for the most asteroids there can ever be at once (see most_asteroids in simulation.py),
+# not just the slots there are now. Leaving one out would hide something the player can still run into
+def frame_dtype_for(world):
+    particle_capacity = world.particles.capacity if world.particles is not None else 0
+    return frame_dtype(most_asteroids(world), len(world.bullet_buffer), particle_capacity)
+
+#
+#  The triple buffer --------------------------------------------------------------------------
+#
+
+class FrameBuffer:
+    def __init__(self, dtype, memory, lock, owner):
+        self.dtype = dtype
+        self.memory = memory
+        self.lock = lock
+        self.owner = owner # the side that made the shared memory also gets rid of it
+        self.control = np.ndarray(CONTROL_SIZE, dtype=np.int64, buffer=memory.buf)
+        self.frames = np.ndarray(3, dtype=dtype, buffer=memory.buf, offset=CONTROL_BYTES)
+
+    # The frame the simulation is allowed to write into
+    def back_frame(self):
+        return self.frames[self.control[BACK], ...]
+
+    # Call after the back frame has been completely written
+    def publish(self):
+        control = self.control
+        with self.lock:
+            control[BACK], control[MIDDLE] = control[MIDDLE], control[BACK]
+            control[FRESH] = 1
+            control[PUBLISHED] += 1
+
+    # The newest whole frame, or None if nothing has been published since last time.
+    # It stays the window's until the next take_latest()
+    def take_latest(self):
+        control = self.control
+        if not control[FRESH]:
+            return None
+        with self.lock:
+            control[FRONT], control[MIDDLE] = control[MIDDLE], control[FRONT]
+            control[FRESH] = 0
+        return self.frames[control[FRONT], ...]
+
+    def close(self):
+        # NumPy's views onto the memory have to go before it can be closed
+        self.control = None
+        self.frames = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+def make_frame_buffer(dtype):
+    memory = shared_memory.SharedMemory(create=True, size=CONTROL_BYTES + 3 * dtype.itemsize)
+    frame_buffer = FrameBuffer(dtype, memory, multiprocessing.Lock(), owner=True)
+    frame_buffer.control[:] = 0
+    frame_buffer.control[[BACK, MIDDLE, FRONT]] = [0, 1, 2]
+    return frame_buffer
+
+# For the other process, to find the same shared memory by its name
+def attach_frame_buffer(dtype, name, lock):
+    return FrameBuffer(dtype, shared_memory.SharedMemory(name=name), lock, owner=False)
+
+#
+#  The simulation side ------------------------------------------------------------------------
+#
+
+# Packs the active entities into records, and returns how many went in
+def write_entities(records, active, position, radius, stage, generation=None):
+    slots = np.flatnonzero(active)
+    count = len(slots)
+    if count > len(records):
+        raise ValueError(str(count) + ' entities to publish, but the frame only has room for ' + str(len(records)))
+    written = records[:count]
+    written['slot'] = slots
+    written['generation'] = [generation[slot] for slot in slots.tolist()] if generation is not None else 0
+    written['x'] = position[slots, 0]
+    written['y'] = position[slots, 1]
+    written['radius'] = radius[slots]
+    written['stage'] = stage[slots]
+    return count
+
+def write_frame(world, frame, now):
+    header = frame['header']
+    main_player = world.main_player
+    header['tick'] = world.tick
+    header['time'] = now
+    header['score'] = world.ScoreInfo.current_score
+    header['health'] = main_player.health
+    header['game_over'] = world.is_game_over()
+    header['thrusting'] = world.keys_pressed[UP_KEY]
+    header['x'] = main_player.position.x
+    header['y'] = main_player.position.y
+    header['rotation'] = main_player.rotation
+    header['invincibility_frames'] = main_player.invincibility_frames
+
+    asteroid_buffer = world.asteroid_buffer
+    header['asteroid_count'] = write_entities(frame['asteroids'], asteroid_buffer.active, asteroid_buffer.position,
+                                              asteroid_buffer.radius, asteroid_buffer.health,
+                                              world.asteroid_pool.generation)
+
+    bullet_buffer = world.bullet_buffer
+    header['bullet_count'] = write_entities(frame['bullets'], bullet_buffer.active, bullet_buffer.position,
+                                            bullet_buffer.radius, bullet_buffer.health,
+                                            world.bullet_pool.generation)
+
+    particles = world.particles
+    if particles is not None:
+        header['particle_count'] = write_entities(frame['particles'], particles.active, particles.position,
+                                                  particles.radius, particles.kind)
+    else:
+        header['particle_count'] = 0
+
+# Steps a world at a fixed rate, takes its keys from the shared memory,
+# and publishes a frame after every step
+class SimulationWorker:
+    def __init__(self, world, frame_buffer, step_time=1 / 60, max_steps_per_frame=5,
+                 step=step_world, profiler=NULL_PROFILER, clock=time.perf_counter):
+        self.world = world
+        self.frame_buffer = frame_buffer
+        self.step_function = step
+        self.profiler = profiler
+        self.clock = clock
+        # The scheduler's own drawing is never used, the window does that
+        self.scheduler = FrameScheduler(step_time=step_time, render_time=step_time,
+                                        max_steps_per_frame=max_steps_per_frame, clock=clock, profiler=profiler)
+        self.shots_taken = 0
+
+    # The keys the window has written into the shared memory
+    def apply_inputs(self):
+        control = self.frame_buffer.control
+        keys_pressed = self.world.keys_pressed
+        for key in range(len(keys_pressed)):
+            keys_pressed[key] = bool(control[KEYS + key])
+        shots = int(control[SHOTS])
+        self.world.pending_shots += shots - self.shots_taken
+        self.shots_taken = shots
+
+    def publish(self):
+        write_frame(self.world, self.frame_buffer.back_frame(), self.clock())
+        self.frame_buffer.publish()
+
+    def step(self, delta_time):
+        self.apply_inputs()
+        self.step_function(self.world, delta_time, self.profiler)
+        self.publish()
+
+    def should_stop(self):
+        return self.world.is_game_over() or bool(self.frame_buffer.control[STOP])
+
+    def run(self):
+        self.publish() # so the window has something to draw straight away
+        try:
+            self.scheduler.run(step=self.step, render=lambda alpha: None, should_stop=self.should_stop)
+        finally:
+            self.frame_buffer.control[FINISHED] = 1
+
+# What runs in the other process. The world comes over pickled, and goes back the same way
+# through connection when the game is over, so the main process can save it
+def simulation_process(world, dtype, name, lock, step_time, max_steps_per_frame, connection):
+    frame_buffer = attach_frame_buffer(dtype, name, lock)
+    try:
+        SimulationWorker(world, frame_buffer, step_time, max_steps_per_frame).run()
+        connection.send(world)
+    finally:
+        connection.close()
+        frame_buffer.close()
+
+#
+#  The window side ----------------------------------------------------------------------------
+#
+
+# The parts of a World the views read, filled in from frames
+class SnapshotWorld:
+    def __init__(self, width, height, particle_capacity):
+        self.width = width
+        self.height = height
+        self.tick = -1 # no frame yet
+        self.game_over = False
+        self.main_player = Player(health=0, position=vec2(0.0, 0.0), velocity=vec2(0.0, 0.0))
+        self.ScoreInfo = GlobalScoreInfo()
+        self.keys_pressed = [False, False, False, False]
+        self.asteroid_buffer = EntityArrays(0)
+        self.bullet_buffer = EntityArrays(0, radius=2)
+        self.particles = ParticleSystem(particle_capacity) if particle_capacity > 0 else None
+
+    def is_game_over(self):
+        return self.game_over
+
+# The keys go straight into the shared memory. Looks enough like a World for InputQueue.drain
+class SharedInputs:
+    def __init__(self, frame_buffer, snapshot_world):
+        self.control = frame_buffer.control
+        self.snapshot_world = snapshot_world
+        self.keys_pressed = frame_buffer.control[KEYS:KEYS + 4]
+
+    @property
+    def pending_shots(self):
+        return int(self.control[SHOTS])
+
+    # request_shot does pending_shots += 1
+    @pending_shots.setter
+    def pending_shots(self, shots):
+        self.control[SHOTS] = shots
+
+    # The newest tick the window knows about
+    @property
+    def tick(self):
+        return self.snapshot_world.tick
+
+# Takes frames out of the buffer, and fills in a SnapshotWorld part of the way between the last two
+class SnapshotReader:
+    def __init__(self, frame_buffer, width, height, particle_capacity):
+        self.frame_buffer = frame_buffer
+        self.world = SnapshotWorld(width, height, particle_capacity)
+        # Our own copies of the last two frames, so the simulation can have the shared ones back
+        self.previous = np.zeros((), dtype=frame_buffer.dtype)
+        self.current = np.zeros((), dtype=frame_buffer.dtype)
+        self.previous['header']['tick'] = -1
+        self.current['header']['tick'] = -1
+
+        self.frames_taken = 0
+        self.frames_missed = 0 # published, but written over before we took them
+
+    # Takes the newest frame, if there is one. Returns True if there was
+    def take(self):
+        latest = self.frame_buffer.take_latest()
+        if latest is None:
+            return False
+        self.previous[...] = self.current
+        self.current[...] = latest
+        previous_tick = int(self.previous['header']['tick'])
+        if previous_tick >= 0:
+            self.frames_missed += max(0, int(self.current['header']['tick']) - previous_tick - 1)
+        self.frames_taken += 1
+        return True
+
+    # How far to go from the previous frame to the current one, 0.0 to 1.0.
+    # We are drawing one frame's time behind, so a frame that just arrived is drawn from the start
+    def alpha(self, now):
+        previous_time = float(self.previous['header']['time'])
+        current_time = float(self.current['header']['time'])
+        if self.previous['header']['tick'] < 0 or current_time <= previous_time:
+            return 1.0
+        return min(1.0, max(0.0, (now - current_time) / (current_time - previous_time)))
+
+    # Puts the records into entities by their slots, moved alpha of the way from where
+    # the same slot was in the previous records
+    def fill_entities(self, entities, previous_records, current_records, alpha):
+        slots = current_records['slot'].astype(np.intp)
+        size = int(slots.max()) + 1 if len(slots) else 0
+        if size > len(entities):
+            entities.resize(size)
+        positions = np.column_stack([current_records['x'], current_records['y']])
+
+        if alpha < 1.0 and len(previous_records) and len(slots):
+            previous_slots = previous_records['slot'].astype(np.intp)
+            lookup_size = max(size, int(previous_slots.max()) + 1)
+            generations = np.full(lookup_size, -1, dtype=np.int64)
+            starts = np.zeros((lookup_size, 2))
+            generations[previous_slots] = previous_records['generation']
+            starts[previous_slots, 0] = previous_records['x']
+            starts[previous_slots, 1] = previous_records['y']
+            same = generations[slots] == current_records['generation']
+            start = starts[slots]
+            moved = start + wrapped_delta(positions, start, self.world.width, self.world.height) * alpha
+            positions = np.where(same[:, np.newaxis], moved, positions)
+            positions = wrapped_delta(positions, np.zeros(2), self.world.width, self.world.height)
+
+        entities.active[:] = False
+        entities.active[slots] = True
+        entities.position[slots] = positions
+        entities.radius[slots] = current_records['radius']
+        entities.health[slots] = current_records['stage']
+
+    # Takes the newest frame and fills in the world for drawing at time now.
+    # Returns False if no frame has come yet
+    def update(self, now):
+        self.take()
+        current = self.current
+        header = current['header']
+        if header['tick'] < 0:
+            return False
+        previous = self.previous
+        alpha = self.alpha(now)
+        world = self.world
+        world.tick = int(header['tick'])
+        world.game_over = bool(header['game_over'])
+        world.ScoreInfo.current_score = int(header['score'])
+        world.keys_pressed[UP_KEY] = bool(header['thrusting'])
+
+        main_player = world.main_player
+        main_player.health = int(header['health'])
+        main_player.invincibility_frames = float(header['invincibility_frames'])
+        start = np.array([previous['header']['x'], previous['header']['y']]) if alpha < 1.0 else None
+        end = np.array([header['x'], header['y']])
+        if start is not None:
+            end = wrapped_delta(start + wrapped_delta(end, start, world.width, world.height) * alpha,
+                                np.zeros(2), world.width, world.height)
+        main_player.position.set(float(end[0]), float(end[1]))
+        rotation = float(header['rotation'])
+        if alpha < 1.0:
+            previous_rotation = float(previous['header']['rotation'])
+            turn = (rotation - previous_rotation + 180.0) % 360.0 - 180.0 # the short way round
+            rotation = previous_rotation + turn * alpha
+        main_player.rotation = rotation
+
+        for name, entities in [('asteroids', world.asteroid_buffer), ('bullets', world.bullet_buffer)]:
+            count = int(header[name[:-1] + '_count'])
+            previous_count = int(previous['header'][name[:-1] + '_count']) if alpha < 1.0 else 0
+            self.fill_entities(entities, previous[name][:previous_count], current[name][:count], alpha)
+
+        # Particles only live for a moment and get written over all the time, so they aren't interpolated
+        particles = world.particles
+        if particles is not None:
+            count = min(int(header['particle_count']), particles.capacity)
+            records = current['particles'][:count]
+            slots = records['slot'].astype(np.intp)
+            particles.active[:] = False
+            particles.active[slots] = True
+            particles.position[slots, 0] = records['x']
+            particles.position[slots, 1] = records['y']
+            particles.radius[slots] = records['radius']
+            particles.kind[slots] = records['stage']
+        return True
+
+    def stats(self):
+        return {'frames_published': int(self.frame_buffer.control[PUBLISHED]),
+                'frames_taken': self.frames_taken, 'frames_missed': self.frames_missed}
+
+#
+#  Starting the simulation --------------------------------------------------------------------
+#
+
+# Runs world in a thread (mode 'thread') or another process (mode 'process'), publishing into frame_buffer.
+# Returns something with is_alive() and finish(), and finish() returns the world as it ended
+def start_simulation(world, frame_buffer, mode, step_time, max_steps_per_frame, step=step_world):
+    if mode == 'thread':
+        worker = SimulationWorker(world, frame_buffer, step_time, max_steps_per_frame, step)
+        thread = threading.Thread(target=worker.run, name='simulation', daemon=True)
+        thread.start()
+        return SimulationHandle(thread, lambda: world)
+
+    # Another process has its own Python, so its own GIL: both sides really do run at once.
+    # Functions can't always be sent to another process, so it always uses step_world
+    receiving, sending = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=simulation_process, name='simulation', daemon=True,
+                                      args=(world, frame_buffer.dtype, frame_buffer.memory.name,
+                                            frame_buffer.lock, step_time, max_steps_per_frame, sending))
+    process.start()
+    sending.close()
+    def receive_world():
+        # If the process died without sending the world back, keep the one we started with
+        return receiving.recv() if receiving.poll(5.0) else world
+    return SimulationHandle(process, receive_world)
+
+class SimulationHandle:
+    def __init__(self, runner, final_world):
+        self.runner = runner
+        self.final_world = final_world
+
+    def is_alive(self):
+        return self.runner.is_alive()
+
+    def finish(self):
+        world = self.final_world()
+        self.runner.join()
+        return world
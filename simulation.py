@@ -0,0 +1,866 @@
+import heapq
+import math
+import random
+
+import numpy as np
+
+from spatial import SpatialHash, SpatialIndex, wrapped_delta, swept_contact_times
+from pool import EntityPool
+from profiler import NULL_PROFILER
+
+#
+#  This file holds everything the game needs to *simulate* a round of Asteroids:
+#  the entities, the world they live in, and the functions that step them forward.
+#
+#  Notice that there is no "import turtle" up there!
+#  Nothing in here draws anything, so we can run thousands of frames on a computer
+#  with no screen at all (like a build server). Drawing is done by a "view"
+#  (see turtle_view.py) which looks at the world after every step and draws it.
+#
+
+#
+#  Shapes & Info --------------------------------------------------------------------
+#
+
+SPACESHIP_SPRITE_INFO = {'coordinates': [ ( (7,-20), (0,5), (-7,-20) ),
+                                         ], 'name': 'SPACESHIP_SHAPE'}
+
+SPACESHIP_ACCELERATE_SPRITE_INFO = {'coordinates': [ ( (7,-20), (0,5), (-7,-20) ),
+                                                     ( (7,-20), (0,-30), (-7,-20) ) ],
+                                    'name': 'SPACESHIP_ACCELERATION_SHAPE'}
+
+SPACESHIP_FLICKER_INFO = {'coordinates': [ () ],
+                          'name': 'SPACESHIP_FLICKER_SHAPE'}
+
+BULLET_SPRITE_INFO = {'coordinates': [ ((-1, -1), (-1, 1), (1, 1), (1, -1)) ],
+                      'name': 'BULLET_SHAPE'}
+
+ASTEROID_INFO = { 'speeds' : [None, 30, 50, 70],
+                  'radii': [None, 15, 30, 45],
+                  'turtle_sizes': [None, 1.5, 3.0, 4.5],
+                  'points': [None, 50, 25, 10]}
+
+#
+#  Class / Struct definitions -------------------------------------------------
+#
+
+#
+#  Classes are useful ways to store similar data together
+#     Anything in the class can be accessed with a dot operator
+#     For example the vec2 (vector in 2 dimensions) class simply stores an X and a Y component
+#     so if we have a vec2 named direction, we could access just the x component with direction.x
+#     And we can create a new vec2 with the initialization function
+#         eg: direction = vec2(1.5, 3.0)
+#         This will call the __init__ function inside vec2,
+#         and direction will now store a vector with an x component of 1.5 and a y component of 3.0
+#     vec2 is also a special case where we can use the __add__ function.
+#     This will make it so if we have two vec2s and we use the + operator it will call our __add__
+#         eg: first =  vec2(1.0, 2.0)
+#             second = vec2(3.0, 4.0)
+#             first + second would return a new vec2 [4.0, 6.0] (because it adds the components)
+#     Similar idea with the __mul__ for multiply
+#
+#     + and * always make a brand new vec2, and making objects is one of the slower things Python does.
+#     Things that happen every step change a vec2 that already exists instead ("in place"):
+#         first += second                  -> adds second onto first, no new vec2
+#         first.add_scaled(second, 2.0)    -> first = first + second * 2.0, no new vec2
+#
+#     __slots__ tells Python exactly which fields a class has. Normally every object carries
+#     around a dictionary of its fields so you can add new ones whenever you like;
+#     with __slots__ there is no dictionary, so each object is smaller and quicker to make.
+#
+#  There are other ways we could store vector2s,
+#    For example we could use an array [x,y], and assume the first index is x, and second is y
+#    Or a dictionary: {'x': 0.0, 'y': 0.0} and access it with ['x']
+#  Are there any pros and cons of each of these?
+
+class vec2:
+    __slots__ = ('x', 'y')
+    x: float
+    y: float
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+    def __add__(self, vec):
+        x = self.x + vec.x
+        y = self.y + vec.y
+        return vec2(x,y)
+    def __mul__(self, scalar):
+        x = self.x * scalar
+        y = self.y * scalar
+        return vec2(x,y)
+    def __iadd__(self, vec):
+        self.x += vec.x
+        self.y += vec.y
+        return self
+    def add_scaled(self, vec, scale):
+        self.x += vec.x * scale
+        self.y += vec.y * scale
+        return self
+    def set(self, x, y):
+        self.x = x
+        self.y = y
+        return self
+    def copy(self):
+        return vec2(self.x, self.y)
+
+#
+#   This is an "Entity" class which acts as our base class
+#   This means that anything that inherits this will have all the fields in an entity
+#   We'll see how this is useful when we see the other classes below
+#
+#   An entity is only data: where it is, how fast it is going and how big it is.
+#   It does not own a turtle anymore, the view makes one for it if we are drawing.
+#
+
+class Entity:
+    __slots__ = ('position', 'velocity', 'radius')
+    position: vec2 # Technically not required, but I like putting these here to show that each entity will have a position, velocity and radius
+    velocity: vec2
+    radius: float
+    def __init__(self, position, velocity, radius):
+        self.position = position
+        self.velocity = velocity
+        self.radius = radius
+
+#
+#   Here we have a class for the Player.
+#   The player inherits the Entity class (because it has it in the brackets)
+#   Which means that in addition to the fields we put in here, it will also have the fields
+#     inside of Entity. This saves a bunch of copied code and typing!
+#
+
+class Player(Entity):
+    __slots__ = ('health', 'rotation', 'ROTATION_SPEED', 'ACCELERATION_SPEED', 'invincibility_frames', 'facing')
+    health: int
+    rotation: float
+    facing: vec2
+    def __init__(self,health, position, velocity):
+        super().__init__(position, velocity, 20.0 ) # do the superclass's (Entity) initializer, ie: set position, velocity, radius
+        self.health = health
+        self.rotation = 0.0
+        self.ROTATION_SPEED = 50
+        self.ACCELERATION_SPEED = 20
+        self.invincibility_frames = 0
+        # The way the player is facing, worked out again every time they thrust.
+        # It's kept here so thrusting doesn't make a new vec2 every step
+        self.facing = vec2(1.0, 0.0)
+
+#
+#   The asteroids and bullets used to be classes too, with one object per asteroid.
+#   That is nice to read, but when there are thousands of asteroids Python has to
+#   visit every single object, one at a time, to move it.
+#
+#   Instead we store them "struct of arrays" style: one NumPy array for all the positions,
+#   one for all the velocities, and so on. Asteroid number 7 is just index 7 in every array.
+#   NumPy can then move *all* of them with one line, which runs in fast C code.
+#
+#     position[i] -> [x, y] of entity i
+#     velocity[i] -> [x, y] velocity of entity i
+#     radius[i]   -> size of its circular hitbox
+#     health[i]   -> for asteroids, which stage (size) it is. 3 is the biggest
+#     active[i]   -> whether slot i is being used right now
+#
+
+class EntityArrays:
+    position: np.ndarray
+    velocity: np.ndarray
+    radius: np.ndarray
+    health: np.ndarray
+    active: np.ndarray
+    def __init__(self, capacity, radius=0.0):
+        self.position = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.radius = np.full(capacity, float(radius))
+        self.health = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+    def __len__(self):
+        return len(self.active)
+
+    # Makes every array longer (the new slots are all zeros and not active)
+    # Used by the EntityPool when it runs out of slots
+    def resize(self, capacity):
+        extra = capacity - len(self.active)
+        self.position = np.concatenate([self.position, np.zeros((extra, 2))])
+        self.velocity = np.concatenate([self.velocity, np.zeros((extra, 2))])
+        self.radius = np.concatenate([self.radius, np.full(extra, self.radius[0] if len(self.radius) else 0.0)])
+        self.health = np.concatenate([self.health, np.zeros(extra, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+
+class GlobalScoreInfo:
+    def __init__(self):
+        self.current_score = 0
+        self.high_score = 0
+
+#
+#  Constants --------------------------------------------------------
+#
+
+ASTEROID_BUFFER_SIZE = 50
+ASTEROID_GROWTH_FACTOR = 2 # How many times as many asteroid slots there are after they have all been used up
+
+BULLET_BUFFER_SIZE = 6 # How many bullets we allow on the screen at once.
+BULLET_SPEED = 300
+
+WINDOW_WIDTH = 1200
+WINDOW_HEIGHT = 800
+
+# How big the play area is. It wraps around at its edges, like the screen used to.
+# When it's bigger than the window, the views only show the part around the player (see camera.py)
+WORLD_WIDTH = WINDOW_WIDTH
+WORLD_HEIGHT = WINDOW_HEIGHT
+
+# How many asteroids each round starts with, and how far from the middle they can be,
+# in a world the size of the window. Bigger worlds get more, spread out further, so they are just as busy
+ROUND_ASTEROIDS = 5
+ROUND_SPREAD = 300
+
+# The size of the cells in the collision grid. It has to be at least as big as the
+# furthest apart two things can be and still touch: the biggest asteroid (45) and the player (20)
+COLLISION_CELL_SIZE = 65
+
+RIGHT_KEY = 0 #indices into the keys_pressed list in the World
+LEFT_KEY = 1
+UP_KEY = 2
+SPACE_KEY = 3
+
+#
+#  The World ----------------------------------------------------------
+#
+#  Everything that used to be a global (the player, the asteroid and bullet buffers, the score...)
+#  now lives inside a World. This way we can make a world, step it, and throw it away,
+#  without anything else in the program needing to know about it.
+#
+
+class World:
+    main_player: Player
+    asteroid_buffer: EntityArrays
+    bullet_buffer: EntityArrays
+
+    def __init__(self, asteroid_capacity=None, bullet_capacity=None, seed=None, width=None, height=None):
+        # Anything not given comes from the constants above. They are looked up now, not when this
+        # file was loaded, so changing them (like batch.py's --set does) changes the next World made
+        if asteroid_capacity is None:
+            asteroid_capacity = ASTEROID_BUFFER_SIZE
+        if bullet_capacity is None:
+            bullet_capacity = BULLET_BUFFER_SIZE
+        if width is None:
+            width = WORLD_WIDTH
+        if height is None:
+            height = WORLD_HEIGHT
+
+        # Every world has its own random number generator.
+        # Two worlds made with the same seed, given the same inputs, play out exactly the same.
+        # If we don't pick a seed, we pick a random one (and remember it, so the game can be replayed)
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        # The size of the play area
+        self.width = width
+        self.height = height
+        area_scale = (width * height) / (WINDOW_WIDTH * WINDOW_HEIGHT)
+        self.round_asteroids = max(ROUND_ASTEROIDS, round(ROUND_ASTEROIDS * area_scale))
+        self.round_spread = ROUND_SPREAD * max(1.0, area_scale ** 0.5)
+
+        # How many times the world has been stepped
+        self.tick = 0
+        # How many times every asteroid was cleared and a new round started
+        self.rounds_cleared = 0
+
+        # Initialize the player
+        self.main_player = Player(health=3, position=vec2(0.0, 0.0), velocity=vec2(0.0, 0.0))
+
+        # Initialize the score information
+        self.ScoreInfo = GlobalScoreInfo()
+
+        # How much time the current step is moving the world forward by
+        self.delta_time = 0.0
+
+        # Stores a boolean of whether the key is pressed or not
+        # Whoever is controlling the player (the keyboard, a bot...) sets these
+        self.keys_pressed = [False, False, False, False]
+        # How many times shoot was pressed since the last step
+        self.pending_shots = 0
+
+        # Initialize the bullet arrays
+        # If every bullet is in use, shooting again reuses the oldest one
+        self.bullet_buffer = EntityArrays(bullet_capacity, radius=2)
+        self.bullet_pool = EntityPool(self.bullet_buffer, recycle_oldest=True)
+
+        # Initialize the asteroids
+        # If every asteroid slot is in use, the arrays get ASTEROID_GROWTH_FACTOR times longer (see pool.py)
+        self.asteroid_buffer = EntityArrays(asteroid_capacity)
+        self.asteroid_pool = EntityPool(self.asteroid_buffer, growth_factor=ASTEROID_GROWTH_FACTOR)
+
+        # The grid we use to find which asteroids are near a bullet or the player
+        # If someone made the asteroids bigger (see batch.py) the cells have to get bigger too
+        cell_size = max(COLLISION_CELL_SIZE, max(ASTEROID_INFO['radii'][1:]) + self.main_player.radius)
+        self.asteroid_grid = SpatialHash(width, height, cell_size)
+        # How fast the fastest asteroid in the grid is going, worked out when the grid is rebuilt
+        self.fastest_asteroid_speed = 0.0
+        # For pilots asking what is near somewhere (see "Asking where the asteroids are" below).
+        # Unlike the grid it is kept up to date as asteroids are made, broken and moved
+        self.asteroid_index = SpatialIndex(self.asteroid_buffer, width, height, cell_size,
+                                           max_radius=max(ASTEROID_INFO['radii'][1:]))
+        # Asteroids made and broken part way through the current step (see handle_bullet_asteroid_collisions)
+        self.asteroids_born = {}   # slot -> seconds into the step it was made
+        self.asteroids_broken = [] # (x, y, velocity x, velocity y, radius, made, broken) of each one broken
+
+        for i in range(self.round_asteroids):
+            spawn_asteroid(self, 3,
+                           random_vec2_component_length(self.round_spread, self.rng),
+                           random_vec2_component_length(30, self.rng))
+
+        # Explosions and thrust flames (a ParticleSystem, see particles.py).
+        # Only views that draw them make one, so without a window they cost nothing
+        self.particles = None
+
+    # The pool keeps count of how many asteroids are in use, so we don't have to
+    @property
+    def total_active_asteroids(self):
+        return self.asteroid_pool.live_count
+
+    def is_game_over(self):
+        return self.main_player.health <= 0
+
+#
+#  Utility Functions ----------------------------------------------------
+#
+
+# Returns a vector with length 1 from a rotation. Assumes rotatation in degrees
+# If out is given, that vec2 gets changed and returned instead of making a new one
+def unit_vector_from_rotation(rotation, out=None):
+    if out is not None:
+        return out.set(math.cos(math.radians(rotation)), math.sin(math.radians(rotation)))
+    return vec2( math.cos(math.radians(rotation)),
+                 math.sin(math.radians(rotation)) )
+
+def distance_between(first, second):
+    delta_x = first.x - second.x
+    delta_y = first.y - second.y
+    distance = ((delta_x ** 2) + (delta_y ** 2)) ** 0.5
+    return distance
+
+# Returns if two entities are colliding, using circular hitboxes
+def is_colliding(entity, other):
+    return distance_between(entity.position, other.position) < entity.radius + other.radius
+
+# Returns a random value between -1 and 1
+# rng is the random number generator to use, normally the world's rng
+def random_bilateral(rng=random):
+    return (rng.random() - 0.5) * 2.0
+
+# Returns a random vec2 with x and y between [-scale, scale]
+def random_vec2_component_length(scale, rng=random):
+    return vec2(random_bilateral(rng) * scale, random_bilateral(rng) * scale)
+
+#
+#  Player functions ---------------------------------------------------
+#
+
+def rotate_right(world):
+    main_player = world.main_player
+    main_player.rotation -= main_player.ROTATION_SPEED * world.delta_time
+    # The reason we are multiplying by delta_time (the time since the last update)
+    #  is because it makes the player turn the same amount, no matter how fast your computer is running
+    #  If the game lags, then we want to make sure that we still rotate the same amount, even
+    #  if the screen hadn't updated in time. This is a relatively simple way of making the game
+    #  framerate independent
+
+def rotate_left(world):
+    main_player = world.main_player
+    main_player.rotation += main_player.ROTATION_SPEED * world.delta_time
+
+def accelerate_player(world):
+    main_player = world.main_player
+    acceleration_vector = unit_vector_from_rotation(main_player.rotation, out=main_player.facing)
+    main_player.velocity.add_scaled(acceleration_vector, main_player.ACCELERATION_SPEED * world.delta_time)
+    if world.particles is not None:
+        world.particles.thrust(main_player.position, main_player.velocity, main_player.rotation, world.delta_time)
+
+def shoot(world):
+    main_player = world.main_player
+    bullet_buffer = world.bullet_buffer
+
+    # The bullet pool hands us a free slot in bullet_buffer
+    # If every bullet is already flying, it takes back the one we shot first
+    #
+    # [ Active, Non-Active, Active, Non-Active ]  -> we get one of the Non-Active slots
+    # [ Active, Active, Active, Active ]          -> we get whichever Active one is oldest
+
+    # The bullet gets a copy of where the player is right now
+    direction = unit_vector_from_rotation(main_player.rotation)
+    i = world.bullet_pool.allocate()
+    bullet_buffer.position[i] = (main_player.position.x, main_player.position.y)
+    bullet_buffer.velocity[i] = (direction.x * BULLET_SPEED, direction.y * BULLET_SPEED)
+
+# This counts down the time the player can't be hit for after getting hit.
+# The view uses invincibility_frames to make the player flicker.
+def update_invincibility(world):
+    main_player = world.main_player
+    if main_player.invincibility_frames > 0.0:
+        main_player.invincibility_frames -= world.delta_time
+
+# Whether a ship with this many seconds of invincibility left is in the hidden part of its flicker.
+# Each second is cut into 5 pieces and the ship hides in every other one.
+# Works on one number, or on a whole array of them at once (like VectorEnv.invincibility)
+def is_flickered_out(invincibility):
+    fractional = np.mod(invincibility, 1.0)
+    return (invincibility > 0.0) & (np.floor(fractional * 5) % 2 == 1)
+
+# Picks which ship picture to show. Views use this to draw the player
+# When the player is invincible after getting hit we make them flicker
+def player_sprite_info(world):
+    if is_flickered_out(world.main_player.invincibility_frames):
+        return SPACESHIP_FLICKER_INFO
+    if world.keys_pressed[UP_KEY]:
+        return SPACESHIP_ACCELERATE_SPRITE_INFO
+    return SPACESHIP_SPRITE_INFO
+
+#
+#   Inputs --------------------------------------------------------------
+#
+
+keys = [RIGHT_KEY, LEFT_KEY, UP_KEY, SPACE_KEY]
+# Functions to call when a certain key is pressed
+key_events = [rotate_right, rotate_left, accelerate_player, lambda world: None]
+
+# Asks the world to shoot at the start of its next step.
+# Keyboards and bots call this instead of shoot(), so every shot happens at the same point in
+# a step. That way recording which step a shot happened on is enough to replay it exactly
+def request_shot(world):
+    world.pending_shots += 1
+
+# This is called every frame.
+# First we fire any shots that were asked for since the last frame.
+# Then we loop over all the keys and check if any of them are pressed at the moment
+# If it is, we call the function that is saved in key_events.
+def process_inputs(world):
+    while world.pending_shots > 0:
+        shoot(world)
+        world.pending_shots -= 1
+    for key in keys:
+        if world.keys_pressed[key]:
+            key_events[key](world)
+
+#
+#  Round functions ---------------------------------------------------------------
+#
+
+# time is how far into the step the round ended (see handle_bullet_asteroid_collisions)
+def reset_round(world, asteroid_count, time=0.0):
+
+    # Clear all the bullets
+    world.bullet_pool.release_all()
+
+    # Where the player is at that moment
+    main_player = world.main_player
+    player_position = main_player.position + main_player.velocity * time
+
+    # Create new asteroids
+    for i in range(asteroid_count):
+        position = random_vec2_component_length(world.round_spread, world.rng)
+
+        # Make sure the created asteroid does not spawn ontop of the player
+        while distance_between(player_position, position) < 300:
+            position = random_vec2_component_length(world.round_spread, world.rng)
+        velocity = random_vec2_component_length(ASTEROID_INFO['speeds'][3], world.rng)
+        # Like the pieces of a split asteroid, start it back where it would be at the start of the step
+        spawn_asteroid(world, 3, position + velocity * -time, velocity, time)
+
+
+# The most asteroids there can ever be at once in this world. Asteroids only ever split in two,
+# so one of stage s can become at most 2 ** (s - 1) of the smallest ones, and a new round
+# (of stage 3 asteroids) only starts once every asteroid is gone
+def most_asteroids(world):
+    asteroid_buffer = world.asteroid_buffer
+    pieces = int((2 ** (asteroid_buffer.health[asteroid_buffer.active] - 1)).sum())
+    return max(pieces, world.round_asteroids * 2 ** (3 - 1))
+
+#
+#  Asteroid and Bullet functions ----------------------------------------------------------
+#
+
+# Returns the slot the new asteroid is in.
+# time is how far into the current step it was made, if it was made during one (like the pieces of a split asteroid)
+def spawn_asteroid(world, stage, position, velocity, time=None):
+    # Get an empty slot in the buffer for our new asteroid
+    # If the buffer is full the pool makes it bigger, so we never run out
+    i = world.asteroid_pool.allocate()
+
+    asteroid_buffer = world.asteroid_buffer
+    asteroid_buffer.health[i] = stage
+    asteroid_buffer.position[i] = (position.x, position.y)
+    asteroid_buffer.velocity[i] = (velocity.x, velocity.y)
+    asteroid_buffer.radius[i] = ASTEROID_INFO['radii'][stage]
+    world.asteroid_index.insert(i)
+    if time is not None:
+        world.asteroids_born[i] = time
+    return i
+
+# Lets go of an asteroid that was broken time seconds into the step.
+# What it was is kept until the end of the step, because the player could have hit it before then
+def break_asteroid(world, asteroid, time):
+    asteroid_buffer = world.asteroid_buffer
+    x, y = asteroid_buffer.position[asteroid].tolist()
+    velocity_x, velocity_y = asteroid_buffer.velocity[asteroid].tolist()
+    made = world.asteroids_born.pop(asteroid, 0.0)
+    world.asteroids_broken.append((x, y, velocity_x, velocity_y, float(asteroid_buffer.radius[asteroid]), made, time))
+
+    world.asteroid_pool.release(asteroid)
+    world.asteroid_index.remove(asteroid)
+
+# The fastest anything in the arrays is going
+def fastest_speed(entities):
+    speeds_squared = (entities.velocity[entities.active] ** 2).sum(axis=1)
+    return math.sqrt(speeds_squared.max()) if len(speeds_squared) else 0.0
+
+# Puts every active asteroid into the collision grid. Done once a tick before the collision checks
+def rebuild_collision_grid(world):
+    world.asteroid_grid.rebuild(world.asteroid_buffer.position, world.asteroid_buffer.active)
+    world.fastest_asteroid_speed = fastest_speed(world.asteroid_buffer)
+    world.asteroids_born.clear()
+    world.asteroids_broken.clear()
+
+# When each pair of moving circles first touches, between start and end seconds into the step
+# (one number for every pair, or an array with one for each), or infinity if they don't.
+# Positions are where things are at the start of the step
+def contact_times(world, positions, velocities, other_positions, other_velocities, touching_distance,
+                  start=0.0, end=None):
+    if end is None:
+        end = world.delta_time
+    start = np.asarray(start, dtype=float)
+    if start.any():
+        # Where they both are at start, so the short way around is worked out from there
+        lead = start[..., None]
+        delta = wrapped_delta(other_positions + other_velocities * lead, positions + velocities * lead,
+                              world.width, world.height)
+    else:
+        delta = wrapped_delta(other_positions, positions, world.width, world.height)
+    times = swept_contact_times(delta, other_velocities - velocities, touching_distance, end - start) + start
+    return np.where(times < end, times, np.inf)
+
+# The grid only has where the asteroids are at the start of the step. Something that touches an
+# asteroid during the step starts at most (touching distance + how far they move towards each other)
+# away from it, so that's how far out we have to look in the grid
+def grid_rings(world, touching_distance, speed):
+    return world.asteroid_grid.rings_for(touching_distance + (speed + world.fastest_asteroid_speed) * world.delta_time)
+
+# Returns the (bullet, asteroid) pairs that touch at some point during this step, and when they first touch.
+# They come in the order the hits happen, and then in bullet order and asteroid order.
+# The grid only gives us the asteroids near each bullet, so we never check a bullet against
+# an asteroid on the other side of the screen.
+def find_bullet_asteroid_hits(world):
+    bullet_buffer = world.bullet_buffer
+    asteroid_buffer = world.asteroid_buffer
+
+    bullets = np.flatnonzero(bullet_buffer.active)
+    if len(bullets) == 0:
+        return bullets, bullets, np.zeros(0)
+
+    touching_distance = bullet_buffer.radius[bullets].max() + max(ASTEROID_INFO['radii'][1:])
+    rings = grid_rings(world, touching_distance, fastest_speed(bullet_buffer))
+    query, asteroids = world.asteroid_grid.candidate_pairs(bullet_buffer.position[bullets], rings)
+    bullets = bullets[query]
+
+    # Sweep each bullet along its path for the step, so a fast bullet can't jump over an asteroid
+    times = contact_times(world, bullet_buffer.position[bullets], bullet_buffer.velocity[bullets],
+                          asteroid_buffer.position[asteroids], asteroid_buffer.velocity[asteroids],
+                          bullet_buffer.radius[bullets] + asteroid_buffer.radius[asteroids])
+    hit = (times < np.inf) & asteroid_buffer.active[asteroids]
+
+    bullets = bullets[hit]
+    asteroids = asteroids[hit]
+    times = times[hit]
+    order = np.lexsort((asteroids, bullets, times))
+    return bullets[order], asteroids[order], times[order]
+
+# The hits between asteroids made time seconds into the step and the bullets still flying then,
+# as (time, bullet, asteroid, the asteroid's generation) for handle_bullet_asteroid_collisions.
+# The bullet that broke the asteroid they came from is already gone, so it can't hit them
+def find_new_asteroid_hits(world, asteroids, time):
+    bullet_buffer = world.bullet_buffer
+    asteroid_buffer = world.asteroid_buffer
+    bullets = np.flatnonzero(bullet_buffer.active)
+    if len(bullets) == 0:
+        return []
+    asteroids = np.array(asteroids)
+    bullets, asteroids = np.repeat(bullets, len(asteroids)), np.tile(asteroids, len(bullets))
+    times = contact_times(world, bullet_buffer.position[bullets], bullet_buffer.velocity[bullets],
+                          asteroid_buffer.position[asteroids], asteroid_buffer.velocity[asteroids],
+                          bullet_buffer.radius[bullets] + asteroid_buffer.radius[asteroids], start=time)
+    hit = times < np.inf
+    generation = world.asteroid_pool.generation
+    return [(time, bullet, asteroid, generation[asteroid])
+            for time, bullet, asteroid in zip(times[hit].tolist(), bullets[hit].tolist(), asteroids[hit].tolist())]
+
+def handle_bullet_asteroid_collisions(world):
+    ScoreInfo = world.ScoreInfo
+    asteroid_buffer = world.asteroid_buffer
+    generation = world.asteroid_pool.generation
+
+    # Check if each bullet hits any of the asteroids during this step
+    hit_bullets, hit_asteroids, hit_times = find_bullet_asteroid_hits(world)
+    if len(hit_bullets) == 0:
+        return
+
+    # The hits still to handle, soonest first, as (time, bullet, asteroid, the asteroid's generation).
+    # A broken asteroid's slot can be handed straight to one of its pieces, and the generation
+    # (see pool.py) tells us a hit was found for whatever was in the slot before
+    hits = [(time, bullet, asteroid, generation[asteroid])
+            for time, bullet, asteroid in zip(hit_times.tolist(), hit_bullets.tolist(), hit_asteroids.tolist())]
+    # They are already in order, and a list in order is a heap
+
+    # When each bullet hit its first asteroid. A bullet can break every asteroid it touches
+    # at that moment, but it's gone before it can reach any others
+    bullet_hit_time = {}
+
+    while hits:
+        # Every hit at the same moment is handled before the pieces they made are checked against the bullets
+        now = hits[0][0]
+        pieces = []
+        while hits and hits[0][0] == now:
+            time, bullet, asteroid, asteroid_generation = heapq.heappop(hits)
+            if (not asteroid_buffer.active[asteroid] or generation[asteroid] != asteroid_generation
+                    or bullet_hit_time.get(bullet, time) < time):
+                continue
+
+            # If it is then we give both of them back to their pools
+            bullet_hit_time[bullet] = time
+            health = int(asteroid_buffer.health[asteroid])
+            # Where the asteroid was when it got hit
+            x, y = asteroid_buffer.position[asteroid] + asteroid_buffer.velocity[asteroid] * time
+            break_asteroid(world, asteroid, time)
+            world.bullet_pool.release(bullet)
+
+            ScoreInfo.current_score += ASTEROID_INFO['points'][health]
+            if world.particles is not None:
+                world.particles.explode(x, y, health)
+
+            # If the asteroid was not the smallest, then we split it in two!
+            if health >= 2:
+                for piece in range(2):
+                    velocity = random_vec2_component_length(ASTEROID_INFO['speeds'][health], world.rng)
+                    # The pieces get moved a whole step along with everything else,
+                    # so start them back where they'd be if they had been flying since the start of the step
+                    pieces.append(spawn_asteroid(world, health - 1, vec2(x - velocity.x * time, y - velocity.y * time),
+                                                 velocity, time))
+
+        if world.total_active_asteroids == 0:
+            # Every bullet goes with the old round, so nothing else can be hit this step
+            world.rounds_cleared += 1
+            reset_round(world, world.round_asteroids, now)
+            return
+
+        # The other bullets can run into the pieces later in the step, just like they
+        # would in the next step if the steps were shorter
+        if pieces:
+            for hit in find_new_asteroid_hits(world, pieces, now):
+                heapq.heappush(hits, hit)
+
+#
+#  Movement and Physics Functions ---------------------------------------------------------
+#
+
+# Make the entity wrap around the sides of the world
+# Going past an edge by a bit brings you back in the other side by the same bit,
+# so a big step and lots of small steps end up in the same place
+def border_wrap_entity(world, entity):
+    width = world.width
+    height = world.height
+    if abs(entity.position.x) > width / 2 or abs(entity.position.y) > height / 2:
+        if entity.position.x > width / 2:
+            entity.position.x -= width
+        elif entity.position.x < -width / 2:
+            entity.position.x += width
+
+        if entity.position.y > height / 2:
+            entity.position.y -= height
+        elif entity.position.y < -height / 2:
+            entity.position.y += height
+
+# The same wrap as border_wrap_entity, but for every entity in the arrays at once
+# Most steps nothing goes past an edge, so check that first
+def border_wrap_arrays(world, positions):
+    size = np.array([world.width, world.height])
+    outside = np.abs(positions) > size / 2
+    if outside.any():
+        # copysign gives +size past the right (or top) edge and -size past the left (or bottom)
+        positions -= np.copysign(size, positions) * outside
+
+def move_player(world):
+    entity = world.main_player
+
+    # Move the entity forward by its velocity
+    # The position changes in place, so nothing else should be holding on to this vec2
+    # expecting it to stay put (shoot copies the numbers out of it for that reason)
+    entity.position.add_scaled(entity.velocity, world.delta_time)
+
+    border_wrap_entity(world, entity)
+
+# Moves every active entity in the arrays forward by its velocity, then wraps them.
+# The "where" means only the active rows get moved, the inactive ones are left alone
+def move_entity_arrays(world, entities):
+    active = entities.active[:, None]
+    np.add(entities.position, entities.velocity * world.delta_time,
+           out=entities.position, where=active)
+    border_wrap_arrays(world, entities.position)
+
+def check_player_collisions(world):
+    main_player = world.main_player
+    delta_time = world.delta_time
+    # Hits while the player is still invincible don't count, so only look from when that runs out
+    start = max(main_player.invincibility_frames, 0.0)
+    if start >= delta_time:
+        return
+    asteroid_buffer = world.asteroid_buffer
+    player_position = np.array([[main_player.position.x, main_player.position.y]])
+    player_velocity = np.array([[main_player.velocity.x, main_player.velocity.y]])
+    player_speed = math.hypot(main_player.velocity.x, main_player.velocity.y)
+
+    # Only check the asteroids in the grid cells around the player
+    touching_distance = max(ASTEROID_INFO['radii'][1:]) + main_player.radius
+    rings = grid_rings(world, touching_distance, player_speed)
+    query, asteroids = world.asteroid_grid.candidate_pairs(player_position, rings)
+    asteroids = asteroids[asteroid_buffer.active[asteroids]]
+
+    # The grid is from the start of the step. Asteroids made since then are only there from the
+    # moment they were made, and broken ones only until the moment they were broken
+    #
+    #     0                                                delta_time
+    #     |------------- in the grid the whole step -------------|
+    #     |---------- broken --------x
+    #                                x------ its pieces ---------|
+    #
+    positions = asteroid_buffer.position[asteroids]
+    velocities = asteroid_buffer.velocity[asteroids]
+    radii = asteroid_buffer.radius[asteroids]
+    starts = start
+    ends = delta_time
+    born = world.asteroids_born
+    broken = world.asteroids_broken
+    if born or broken:
+        born_slots = np.array(list(born), dtype=np.int64)
+        asteroids = asteroids[~np.isin(asteroids, born_slots)]
+        broken = np.array(broken).reshape(-1, 7)
+        positions = np.concatenate([asteroid_buffer.position[asteroids], asteroid_buffer.position[born_slots], broken[:, 0:2]])
+        velocities = np.concatenate([asteroid_buffer.velocity[asteroids], asteroid_buffer.velocity[born_slots], broken[:, 2:4]])
+        radii = np.concatenate([asteroid_buffer.radius[asteroids], asteroid_buffer.radius[born_slots], broken[:, 4]])
+        made = np.concatenate([np.zeros(len(asteroids)), np.array(list(born.values())), broken[:, 5]])
+        starts = np.maximum(made, start)
+        ends = np.concatenate([np.full(len(asteroids) + len(born_slots), delta_time), broken[:, 6]])
+
+    times = contact_times(world, player_position, player_velocity, positions, velocities,
+                          radii + main_player.radius, starts, ends)
+    times = times[times < np.inf]
+    if len(times) == 0:
+        return
+
+    # Every asteroid touching the player at the first hit takes away one health.
+    # After that the player is invincible, so any others this step don't count
+    first_hit = times.min()
+    hit_count = int(np.count_nonzero(times == first_hit))
+    main_player.health -= hit_count
+    # seconds of invincibility, counted from the moment of the hit
+    main_player.invincibility_frames = 5.00 + first_hit
+
+#
+#  Asking where the asteroids are ------------------------------------------------------
+#
+#  For pilots, and anything else that wants to know what is around the ship without checking
+#  every asteroid there is. They all use world.asteroid_index (a SpatialIndex, see spatial.py),
+#  measure the short way around the world, and return slots in asteroid_buffer.
+#
+
+# (slots, distances) of the asteroids whose middles are within radius of position (a vec2), closest first
+def asteroids_within(world, position, radius):
+    return world.asteroid_index.within_radius(position.x, position.y, radius)
+
+# (slots, distances) of the k asteroids closest to position, closest first
+def nearest_asteroids(world, position, k=1):
+    return world.asteroid_index.nearest(position.x, position.y, k)
+
+# The first asteroid straight ahead of the player, within max_distance, as (slot, distance), or None.
+# rotation is which way to look, in degrees, the way the player is facing if it isn't given
+def asteroid_ahead(world, max_distance, rotation=None):
+    main_player = world.main_player
+    if rotation is None:
+        rotation = main_player.rotation
+    direction = unit_vector_from_rotation(rotation)
+    return world.asteroid_index.raycast(main_player.position.x, main_player.position.y, direction, max_distance)
+
+#
+#  Stepping the world --------------------------------------------------------
+#
+
+# Goes through every player taking part in a step, for the parts of a step that are about one player.
+# Normally that is just world.main_player. A world can have more players than that though
+# (see server.py): then ships is a list of things with a player, keys_pressed and pending_shots,
+# and each one gets put in world.main_player, world.keys_pressed and world.pending_shots in turn
+def each_player(world, ships):
+    if ships is None:
+        yield world.main_player
+        return
+    for ship in ships:
+        world.main_player = ship.player
+        world.keys_pressed = ship.keys_pressed
+        world.pending_shots = ship.pending_shots
+        yield ship.player
+        ship.pending_shots = world.pending_shots
+
+# Moves the whole world forward by delta_time seconds.
+# This is one "frame" of the game, without any of the drawing.
+# The profiler (see profiler.py) times each part. By default it is one that does nothing
+# ships is for a world with more than one player in it (see each_player above)
+def step_world(world, delta_time, profiler=NULL_PROFILER, ships=None):
+    world.delta_time = delta_time
+    profiler.start()
+    if ships is not None:
+        # Ships still alive at the start of the step get the whole step, even if they die part way through
+        ships = [ship for ship in ships if ship.player.health > 0]
+
+    # Get the keys that were pressed this frame
+    for player in each_player(world, ships):
+        process_inputs(world)
+    profiler.mark('input')
+
+    # Check collisions
+    # A cleared round puts the new asteroids away from whichever player is in main_player
+    rebuild_collision_grid(world)
+    handle_bullet_asteroid_collisions(world)
+    for player in each_player(world, ships):
+        check_player_collisions(world)
+    profiler.mark('collisions')
+
+    # Move the entities!
+    for player in each_player(world, ships):
+        move_player(world)
+    move_entity_arrays(world, world.asteroid_buffer)
+    world.asteroid_index.moved()
+    move_entity_arrays(world, world.bullet_buffer)
+    profiler.mark('movement')
+
+    for player in each_player(world, ships):
+        update_invincibility(world)
+    if world.particles is not None:
+        world.particles.update(world.delta_time, world.width, world.height)
+    profiler.mark('animation')
+
+    world.tick += 1
+
+# Steps the world as fast as the computer can, with no window and no waiting between frames.
+# Every step moves the world forward by the same delta_time, so a run is not affected
+# by how fast the computer is. Returns how many steps were run.
+# step is the function that does each step, in case something else needs to happen along with it
+def run_headless(world, delta_time=1 / 60, max_ticks=None, profiler=NULL_PROFILER, step=step_world):
+    ticks = 0
+    while not world.is_game_over():
+        if max_ticks is not None and ticks >= max_ticks:
+            break
+        profiler.begin_frame()
+        step(world, delta_time, profiler)
+        profiler.end_frame()
+        ticks += 1
+    return ticks
@@ -0,0 +1,190 @@
+import math
+
+import numpy as np
+
+from simulation import World
+
+#
+#  World snapshots ------------------------------------------------------------------------
+#
+#  A snapshot is everything in a World, saved into one file: the player, the score, the asteroid
+#  and bullet arrays, the pools' free lists and even the state of the random number generator.
+#  Loading a snapshot gives a World that carries on exactly as the saved one would have.
+#  Use them to pick a long soak test back up, or to load the same moment several times and
+#  try different things from it ("what if I'd turned left here?").
+#
+#  The file has a fixed layout, described by a NumPy "structured dtype": a list of named fields,
+#  each with a type and a shape, at fixed places in the file. The layout only depends on how
+#  many asteroid and bullet slots the world has, and those are in the header at the start.
+#
+#     header:     magic 'ASWS', version, capacities, seed, world size, tick, score, the player, the random state...
+#     asteroids:  position, velocity, radius, health, active, plus the asteroid pool's slots
+#     bullets:    the same for the bullets
+#
+#  Loading doesn't read the file into new arrays. np.memmap maps the file into memory, and the
+#  world's arrays become windows ("views") straight onto it, so loading a world with 10,000 asteroids
+#  takes about as long as loading one with 5. The map is "copy on write" (mode 'c'): when the
+#  world changes a page of its arrays it gets its own copy, and the file is never changed.
+#
+
+MAGIC = b'ASWS'
+VERSION = 2
+
+PLAYER_DTYPE = np.dtype([('health', '<i8'), ('position', '<f8', (2,)), ('velocity', '<f8', (2,)),
+                         ('rotation', '<f8'), ('invincibility_frames', '<f8')], align=True)
+
+POOL_STATS = ['live_count', 'high_water_mark', 'allocations', 'recycled', 'grows']
+
+HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u4'),
+                         ('asteroid_capacity', '<i8'), ('bullet_capacity', '<i8'),
+                         ('seed', '<u8'), ('width', '<f8'), ('height', '<f8'),
+                         ('tick', '<i8'), ('rounds_cleared', '<i8'),
+                         ('current_score', '<i8'), ('high_score', '<i8'),
+                         ('delta_time', '<f8'), ('pending_shots', '<i8'), ('keys_pressed', '?', (4,)),
+                         ('player', PLAYER_DTYPE),
+                         # random.Random.getstate() is (version, 625 numbers, gauss_next)
+                         ('rng_version', '<i8'), ('rng_state', '<u4', (625,)), ('rng_gauss_next', '<f8')],
+                        align=True)
+
+# The arrays of one EntityArrays and its EntityPool, for a buffer with capacity slots.
+# The free list and allocation order change length, so they get room for as many as they can
+# hold, and the header part of the block says how many are in use
+def entity_dtype(capacity):
+    return np.dtype([('position', '<f8', (capacity, 2)), ('velocity', '<f8', (capacity, 2)),
+                     ('radius', '<f8', (capacity,)), ('health', '<i8', (capacity,)),
+                     ('active', '?', (capacity,)),
+                     ('generation', '<i8', (capacity,)),
+                     ('free_count', '<i8'), ('free_slots', '<i8', (capacity,)),
+                     ('order_count', '<i8'), ('allocation_order', '<i8', (2 * capacity + 1, 2)),
+                     ('stats', '<i8', (len(POOL_STATS),))],
+                    align=True)
+
+def snapshot_dtype(asteroid_capacity, bullet_capacity):
+    return np.dtype([('header', HEADER_DTYPE),
+                     ('asteroids', entity_dtype(asteroid_capacity)),
+                     ('bullets', entity_dtype(bullet_capacity))],
+                    align=True)
+
+#
+#  Saving --------------------------------------------------------------------------------
+#
+
+def save_entities(block, entities, pool):
+    block['position'] = entities.position
+    block['velocity'] = entities.velocity
+    block['radius'] = entities.radius
+    block['health'] = entities.health
+    block['active'] = entities.active
+    block['generation'] = pool.generation
+    block['free_count'] = len(pool.free_slots)
+    block['free_slots'][:len(pool.free_slots)] = pool.free_slots
+    block['order_count'] = len(pool.allocation_order)
+    if pool.allocation_order:
+        block['allocation_order'][:len(pool.allocation_order)] = list(pool.allocation_order)
+    block['stats'] = [getattr(pool, name) for name in POOL_STATS]
+
+# Fills a snapshot record (from snapshot_dtype) with everything in world
+def fill_snapshot(snapshot, world):
+    header = snapshot['header']
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['asteroid_capacity'] = len(world.asteroid_buffer)
+    header['bullet_capacity'] = len(world.bullet_buffer)
+    header['seed'] = world.seed
+    header['width'] = world.width
+    header['height'] = world.height
+    header['tick'] = world.tick
+    header['rounds_cleared'] = world.rounds_cleared
+    header['current_score'] = world.ScoreInfo.current_score
+    header['high_score'] = world.ScoreInfo.high_score
+    header['delta_time'] = world.delta_time
+    header['pending_shots'] = world.pending_shots
+    header['keys_pressed'] = world.keys_pressed
+
+    main_player = world.main_player
+    player = header['player']
+    player['health'] = main_player.health
+    player['position'] = (main_player.position.x, main_player.position.y)
+    player['velocity'] = (main_player.velocity.x, main_player.velocity.y)
+    player['rotation'] = main_player.rotation
+    player['invincibility_frames'] = main_player.invincibility_frames
+
+    rng_version, rng_state, gauss_next = world.rng.getstate()
+    header['rng_version'] = rng_version
+    header['rng_state'] = rng_state
+    header['rng_gauss_next'] = math.nan if gauss_next is None else gauss_next
+
+    save_entities(snapshot['asteroids'], world.asteroid_buffer, world.asteroid_pool)
+    save_entities(snapshot['bullets'], world.bullet_buffer, world.bullet_pool)
+
+# Saves everything in world to path
+def save_snapshot(world, path):
+    snapshot = np.zeros((), dtype=snapshot_dtype(len(world.asteroid_buffer), len(world.bullet_buffer)))
+    fill_snapshot(snapshot, world)
+    snapshot.tofile(path)
+
+#
+#  Loading --------------------------------------------------------------------------------
+#
+
+def load_entities(block, entities, pool):
+    # These are views into the snapshot, nothing is copied
+    entities.position = block['position']
+    entities.velocity = block['velocity']
+    entities.radius = block['radius']
+    entities.health = block['health']
+    entities.active = block['active']
+
+    # The pool keeps these in Python lists, so they do get copied out.
+    # This is the only part of loading that takes longer with more slots
+    pool.generation = block['generation'].tolist()
+    pool.free_slots = block['free_slots'][:int(block['free_count'])].tolist()
+    pool.allocation_order.clear()
+    pool.allocation_order.extend(map(tuple, block['allocation_order'][:int(block['order_count'])].tolist()))
+    for name, value in zip(POOL_STATS, block['stats'].tolist()):
+        setattr(pool, name, value)
+
+def check_header(header):
+    if header['magic'] != MAGIC:
+        raise ValueError('not an Asteroids world snapshot')
+    if header['version'] != VERSION:
+        raise ValueError('snapshot version ' + str(int(header['version'])) + ' is not supported')
+
+# Makes a World that carries on from a snapshot record
+def restore_snapshot(snapshot):
+    header = snapshot['header']
+    check_header(header)
+
+    # A normal sized world to fill in. Its arrays and pool lists all get swapped for the snapshot's below
+    world = World(seed=int(header['seed']), width=float(header['width']), height=float(header['height']))
+    world.tick = int(header['tick'])
+    world.rounds_cleared = int(header['rounds_cleared'])
+    world.ScoreInfo.current_score = int(header['current_score'])
+    world.ScoreInfo.high_score = int(header['high_score'])
+    world.delta_time = float(header['delta_time'])
+    world.pending_shots = int(header['pending_shots'])
+    world.keys_pressed[:] = header['keys_pressed'].tolist()
+
+    main_player = world.main_player
+    player = header['player']
+    main_player.health = int(player['health'])
+    main_player.position.x, main_player.position.y = player['position'].tolist()
+    main_player.velocity.x, main_player.velocity.y = player['velocity'].tolist()
+    main_player.rotation = float(player['rotation'])
+    main_player.invincibility_frames = float(player['invincibility_frames'])
+
+    gauss_next = float(header['rng_gauss_next'])
+    world.rng.setstate((int(header['rng_version']), tuple(header['rng_state'].tolist()),
+                        None if math.isnan(gauss_next) else gauss_next))
+
+    load_entities(snapshot['asteroids'], world.asteroid_buffer, world.asteroid_pool)
+    load_entities(snapshot['bullets'], world.bullet_buffer, world.bullet_pool)
+    world.asteroid_index.rebuild()
+    return world
+
+# Loads a World from a snapshot file, memory-mapped so the arrays are never read into new memory
+def load_snapshot(path):
+    header = np.memmap(path, dtype=HEADER_DTYPE, mode='r', shape=())
+    check_header(header)
+    layout = snapshot_dtype(int(header['asteroid_capacity']), int(header['bullet_capacity']))
+    return restore_snapshot(np.memmap(path, dtype=layout, mode='c', shape=()))
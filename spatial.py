@@ -0,0 +1,425 @@
+import numpy as np
+
+#
+#  A spatial hash cuts the screen up into a grid of square-ish cells, and remembers
+#  which entities are in which cell.
+#
+#  Checking every bullet against every asteroid means bullets * asteroids distance checks.
+#  With thousands of asteroids that is millions of checks a frame, and almost all of them
+#  are for things on opposite sides of the screen that can't possibly be touching!
+#
+#  If the cells are at least as big as the biggest "touching distance", then anything an entity
+#  can touch is either in its own cell or one of the 8 cells around it:
+#
+#     +----+----+----+
+#     |    |    |    |
+#     +----+----+----+
+#     |    | *  |    |      * = the entity we are checking
+#     +----+----+----+          we only look in these 9 cells
+#     |    |    |    |
+#     +----+----+----+
+#
+#  The screen wraps around, so the cells on the left edge are neighbours of the cells on the right edge.
+#
+
+# Returns the shortest x, y difference between points a and b on a screen that wraps around
+# eg: on a 1200 wide screen, x = 590 and x = -590 are only 20 apart, not 1180!
+def wrapped_delta(a, b, width, height):
+    delta = a - b
+    size = np.array([width, height])
+    delta -= size * np.round(delta / size)
+    return delta
+
+# Returns the first time (between 0 and delta_time) that two moving circles touch, or infinity if they don't.
+#   delta             -> where the other circle is compared to this one at the start (from wrapped_delta)
+#   relative_velocity -> how fast the other circle is moving compared to this one
+#   touching_distance -> the two radii added together
+#
+# Checking only where things are at the end of a step misses a fast bullet that jumps right over
+# a small asteroid. Instead we work out when the gap between them is exactly touching_distance:
+#
+#     |delta + relative_velocity * t| = touching_distance
+#
+# Squaring both sides gives a quadratic a*t^2 + 2*b*t + c = 0, and the smaller answer is when they first touch
+def swept_contact_times(delta, relative_velocity, touching_distance, delta_time):
+    # einsum('...j,...j->...') is the dot product of each [x, y] with the same one in the other array.
+    # The ... means the arrays can have any shape, as long as it ends in [x, y] (see vector_env.py)
+    a = np.einsum('...j,...j->...', relative_velocity, relative_velocity)
+    b = np.einsum('...j,...j->...', delta, relative_velocity)
+    c = np.einsum('...j,...j->...', delta, delta) - touching_distance ** 2
+
+    # Pairs that aren't moving compared to each other (a == 0) or never get close enough (b*b - a*c < 0)
+    # have no answer, so they are left at infinity: they never touch
+    discriminant = b * b - a * c
+    first_touch = np.full(a.shape, np.inf, dtype=a.dtype)
+    np.divide(-b - np.sqrt(np.maximum(discriminant, 0.0)), a, out=first_touch,
+              where=(discriminant >= 0.0) & (a > 0.0))
+    times = np.where((first_touch >= 0.0) & (first_touch < delta_time), first_touch, np.inf)
+
+    # Already touching at the start of the step
+    times[c < 0.0] = 0.0
+    return times
+
+class SpatialHash:
+    def __init__(self, width, height, cell_size):
+        self.width = width
+        self.height = height
+
+        # Fit as many whole cells across the screen as we can. Each cell ends up a little
+        # bigger than cell_size, never smaller, so the 9 cell neighbourhood is always big enough
+        self.columns = max(1, int(width // cell_size))
+        self.rows = max(1, int(height // cell_size))
+        self.cell_width = width / self.columns
+        self.cell_height = height / self.rows
+        cell_count = self.columns * self.rows
+
+        # After rebuild():
+        #   sorted_indices -> the entity indices, sorted so all the entities in cell 0 come first, then cell 1...
+        #   cell_start[c]  -> where cell c's entities start in sorted_indices
+        #   cell_count[c]  -> how many entities are in cell c
+        self.sorted_indices = np.zeros(0, dtype=np.int64)
+        self.cell_start = np.zeros(cell_count, dtype=np.int64)
+        self.cell_count = np.zeros(cell_count, dtype=np.int64)
+
+    # Returns the (column, row) of the cell each point is in
+    def cell_coordinates(self, points):
+        column = ((points[:, 0] + self.width / 2) // self.cell_width).astype(np.int64)
+        row = ((points[:, 1] + self.height / 2) // self.cell_height).astype(np.int64)
+        return column % self.columns, row % self.rows
+
+    # How many rings of cells around a point we have to look in to find everything within distance of it
+    def rings_for(self, distance):
+        return max(1, int(np.ceil(distance / min(self.cell_width, self.cell_height))))
+
+    # Puts every active entity into its cell. This is done once a tick, after things have moved
+    def rebuild(self, positions, active):
+        indices = np.flatnonzero(active)
+        column, row = self.cell_coordinates(positions[indices])
+        cells = row * self.columns + column
+
+        # Sorting by cell puts each cell's entities next to each other
+        order = np.argsort(cells, kind='stable')
+        self.sorted_indices = indices[order]
+        self.cell_count = np.bincount(cells, minlength=len(self.cell_count))
+        self.cell_start = np.cumsum(self.cell_count) - self.cell_count
+
+    # Returns two arrays (query, entity) with one pair for every entity in the cells around each point.
+    # rings is how many cells out we look: 1 means the 3x3 block around each point
+    def candidate_pairs(self, points, rings=1):
+        column, row = self.cell_coordinates(points)
+        offsets = np.arange(-rings, rings + 1)
+        neighbour_columns = (column[:, None, None] + offsets[None, :, None]) % self.columns
+        neighbour_rows = (row[:, None, None] + offsets[None, None, :]) % self.rows
+        cells = (neighbour_rows * self.columns + neighbour_columns).reshape(len(points), -1)
+
+        counts = self.cell_count[cells]
+
+        # On a tiny grid the block around a point can wrap onto itself and visit a cell twice.
+        # Sorting each row puts repeated cells next to each other so we can skip the repeats
+        if self.columns <= 2 * rings or self.rows <= 2 * rings:
+            cells.sort(axis=1)
+            counts = self.cell_count[cells]
+            counts[:, 1:][cells[:, 1:] == cells[:, :-1]] = 0
+
+        counts = counts.ravel()
+        starts = self.cell_start[cells].ravel()
+        total = counts.sum()
+
+        # For every (point, cell) we want the numbers start, start + 1, ... start + count - 1.
+        # np.repeat makes one copy of the start for each entity in the cell,
+        # and then we add how far along that cell's run each entity is
+        run_offsets = np.cumsum(counts) - counts
+        positions_in_sorted = (np.repeat(starts - run_offsets, counts) + np.arange(total))
+
+        query = np.repeat(np.repeat(np.arange(len(points)), cells.shape[1]), counts)
+        return query, self.sorted_indices[positions_in_sorted]
+
+#
+#  Asking where things are -------------------------------------------------------------------
+#
+#  The SpatialHash above is built from scratch once a tick, for the collision checks. A SpatialIndex
+#  is for everything else that wants to know what is near somewhere: pilots looking for something
+#  to shoot, or for something about to hit them. It answers three questions:
+#
+#     within_radius(x, y, radius)    -> everything whose middle is within radius of (x, y)
+#     nearest(x, y, k)               -> the k things closest to (x, y)
+#     raycast(x, y, direction, ...)  -> the first thing a line from (x, y) going in direction runs into
+#
+#  Each of them only looks in the cells near the question, so they take about as long
+#  with 10,000 asteroids in the world as with 10.
+#
+#  The index is never rebuilt from scratch. It keeps a list of the slots in every cell,
+#  and remembers which cell each slot is in:
+#
+#     cells[7] = [3, 12, 40]        slot_cell[12] = 7
+#
+#  so adding a slot, taking one out, or moving one to another cell only touches two short lists.
+#  Things only move a few pixels a step, and the cells are much bigger than that, so after
+#  each move only a handful of slots actually change cell and need their lists changed.
+#
+#  nearest() looks in rings of cells around the point, one ring further out at a time:
+#
+#     +---+---+---+---+---+
+#     | 2 | 2 | 2 | 2 | 2 |     After looking at rings 0 to r, everything within r cell widths
+#     +---+---+---+---+---+     of the point has been seen. Once we have k things that are
+#     | 2 | 1 | 1 | 1 | 2 |     closer than that, nothing further out can beat them and we stop.
+#     +---+---+---+---+---+
+#     | 2 | 1 | 0 | 1 | 2 |
+#     +---+---+---+---+---+
+#     | 2 | 1 | 1 | 1 | 2 |
+#     +---+---+---+---+---+
+#     | 2 | 2 | 2 | 2 | 2 |
+#     +---+---+---+---+---+
+#
+#  raycast() steps along the line one cell at a time, looking in the cells around each step.
+#
+#  With only a few things in the whole index (a normal round has 5 asteroids), walking out through
+#  ring after ring of empty cells costs more than just looking at all of them, so that's what we do.
+#  Like wrapped_delta, it measures the short way around the world, so a ray stops at half
+#  the width (or height) of the world, whichever is shorter.
+#
+
+# A SpatialIndex with this many things in it or fewer just looks at all of them
+SMALL_INDEX = 32
+
+class SpatialIndex:
+    def __init__(self, entities, width, height, cell_size, max_radius=0.0):
+        self.entities = entities # an EntityArrays
+        self.width = width
+        self.height = height
+        self.max_radius = max_radius # the biggest entity that will be put in, for raycast()
+
+        # The same cells as a SpatialHash with this cell_size
+        self.columns = max(1, int(width // cell_size))
+        self.rows = max(1, int(height // cell_size))
+        self.cell_width = width / self.columns
+        self.cell_height = height / self.rows
+        self.cell_size = min(self.cell_width, self.cell_height)
+
+        self.cells = [[] for cell in range(self.columns * self.rows)]
+        self.slot_cell = np.full(len(entities), -1, dtype=np.int64) # -1 for slots that aren't in the index
+        self.slot_place = [0] * len(entities) # where each slot is in its cell's list
+        self.count = 0 # slots in the index
+        self.ring_cache = {} # (cell, ring) -> the cells in that ring around that cell
+
+        # Statistics
+        self.inserts = 0
+        self.removes = 0
+        self.cell_changes = 0 # moves that took a slot into a different cell
+
+    def __len__(self):
+        return self.count
+
+    # The entity arrays can get more slots while the game runs
+    def grow(self, capacity):
+        extra = capacity - len(self.slot_cell)
+        if extra > 0:
+            self.slot_cell = np.concatenate([self.slot_cell, np.full(extra, -1, dtype=np.int64)])
+            self.slot_place.extend([0] * extra)
+
+    # The cell each point is in. This runs over every asteroid after every move, and multiplying
+    # then np.floor is several times quicker than // on floats, which works out a remainder too
+    def cells_of(self, points):
+        column = np.floor((points[:, 0] + self.width / 2) * (1 / self.cell_width)).astype(np.int64)
+        row = np.floor((points[:, 1] + self.height / 2) * (1 / self.cell_height)).astype(np.int64)
+        column %= self.columns
+        row %= self.rows
+        row *= self.columns
+        row += column
+        return row
+
+    def cell_of(self, x, y):
+        column = int((x + self.width / 2) // self.cell_width) % self.columns
+        row = int((y + self.height / 2) // self.cell_height) % self.rows
+        return row * self.columns + column
+
+    def add_to_cell(self, slot, cell):
+        members = self.cells[cell]
+        self.slot_cell[slot] = cell
+        self.slot_place[slot] = len(members)
+        members.append(slot)
+        self.count += 1
+
+    # Takes a slot out of its cell's list by moving the last slot in the list into its place
+    def take_from_cell(self, slot):
+        cell = self.slot_cell[slot]
+        members = self.cells[cell]
+        place = self.slot_place[slot]
+        last = members.pop()
+        if last != slot:
+            members[place] = last
+            self.slot_place[last] = place
+        self.slot_cell[slot] = -1
+        self.count -= 1
+
+    # Call when an entity is made (or moved somewhere new without moved() being called)
+    def insert(self, slot):
+        if slot >= len(self.slot_cell):
+            self.grow(len(self.entities))
+        if self.slot_cell[slot] >= 0:
+            self.take_from_cell(slot)
+        x, y = self.entities.position[slot]
+        self.add_to_cell(slot, self.cell_of(x, y))
+        self.inserts += 1
+
+    # Call when an entity is gone
+    def remove(self, slot):
+        if slot < len(self.slot_cell) and self.slot_cell[slot] >= 0:
+            self.take_from_cell(slot)
+            self.removes += 1
+
+    # Call after the entities have moved. Only the slots that changed cell get touched.
+    # Slots that were let go (or made) without remove() (or insert()) being called get sorted out here too
+    def moved(self):
+        entities = self.entities
+        if len(entities) > len(self.slot_cell):
+            self.grow(len(entities))
+        cells = self.cells_of(entities.position)
+        cells[~entities.active] = -1
+        changed = np.flatnonzero(cells != self.slot_cell)
+        for slot, cell in zip(changed.tolist(), cells[changed].tolist()):
+            if self.slot_cell[slot] >= 0:
+                self.take_from_cell(slot)
+            if cell >= 0:
+                self.add_to_cell(slot, cell)
+        self.cell_changes += len(changed)
+        return len(changed)
+
+    # Starts again from every active entity. Only needed when the arrays were swapped for new ones
+    def rebuild(self):
+        for members in self.cells:
+            members.clear()
+        self.grow(len(self.entities))
+        self.slot_cell[:] = -1
+        self.count = 0
+        for slot in np.flatnonzero(self.entities.active).tolist():
+            x, y = self.entities.position[slot]
+            self.add_to_cell(slot, self.cell_of(x, y))
+
+    # The cells `ring` cells out from cell, each one only once even on a small grid that wraps.
+    # The same few rings get asked for over and over, so they are kept once worked out
+    def ring_cells(self, cell, ring):
+        cells = self.ring_cache.get((cell, ring))
+        if cells is None:
+            column, row = cell % self.columns, cell // self.columns
+            if ring == 0:
+                offsets = [(0, 0)]
+            else:
+                offsets = ([(dx, -ring) for dx in range(-ring, ring + 1)] + [(dx, ring) for dx in range(-ring, ring + 1)]
+                           + [(-ring, dy) for dy in range(-ring + 1, ring)] + [(ring, dy) for dy in range(-ring + 1, ring)])
+            cells = frozenset(((row + dy) % self.rows) * self.columns + (column + dx) % self.columns
+                              for dx, dy in offsets)
+            self.ring_cache[(cell, ring)] = cells
+        return cells
+
+    # The cells within `rings` rings of cell
+    def block_cells(self, cell, rings):
+        cells = set()
+        for ring in range(min(rings, self.last_ring()) + 1):
+            cells |= self.ring_cells(cell, ring)
+        return cells
+
+    # How many rings it takes to have looked at every cell
+    def last_ring(self):
+        return max(self.columns, self.rows) // 2
+
+    # Every active slot in the index
+    def all_slots(self):
+        slots = np.flatnonzero(self.slot_cell >= 0)
+        return slots[self.entities.active[slots]]
+
+    # The active slots in these cells
+    def slots_in(self, cells):
+        slots = []
+        for cell in cells:
+            slots.extend(self.cells[cell])
+        slots = np.array(slots, dtype=np.int64)
+        return slots[self.entities.active[slots]]
+
+    # (slots, distances) from (x, y) to the middle of each slot, the short way around
+    def distances_to(self, slots, x, y):
+        delta = wrapped_delta(self.entities.position[slots], np.array([x, y]), self.width, self.height)
+        return np.hypot(delta[:, 0], delta[:, 1])
+
+    # (slots, distances) of everything whose middle is within radius of (x, y), closest first
+    def within_radius(self, x, y, radius):
+        if self.count <= SMALL_INDEX:
+            slots = self.all_slots()
+        else:
+            slots = self.slots_in(self.block_cells(self.cell_of(x, y), int(np.ceil(radius / self.cell_size))))
+        distances = self.distances_to(slots, x, y)
+        near = distances <= radius
+        slots, distances = slots[near], distances[near]
+        order = np.argsort(distances, kind='stable')
+        return slots[order], distances[order]
+
+    # (slots, distances) of the k things whose middles are closest to (x, y), closest first.
+    # Fewer than k if there aren't that many
+    def nearest(self, x, y, k=1):
+        if self.count <= SMALL_INDEX:
+            slots = self.all_slots()
+            distances = self.distances_to(slots, x, y)
+            order = np.argsort(distances, kind='stable')[:k]
+            return slots[order], distances[order]
+
+        cell = self.cell_of(x, y)
+        seen = set()
+        found = []
+        for ring in range(self.last_ring() + 1):
+            cells = self.ring_cells(cell, ring) - seen
+            seen |= cells
+            found.append(self.slots_in(cells))
+            slots = np.concatenate(found)
+            if len(slots) >= k:
+                distances = self.distances_to(slots, x, y)
+                kth = np.partition(distances, k - 1)[k - 1]
+                # Everything within `ring` cells of the point has been looked at
+                if kth <= ring * self.cell_size:
+                    break
+        slots = np.concatenate(found)
+        distances = self.distances_to(slots, x, y)
+        order = np.argsort(distances, kind='stable')[:k]
+        return slots[order], distances[order]
+
+    # The first entity a line from (x, y) going along direction (a vec2 of length 1) runs into,
+    # within max_distance. Returns (slot, distance to where it hits its edge), or None if it hits nothing
+    def raycast(self, x, y, direction, max_distance):
+        max_distance = min(max_distance, min(self.width, self.height) / 2)
+        step = self.cell_size
+        # Anything the line touches has its middle within this of one of the points we stop at
+        rings = int(np.ceil((step / 2 + self.max_radius) / self.cell_size))
+        origin = np.array([x, y])
+        along_ray = np.array([direction.x, direction.y])
+        seen = set()
+        best_slot, best_distance = None, np.inf
+        small = self.count <= SMALL_INDEX
+        for i in range(1 if small else int(np.ceil(max_distance / step)) + 1):
+            distance = i * step
+            # Nothing further along can be hit before the best hit so far
+            if distance > best_distance + self.max_radius + step:
+                break
+            if small:
+                slots = self.all_slots()
+            else:
+                cells = self.block_cells(self.cell_of(x + direction.x * distance, y + direction.y * distance), rings)
+                cells -= seen
+                seen |= cells
+                slots = self.slots_in(cells)
+            if len(slots) == 0:
+                continue
+
+            # Where the line comes closest to each middle, and how far from the middle that is
+            delta = wrapped_delta(self.entities.position[slots], origin, self.width, self.height)
+            along = delta @ along_ray
+            closest_squared = np.einsum('ij,ij->i', delta, delta) - along * along
+            radius = self.entities.radius[slots]
+            half_chord = np.sqrt(np.maximum(radius * radius - closest_squared, 0.0))
+            entry = np.maximum(along - half_chord, 0.0) # 0 if (x, y) is already inside it
+            hit = (closest_squared <= radius * radius) & (along + half_chord >= 0.0) & (entry <= max_distance)
+            if hit.any():
+                first = np.flatnonzero(hit)[np.argmin(entry[hit])]
+                if entry[first] < best_distance:
+                    best_slot, best_distance = int(slots[first]), float(entry[first])
+        if best_slot is None:
+            return None
+        return best_slot, best_distance
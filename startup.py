@@ -0,0 +1,63 @@
+import os
+import time
+
+#
+#  How long the game takes to start ---------------------------------------------------------
+#
+#  From typing `python Asteroids.py` to seeing the first frame, time goes into:
+#     - Python itself starting up, before any of our code runs
+#     - importing our files (and NumPy, which is most of it)
+#     - making the World
+#     - opening the window
+#     - drawing the first frame
+#
+#  A StartupTimer is made as the very first thing in Asteroids.py, and each of those steps
+#  calls mark('name') when it's done, like the FrameProfiler does for the parts of a frame.
+#
+#  Python can't ask when the process started on every computer. On Linux it's in /proc,
+#  everywhere else we start counting when this file is imported, and the Python part is left out.
+#
+
+# Seconds since this process was started, or None if we can't tell
+def process_age():
+    try:
+        with open('/proc/self/stat') as file:
+            stat = file.read()
+        with open('/proc/uptime') as file:
+            uptime = float(file.read().split()[0])
+        ticks_per_second = os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, AttributeError):
+        return None
+    # The process name is in brackets and can have spaces in it, so count fields after the last ')'.
+    # Field 22 of the file (the 20th after the name) is when the process started, in clock ticks after boot
+    started = int(stat[stat.rindex(')') + 2:].split()[19]) / ticks_per_second
+    return max(0.0, uptime - started)
+
+class StartupTimer:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.start = clock()
+        age = process_age()
+        # Time before this timer was made. /proc only counts in clock ticks (usually 1/100 of a second)
+        self.before_start = age if age is not None else 0.0
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, self.clock()))
+
+    # [(name, seconds spent on it), ...] in order, starting with the time before the timer was made
+    def phases(self):
+        phases = [('process start', self.before_start)]
+        previous = self.start
+        for name, when in self.marks:
+            phases.append((name, when - previous))
+            previous = when
+        return phases
+
+    def total(self):
+        return sum(seconds for name, seconds in self.phases())
+
+    def report(self):
+        print('startup took', '%.1f' % (self.total() * 1000), 'ms')
+        for name, seconds in self.phases():
+            print('   ', name.ljust(16), ('%.1f' % (seconds * 1000)).rjust(8), 'ms')
@@ -0,0 +1,41 @@
+import pytest
+
+import simulation
+from batch import apply_overrides, parse_override, run_episode
+from simulation import World
+
+def test_buffer_size_override_reaches_the_world():
+    previous = apply_overrides({'BULLET_BUFFER_SIZE': 20, 'WORLD_WIDTH': 2400})
+    try:
+        world = World(seed=1)
+        assert len(world.bullet_buffer) == 20
+        assert world.width == 2400
+    finally:
+        apply_overrides(previous)
+    assert len(World(seed=1).bullet_buffer) == simulation.BULLET_BUFFER_SIZE
+
+# Points don't change how a game plays out, so the same episode scores exactly twice as much
+def test_points_override_changes_the_score():
+    normal = run_episode(3, 0, 'spin', 3000, 1 / 60, {})
+    doubled = run_episode(3, 0, 'spin', 3000, 1 / 60, {'ASTEROID_INFO.points': [None, 100, 50, 20]})
+    assert normal['score'] > 0
+    assert doubled['score'] == 2 * normal['score']
+    assert doubled['ticks'] == normal['ticks']
+    assert simulation.ASTEROID_INFO['points'] == [None, 50, 25, 10]
+
+@pytest.mark.parametrize('text', ['WINDOW_WIDTH=600', 'ASTEROID_INFO.turtle_sizes=[None, 1, 2, 3]',
+                                  'UP_KEY=0', 'NOT_A_CONSTANT=1'])
+def test_overrides_that_would_do_nothing_are_turned_down(text):
+    with pytest.raises(ValueError):
+        parse_override(text)
+    with pytest.raises(ValueError):
+        apply_overrides(dict([(text.split('=')[0], 1)]))
+
+@pytest.mark.parametrize('text', ['BULLET_SPEED', 'BULLET_SPEED=fast', 'ASTEROID_INFO.speeds=[None, 40', 'BULLET_SPEED='])
+def test_overrides_that_cant_be_read_raise_a_value_error(text):
+    with pytest.raises(ValueError):
+        parse_override(text)
+
+def test_overrides_are_read_as_python_values():
+    assert parse_override(' BULLET_SPEED = 350 ') == ('BULLET_SPEED', 350)
+    assert parse_override('ASTEROID_INFO.speeds=[None, 40, 60, 80]') == ('ASTEROID_INFO.speeds', [None, 40, 60, 80])
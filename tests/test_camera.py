@@ -0,0 +1,38 @@
+import numpy as np
+
+from camera import Camera
+from simulation import World
+
+# A 3000 by 2000 world (it goes from -1500 to 1500 along x) seen through a 1200 by 800 window
+def camera_at(x, y):
+    world = World(seed=0, width=3000, height=2000)
+    camera = Camera(1200, 800, margin=20)
+    world.main_player.position.x = x
+    world.main_player.position.y = y
+    camera.begin_frame(world)
+    return world, camera
+
+def test_things_just_across_the_edge_of_the_world_are_visible():
+    world, camera = camera_at(1400.0, 900.0)
+    positions = np.array([[-1450.0, 900.0],   # 150 to the right, around the edge along x
+                          [1400.0, -950.0],   # 150 below, around the edge along y
+                          [-1450.0, -950.0],  # both
+                          [0.0, 900.0],       # 1400 to the left, too far
+                          [-1100.0, 900.0]])  # 500 to the right around the edge, not quite far enough
+    radii = np.array([10.0, 10.0, 10.0, 10.0, 10.0])
+    offsets, visible = camera.cull(world, positions, radii, np.ones(5, dtype=bool))
+    assert np.allclose(offsets, [[150.0, 0.0], [0.0, 150.0], [150.0, 150.0], [-1400.0, 0.0], [500.0, 0.0]])
+    assert visible.tolist() == [True, True, True, False, True]
+    assert (camera.last_checked, camera.last_visible) == (5, 4)
+
+def test_the_margin_and_radius_count_on_both_sides_of_the_edge():
+    world, camera = camera_at(1400.0, 0.0)
+    reach = 600 + 20 + 10
+    positions = np.array([[1400.0 + reach - 3000.0, 0.0], [1400.0 + reach + 1 - 3000.0, 0.0],
+                          [1400.0 - reach, 0.0], [1400.0 - reach - 1, 0.0]])
+    offsets, visible = camera.cull(world, positions, np.full(4, 10.0), np.ones(4, dtype=bool))
+    assert visible.tolist() == [True, False, True, False]
+
+    # Inactive slots are never visible
+    offsets, visible = camera.cull(world, positions, np.full(4, 10.0), np.zeros(4, dtype=bool))
+    assert not visible.any()
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from simulation import World, step_world, spawn_asteroid, vec2
+
+#
+#  Collisions are swept along the whole step (see handle_bullet_asteroid_collisions), so a few
+#  big steps have to break the same asteroids as lots of small ones.
+#
+
+FINE_STEP = 1 / 60
+
+# Fires shots straight away from a random direction, then lets the world run for seconds
+def play(seed, delta_time, shots, seconds, invincible):
+    world = World(seed=seed)
+    world.main_player.rotation = random.Random(seed).uniform(0.0, 360.0)
+    if invincible:
+        world.main_player.invincibility_frames = 1e9
+    world.pending_shots = shots
+    for tick in range(round(seconds / delta_time)):
+        if world.is_game_over():
+            break
+        step_world(world, delta_time)
+    return world
+
+def outcome(world):
+    return (world.ScoreInfo.current_score, world.main_player.health, world.rounds_cleared,
+            world.total_active_asteroids)
+
+@pytest.mark.parametrize('shots', [2, 3, 6])
+@pytest.mark.parametrize('coarse_step', [0.25, 0.5])
+def test_coarse_steps_break_the_same_asteroids(shots, coarse_step):
+    for seed in range(15):
+        coarse = play(seed, coarse_step, shots, 20, invincible=True)
+        fine = play(seed, FINE_STEP, shots, 20, invincible=True)
+        assert outcome(coarse) == outcome(fine), 'seed ' + str(seed)
+
+def test_coarse_steps_hit_the_player_the_same():
+    compared = 0
+    for seed in range(60):
+        coarse = play(seed, 0.25, 1, 30, invincible=False)
+        fine = play(seed, FINE_STEP, 1, 30, invincible=False)
+        # The game only ends between steps, so a big step carries on past the moment the player died
+        if coarse.is_game_over() or fine.is_game_over():
+            assert coarse.is_game_over() and fine.is_game_over(), 'seed ' + str(seed)
+            continue
+        assert outcome(coarse) == outcome(fine), 'seed ' + str(seed)
+        compared += 1
+    assert compared > 30
+
+# A bullet fast enough to go right past an asteroid in one step still hits it
+def test_fast_bullet_does_not_tunnel():
+    world = World(seed=0)
+    world.asteroid_pool.release_all()
+    world.asteroid_index.rebuild()
+    spawn_asteroid(world, 1, vec2(100.0, 0.0), vec2(0.0, 0.0))
+    spawn_asteroid(world, 3, vec2(-400.0, 300.0), vec2(0.0, 0.0))
+    world.pending_shots = 1
+    step_world(world, 1.0) # the bullet goes 300 pixels, the asteroid is 30 across
+    assert world.ScoreInfo.current_score == 50
@@ -0,0 +1,60 @@
+from governor import (FrameGovernor, DrawSettings, FULL_QUALITY, SKIP_HUD, HALF_RENDER_RATE,
+                      NO_SMALL_ASTEROIDS, HUD_EVERY)
+from scheduler import FrameScheduler
+
+STEP_TIME = 1 / 60
+
+def make_governor():
+    scheduler = FrameScheduler(step_time=STEP_TIME, render_time=STEP_TIME, clock=lambda: 0.0)
+    return FrameGovernor(scheduler, DrawSettings(), clock=lambda: 0.0), scheduler
+
+# A made up frame: every step the frame has to take costs step_cost, and drawing costs draw_cost,
+# both as parts of one step's time. At half render rate a frame takes two steps
+def run_frames(governor, scheduler, frames, step_cost, draw_cost):
+    levels = []
+    for frame in range(frames):
+        steps = round(scheduler.render_time / STEP_TIME)
+        levels.append(governor.frame_done((steps * step_cost + draw_cost) * STEP_TIME))
+    return levels
+
+def test_slow_frames_turn_quality_down_a_level_at_a_time():
+    governor, scheduler = make_governor()
+    levels = run_frames(governor, scheduler, 2000, 0.5, 2.0)
+    assert governor.level == NO_SMALL_ASTEROIDS
+    # Never skipping a level, and waiting settle_frames in between
+    changes = [i for i in range(1, len(levels)) if levels[i] != levels[i - 1]]
+    assert all(levels[i] == levels[i - 1] + 1 for i in changes)
+    assert all(b - a >= governor.settle_frames for a, b in zip(changes, changes[1:]))
+    assert governor.settings.hud_every == HUD_EVERY
+    assert scheduler.render_time == 2 * STEP_TIME
+
+# Drawing takes most of a frame. At half render rate the frame fits in its (twice as long) budget
+# with time to spare, but going back to every step would be too slow again
+def test_half_render_rate_doesnt_flip_back_and_forth():
+    governor, scheduler = make_governor()
+    levels = run_frames(governor, scheduler, 5000, 0.06, 0.85)
+    assert governor.level == HALF_RENDER_RATE
+    assert len(governor.decisions) == 2
+    assert levels[-3000:] == [HALF_RENDER_RATE] * 3000
+
+def test_quality_comes_back_when_frames_get_quick():
+    governor, scheduler = make_governor()
+    run_frames(governor, scheduler, 1000, 0.06, 0.85)
+    assert governor.level == HALF_RENDER_RATE
+    run_frames(governor, scheduler, 1000, 0.05, 0.1)
+    assert governor.level == FULL_QUALITY
+    assert scheduler.render_time == STEP_TIME
+    assert governor.settings.hud_every == 1
+    assert [(decision.from_level, decision.to_level) for decision in governor.decisions] == [
+        (FULL_QUALITY, SKIP_HUD), (SKIP_HUD, HALF_RENDER_RATE),
+        (HALF_RENDER_RATE, SKIP_HUD), (SKIP_HUD, FULL_QUALITY)]
+
+def test_one_quick_frame_doesnt_restore_quality():
+    governor, scheduler = make_governor()
+    run_frames(governor, scheduler, 200, 0.1, 0.9)
+    level = governor.level
+    assert level > FULL_QUALITY
+    for frame in range(300):
+        quick = frame % 50 == 0
+        governor.frame_done((0.05 if quick else 1.0) * STEP_TIME)
+    assert governor.level >= level
@@ -0,0 +1,69 @@
+from inputs import InputQueue
+from simulation import World, step_world, LEFT_KEY, RIGHT_KEY, UP_KEY, SPACE_KEY
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def drain_and_step(queue, world):
+    queue.drain(world)
+    keys = list(world.keys_pressed)
+    step_world(world, 1 / 60)
+    return keys
+
+# Pressed and let go between two steps: the next step still sees it
+def test_a_tap_between_steps_lasts_one_step():
+    world = World(seed=1)
+    queue = InputQueue(clock=FakeClock())
+    queue.push(LEFT_KEY, True)
+    queue.push(LEFT_KEY, False)
+    rotation = world.main_player.rotation
+    assert drain_and_step(queue, world)[LEFT_KEY]
+    assert world.main_player.rotation != rotation
+    assert not drain_and_step(queue, world)[LEFT_KEY]
+    assert not queue.pending
+
+def test_keys_held_across_steps_let_go_straight_away():
+    world = World(seed=1)
+    queue = InputQueue(clock=FakeClock())
+    queue.push(UP_KEY, True)
+    assert drain_and_step(queue, world)[UP_KEY]
+    assert drain_and_step(queue, world)[UP_KEY]
+    queue.push(UP_KEY, False)
+    assert not drain_and_step(queue, world)[UP_KEY]
+
+# Events for a key stay in order behind a let go that is waiting, other keys carry on
+def test_events_stay_in_order():
+    world = World(seed=1)
+    queue = InputQueue(clock=FakeClock())
+    for key, pressed in [(RIGHT_KEY, True), (RIGHT_KEY, False), (UP_KEY, True), (RIGHT_KEY, True),
+                         (SPACE_KEY, True), (SPACE_KEY, True)]:
+        queue.push(key, pressed)
+    assert queue.drain(world) == 4
+    assert world.keys_pressed[RIGHT_KEY] and world.keys_pressed[UP_KEY]
+    assert world.pending_shots == 2
+    assert [(event.key, event.pressed) for event in queue.pending] == [(RIGHT_KEY, False), (RIGHT_KEY, True)]
+
+    # Draining again before a step changes nothing
+    assert queue.drain(world) == 0
+    step_world(world, 1 / 60)
+    assert queue.drain(world) == 2
+    assert world.keys_pressed[RIGHT_KEY]
+    assert [event.applied_tick for event in queue.applied] == [0, 0, 0, 0, 1, 1]
+
+def test_latencies_are_measured_from_the_key_press():
+    world = World(seed=1)
+    clock = FakeClock()
+    queue = InputQueue(clock=clock)
+    queue.push(LEFT_KEY, True)
+    clock.now = 0.010
+    queue.drain(world)
+    clock.now = 0.025
+    queue.frame_shown()
+    summary = queue.summary()
+    assert summary['events'] == 1
+    assert abs(summary['to_step']['p50'] - 10.0) < 1e-9
+    assert abs(summary['to_screen']['worst'] - 25.0) < 1e-9
@@ -0,0 +1,37 @@
+import numpy as np
+
+from particles import ParticleSystem, EXPLOSION_PARTICLES
+
+def test_particles_never_go_over_the_budget():
+    particles = ParticleSystem(capacity=32, seed=1)
+    for i in range(20):
+        particles.explode(0.0, 0.0, 3)
+        assert particles.live_count <= 32
+    assert particles.live_count == 32
+    assert particles.emitted == 20 * EXPLOSION_PARTICLES[3]
+    assert particles.recycled == particles.emitted - 32
+
+    # More than the whole budget at once only makes the budget's worth
+    particles = ParticleSystem(capacity=8, seed=1)
+    particles.explode(0.0, 0.0, 3)
+    assert particles.emitted == 8 and particles.live_count == 8
+
+def test_new_particles_go_over_the_oldest():
+    particles = ParticleSystem(capacity=8, seed=1)
+    particles.emit(6, 1.0, 0.0, (0.0, 0.0), np.zeros(6), (1.0, 1.0), (1.0, 1.0), 1)
+    particles.update(0.1, 1000, 1000)
+    particles.emit(4, 2.0, 0.0, (0.0, 0.0), np.zeros(4), (1.0, 1.0), (1.0, 1.0), 2)
+    # Slots 6 and 7 were free, then it goes around to 0 and 1, the first two made
+    assert particles.next_slot == 2
+    assert particles.kind.tolist() == [2, 2, 1, 1, 1, 1, 2, 2]
+    assert particles.age.tolist()[:2] == [0.0, 0.0]
+    assert np.allclose(particles.age[2:6], 0.1)
+    assert particles.recycled == 2
+
+def test_old_particles_die():
+    particles = ParticleSystem(capacity=8, seed=1)
+    particles.emit(4, 0.0, 0.0, (0.0, 0.0), np.zeros(4), (1.0, 1.0), (0.5, 0.5), 1)
+    particles.update(0.25, 1000, 1000)
+    assert particles.live_count == 4
+    particles.update(0.3, 1000, 1000)
+    assert particles.live_count == 0
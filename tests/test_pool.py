@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from pool import EntityPool, PoolExhaustedError
+from simulation import EntityArrays, World, spawn_asteroid, vec2
+
+def test_a_full_pool_grows_by_its_factor():
+    buffer = EntityArrays(50)
+    pool = EntityPool(buffer, growth_factor=2)
+    slots = [pool.allocate() for i in range(6400)]
+    assert slots == list(range(6400))
+    assert pool.capacity() == 6400
+    assert pool.grows == 7
+    assert len(buffer.active) == 6400 and buffer.active.all()
+
+    pool = EntityPool(EntityArrays(1), growth_factor=1.5)
+    for i in range(10):
+        pool.allocate()
+    assert pool.capacity() >= 10 and pool.grows < 10
+
+def test_a_pool_that_cant_grow_runs_out():
+    pool = EntityPool(EntityArrays(3))
+    for i in range(3):
+        pool.allocate()
+    with pytest.raises(PoolExhaustedError):
+        pool.allocate()
+
+def test_asteroids_keep_their_slots_when_the_buffer_grows():
+    world = World(asteroid_capacity=4, seed=1)
+    world.asteroid_pool.release_all()
+    for i in range(100):
+        spawn_asteroid(world, 3, vec2(float(i), 0.0), vec2(1.0, 0.0))
+    assert world.asteroid_pool.grows == 5 # 4 -> 8 -> 16 -> 32 -> 64 -> 128
+    active = np.flatnonzero(world.asteroid_buffer.active)
+    assert active.tolist() == list(range(100))
+    assert (world.asteroid_buffer.position[active, 0] == np.arange(100)).all()
@@ -0,0 +1,44 @@
+import numpy as np
+
+from profiler import FrameProfiler, HISTOGRAM_BUCKETS_MS
+
+# Saves frames with made up times (in milliseconds) instead of timing anything
+def profiler_with(frames, capacity=3600):
+    profiler = FrameProfiler(phases=['update', 'draw'], capacity=capacity)
+    for update, draw in frames:
+        profiler.current = [update / 1000.0, draw / 1000.0]
+        profiler.end_frame()
+    return profiler
+
+def test_the_ring_buffer_keeps_the_newest_frames_oldest_first():
+    profiler = profiler_with([(float(i), 0.0) for i in range(10)], capacity=4)
+    assert profiler.frame_count == 10
+    assert np.allclose(profiler.recorded_frames()[:, 0], [6.0, 7.0, 8.0, 9.0])
+    summary = profiler.summary()
+    assert summary['update']['worst'] == 9.0
+    assert summary['update']['worst_frame'] == 9
+
+    # Not full yet
+    profiler = profiler_with([(1.0, 0.0), (2.0, 0.0)], capacity=4)
+    assert np.allclose(profiler.recorded_frames()[:, 0], [1.0, 2.0])
+
+def test_percentiles():
+    profiler = profiler_with([(float(i), 1.0) for i in range(1, 101)])
+    summary = profiler.summary()
+    assert np.isclose(summary['update']['p50'], 50.5)
+    assert np.isclose(summary['update']['p95'], 95.05)
+    assert np.isclose(summary['update']['p99'], 99.01)
+    assert np.isclose(summary['frame']['p50'], 51.5)
+    assert summary['draw']['worst'] == 1.0
+
+    assert FrameProfiler(phases=['update']).summary()['update'] is None
+
+def test_every_frame_lands_in_a_histogram_bucket():
+    profiler = profiler_with([(0.05, 0.0), (5.0, 0.0), (999.0, 0.0), (1000.0, 0.0), (4000.0, 0.0)])
+    counts = profiler.histograms()['update']
+    assert len(counts) == len(HISTOGRAM_BUCKETS_MS)
+    assert sum(counts) == 5
+    assert counts[0] == 1
+    assert counts[HISTOGRAM_BUCKETS_MS.index(4.0)] == 1
+    assert counts[-2] == 1
+    assert counts[-1] == 2 # a second or more
@@ -0,0 +1,66 @@
+import numpy as np
+
+from particles import ParticleSystem
+from pilots import PILOTS
+from raster import Rasterizer
+from simulation import World, step_world, player_sprite_info, is_flickered_out, SPACESHIP_FLICKER_INFO
+from vector_env import VectorEnv
+
+def played_world(seed, ticks=200):
+    world = World(seed=seed)
+    world.particles = ParticleSystem(256, seed)
+    pilot = PILOTS['random'](seed)
+    for tick in range(ticks):
+        pilot.control(world)
+        step_world(world, 1 / 60)
+    return world
+
+# Draws one world a kind of thing at a time, with one stamp for each
+def draw_by_kind(rasterizer, world):
+    frames = rasterizer.new_frames(1)
+    asteroids = world.asteroid_buffer
+    slots = np.flatnonzero(asteroids.active)
+    rasterizer.draw_asteroids(frames, np.zeros(len(slots), dtype=np.int64), asteroids.position[slots],
+                              asteroids.health[slots])
+    slots = np.flatnonzero(world.bullet_buffer.active)
+    rasterizer.draw_bullets(frames, np.zeros(len(slots), dtype=np.int64), world.bullet_buffer.position[slots])
+    slots = np.flatnonzero(world.particles.active)
+    rasterizer.draw_stamps(frames, np.zeros(len(slots), dtype=np.int64), world.particles.position[slots],
+                           np.zeros((1, 2), dtype=np.int64)) # a particle is one pixel
+    player = world.main_player
+    sprite_name = player_sprite_info(world)['name']
+    if player.health > 0 and sprite_name in rasterizer.ship_outlines: # a flickering ship isn't drawn
+        rasterizer.draw_ships(frames, np.zeros(1, dtype=np.int64), np.array([[player.position.x, player.position.y]]),
+                              np.array([player.rotation]), sprite_name)
+    return frames[0]
+
+def test_worlds_are_drawn_the_same_as_one_kind_at_a_time():
+    worlds = [played_world(seed) for seed in range(3)]
+    for size, filled in (((600, 400), False), ((84, 84), True)):
+        rasterizer = Rasterizer(*size, filled=filled)
+        frames = rasterizer.render_worlds(worlds)
+        for world, frame in zip(worlds, frames):
+            expected = draw_by_kind(rasterizer, world)
+            assert expected.any()
+            assert (frame == expected).all()
+            assert (rasterizer.render_world(world) == expected).all()
+
+# The pictures of a VectorEnv and of a World flicker the same way for the same time left
+def test_ships_flicker_the_same_in_worlds_and_envs():
+    times = np.array([0.0, 0.1, 0.3, 0.5, 1.1, 1.3, 2.5, 2.7])
+    env = VectorEnv(len(times), seed=0)
+    env.reset()
+    env.invincibility[:] = times
+    rasterizer = Rasterizer(84, 84, filled=True)
+    frames = rasterizer.render_env(env)
+    asteroids = VectorEnv(len(times), seed=0)
+    asteroids.reset()
+    asteroids.player_health[:] = 0
+    without_ship = rasterizer.render_env(asteroids)
+    world = World(seed=0)
+    for w, time in enumerate(times):
+        world.main_player.invincibility_frames = time
+        hidden = player_sprite_info(world) is SPACESHIP_FLICKER_INFO
+        assert hidden == is_flickered_out(time)
+        assert hidden == (frames[w] == without_ship[w]).all()
+    assert is_flickered_out(times).tolist() == [False, False, True, False, False, True, False, True]
@@ -0,0 +1,57 @@
+from pilots import PILOTS
+from replay import InputRecorder, Recording, record_step, replay, world_checksum
+from simulation import World
+
+def record_game(path, seed, ticks, delta_time=1 / 60):
+    world = World(seed=seed)
+    pilot = PILOTS['random'](seed)
+    recorder = InputRecorder(world, checkpoint_interval=30)
+    while world.tick < ticks and not world.is_game_over():
+        pilot.control(world)
+        record_step(world, delta_time, recorder)
+    recorder.save(path, world)
+    return world
+
+def test_a_replay_matches_every_checkpoint(tmp_path):
+    for seed, delta_time in ((1, 1 / 60), (2, 1 / 20)):
+        path = tmp_path / ('game' + str(seed) + '.rec')
+        world = record_game(path, seed, 900, delta_time)
+        recording = Recording(path)
+        result = replay(recording)
+        assert result['first_mismatch_tick'] is None
+        assert result['checkpoints_checked'] == len(recording.checkpoints) - 1 # every one after tick 0
+        assert result['score'] == world.ScoreInfo.current_score
+
+def test_a_replay_with_different_inputs_is_caught(tmp_path):
+    path = tmp_path / 'game.rec'
+    record_game(path, 3, 900)
+    recording = Recording(path)
+    # Turn the right key around from tick 100 on: the world wanders off from then
+    recording.ticks = recording.ticks.copy()
+    recording.ticks['keys'][100:] ^= 1
+    mismatch = replay(recording)['first_mismatch_tick']
+    assert mismatch is not None and 100 < mismatch <= 130
+
+def test_negative_seeds_and_lots_of_shots_are_recorded(tmp_path):
+    path = tmp_path / 'game.rec'
+    world = World(seed=-1)
+    recorder = InputRecorder(world, checkpoint_interval=30)
+    for tick in range(60):
+        world.pending_shots = 300 if tick == 10 else 0
+        record_step(world, 1 / 60, recorder)
+    recorder.save(path, world)
+
+    recording = Recording(path)
+    assert recording.seed == -1
+    assert recording.ticks['shots'][10] == 300
+    assert replay(recording)['first_mismatch_tick'] is None
+
+def test_the_checksum_sees_the_random_numbers_and_waiting_shots():
+    world = World(seed=4)
+    checksum = world_checksum(world)
+    world.rng.random()
+    assert world_checksum(world) != checksum
+
+    world = World(seed=4)
+    world.pending_shots = 1
+    assert world_checksum(world) != checksum
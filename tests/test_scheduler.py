@@ -0,0 +1,74 @@
+import random
+
+from scheduler import FrameScheduler
+
+# Times here are all whole numbers of 1/256 seconds, which floats hold exactly,
+# so step counts come out exact instead of off by one now and then from rounding
+STEP_TIME = 1 / 64
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+# Starts the scheduler, then runs frames `gaps` seconds apart.
+# Returns the scheduler, every step's delta time, and how many steps there had been after each frame
+def run(gaps, max_steps_per_frame=5, render_time=STEP_TIME, alphas=None):
+    clock = FakeClock()
+    scheduler = FrameScheduler(step_time=STEP_TIME, render_time=render_time,
+                               max_steps_per_frame=max_steps_per_frame, clock=clock)
+    alphas = [] if alphas is None else alphas
+    steps = []
+    counts = []
+    scheduler.tick(steps.append, alphas.append) # the first tick just starts the clock
+    for gap in gaps:
+        clock.now += gap
+        scheduler.tick(steps.append, alphas.append)
+        counts.append(len(steps))
+    return scheduler, steps, counts
+
+def test_the_same_time_gives_the_same_steps_however_the_frames_fall():
+    rng = random.Random(1)
+    uneven = [rng.randint(0, 8) / 256 for i in range(1200)]
+    for gaps in ([STEP_TIME] * 600, uneven):
+        scheduler, steps, counts = run(gaps, max_steps_per_frame=1000)
+        # Every step is the same size, and after every frame there have been exactly as many
+        # steps as fit in the time so far
+        assert set(steps) == {STEP_TIME}
+        elapsed = 0.0
+        for gap, count in zip(gaps, counts):
+            elapsed += gap
+            assert count == int(elapsed / STEP_TIME)
+        assert scheduler.dropped_time == 0.0
+
+def test_step_count_only_depends_on_the_time_passed():
+    gaps = [2 / 256, 9 / 256, 0.0, 13 / 256, 5 / 256, 1.0]
+    first = run(gaps)[0]
+    second = run(list(reversed(gaps)))[0]
+    assert first.steps == second.steps
+    assert first.accumulator == second.accumulator
+
+def test_a_long_stall_only_catches_up_max_steps_per_frame():
+    scheduler, steps, counts = run([STEP_TIME, 2.0, STEP_TIME], max_steps_per_frame=5)
+    # One step, then 5 for the stall (the rest is thrown away), then back to one a frame
+    assert counts == [1, 6, 7]
+    assert scheduler.dropped_time == 2.0 - 5 * STEP_TIME
+    assert scheduler.accumulator == 0.0
+
+def test_alpha_is_how_far_between_steps():
+    alphas = []
+    run([STEP_TIME * 1.25, STEP_TIME * 0.5, STEP_TIME * 0.25], render_time=STEP_TIME / 4, alphas=alphas)
+    assert alphas == [0.0, 0.25, 0.75, 0.0]
+
+def test_draws_on_its_own_schedule():
+    # Drawing every other step's worth of time
+    scheduler, steps, counts = run([STEP_TIME] * 60, render_time=2 * STEP_TIME)
+    assert len(steps) == 60
+    assert scheduler.renders == 31 # the first tick draws too
+
+    # Drawing that fell behind draws once and starts again from now instead of drawing a burst of frames
+    scheduler, steps, counts = run([STEP_TIME, 1.0, STEP_TIME / 4, STEP_TIME / 4], render_time=STEP_TIME / 4)
+    assert scheduler.renders == 5
+    assert scheduler.next_render_time == 100.0 + STEP_TIME + 1.0 + 3 * STEP_TIME / 4
@@ -0,0 +1,93 @@
+import random
+
+import numpy as np
+import pytest
+
+import simulation
+from server import GameServer
+from netcode import (NO_BASELINE, EMPTY_STATE, MAX_WORLD_SIZE, capture_state, check_world_fits, encode_snapshot,
+                     decode_snapshot, states_equal, pack_input, quantize)
+from simulation import step_world, World
+
+# Every active asteroid is in the cell it is really in, and nothing else is in the index
+def assert_index_matches(world):
+    index = world.asteroid_index
+    active = world.asteroid_buffer.active
+    slots = np.flatnonzero(active)
+    expected = index.cells_of(world.asteroid_buffer.position[slots])
+    assert (index.slot_cell[slots] == expected).all()
+    assert (index.slot_cell[:len(active)][~active] == -1).all()
+    assert len(index) == len(slots)
+
+# A server with bots that press random keys, stepped without any sockets
+def play_server(ticks, ship_count=4, seed=1):
+    server = GameServer(tick_rate=30, max_ships=ship_count, seed=seed)
+    inboxes = []
+    sessions = []
+    for i in range(ship_count):
+        inbox = []
+        inboxes.append(inbox)
+        sessions.append(server.join(inbox.append))
+    rng = random.Random(seed)
+    for tick in range(ticks):
+        for session in sessions:
+            keys = [rng.random() < 0.3 for key in range(4)]
+            server.receive(session, pack_input(keys, int(rng.random() < 0.3), NO_BASELINE))
+        server.tick()
+    return server, sessions, inboxes
+
+def test_server_keeps_the_asteroid_index_up_to_date():
+    server, sessions, inboxes = play_server(300)
+    assert_index_matches(server.world)
+    assert server.world.ScoreInfo.current_score > 0
+
+# The server steps its ships with step_world, so one ship plays out like a World with the same seed
+def test_one_ship_steps_like_a_world():
+    server = GameServer(tick_rate=30, max_ships=1, seed=5)
+    session = server.join(lambda message: None)
+    ship = session.ship
+    world = World(bullet_capacity=server.world.bullet_buffer.active.size, seed=5)
+    world.main_player.position.set(ship.player.position.x, ship.player.position.y)
+    rng = random.Random(5)
+    for tick in range(300):
+        keys = [rng.random() < 0.3 for key in range(4)]
+        shots = int(rng.random() < 0.3)
+        server.receive(session, pack_input(keys, shots, NO_BASELINE))
+        server.tick()
+        world.keys_pressed[:] = keys
+        world.pending_shots += shots
+        step_world(world, server.tick_time)
+    assert world.ScoreInfo.current_score == server.world.ScoreInfo.current_score
+    assert world.main_player.health == ship.player.health
+    assert np.array_equal(world.asteroid_buffer.position, server.world.asteroid_buffer.position)
+
+def test_snapshot_deltas_decode_to_the_same_state():
+    server, sessions, inboxes = play_server(60, ship_count=3)
+    world = server.world
+    baseline_tick = world.tick
+    baseline = capture_state(world, server.ships, server.max_ships)
+    for tick in range(20):
+        server.tick()
+    current = capture_state(world, server.ships, server.max_ships)
+
+    # From nothing
+    tick, from_tick, state = decode_snapshot(encode_snapshot(world.tick, current), EMPTY_STATE)
+    assert (tick, from_tick) == (world.tick, NO_BASELINE)
+    assert states_equal(state, current)
+
+    # From an older tick the client already has
+    message = encode_snapshot(world.tick, current, baseline_tick, baseline)
+    tick, from_tick, state = decode_snapshot(message, baseline)
+    assert from_tick == baseline_tick
+    assert states_equal(state, current)
+    assert len(message) < len(encode_snapshot(world.tick, current))
+
+# Positions are sent in 2 byte integers, so a world too big for them is turned down when the server starts
+def test_a_world_too_big_to_send_is_turned_down(monkeypatch):
+    edge = MAX_WORLD_SIZE / 2
+    assert (quantize(np.array([[edge, -edge]])) == [[32767, -32767]]).all()
+    check_world_fits(World(seed=1))
+
+    monkeypatch.setattr(simulation, 'WORLD_WIDTH', 4096)
+    with pytest.raises(ValueError):
+        GameServer(max_ships=2, seed=1)
@@ -0,0 +1,51 @@
+import numpy as np
+
+from shared_frames import frame_dtype_for, make_frame_buffer, write_frame, SnapshotReader
+from simulation import World, spawn_asteroid, most_asteroids, vec2, step_world
+
+# A big world starts with 80 round asteroids, and every one of them can split into 4 small ones
+def test_frame_has_room_for_every_piece_of_a_big_round():
+    world = World(seed=1, width=4800, height=3200)
+    assert world.round_asteroids == 80
+    assert most_asteroids(world) == 320
+    assert frame_dtype_for(world)['asteroids'].shape == (320,)
+
+    # Break every round asteroid all the way down, without the collision code
+    world.asteroid_pool.release_all()
+    world.asteroid_index.rebuild()
+    rng = np.random.default_rng(1)
+    for i in range(320):
+        x, y = rng.uniform(-2000, 2000, 2)
+        spawn_asteroid(world, 1, vec2(x, y), vec2(0.0, 0.0))
+
+    frame_buffer = make_frame_buffer(frame_dtype_for(world))
+    try:
+        write_frame(world, frame_buffer.back_frame(), 0.0)
+        frame_buffer.publish()
+        reader = SnapshotReader(frame_buffer, world.width, world.height, 0)
+        assert reader.update(0.0)
+        drawn = reader.world.asteroid_buffer
+        assert np.count_nonzero(drawn.active) == 320
+        slots = np.flatnonzero(world.asteroid_buffer.active)
+        assert np.array_equal(drawn.position[slots], world.asteroid_buffer.position[slots])
+    finally:
+        reader = None
+        frame_buffer.close()
+
+# What the window draws is the world as it was on the newest published step
+def test_reader_sees_the_newest_step():
+    world = World(seed=2)
+    frame_buffer = make_frame_buffer(frame_dtype_for(world))
+    try:
+        reader = SnapshotReader(frame_buffer, world.width, world.height, 0)
+        for tick in range(3):
+            step_world(world, 1 / 60)
+            write_frame(world, frame_buffer.back_frame(), float(tick))
+            frame_buffer.publish()
+        assert reader.update(10.0)
+        assert reader.world.tick == world.tick
+        assert reader.world.main_player.position.x == world.main_player.position.x
+        assert reader.world.ScoreInfo.current_score == world.ScoreInfo.current_score
+    finally:
+        reader = None
+        frame_buffer.close()
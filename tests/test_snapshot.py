@@ -0,0 +1,30 @@
+import copy
+
+from pilots import PILOTS
+from replay import world_checksum
+from simulation import World, step_world
+from snapshot import save_snapshot, load_snapshot
+
+def test_a_loaded_snapshot_carries_on_exactly_like_the_world_it_was_saved_from(tmp_path):
+    for seed, size in ((1, (1200, 800)), (2, (2400, 1600))):
+        world = World(seed=seed, width=size[0], height=size[1])
+        pilot = PILOTS['auto'](seed)
+        for tick in range(600):
+            pilot.control(world)
+            step_world(world, 1 / 60)
+
+        path = tmp_path / ('world' + str(seed) + '.snap')
+        save_snapshot(world, path)
+        loaded = load_snapshot(path)
+        assert world_checksum(loaded) == world_checksum(world)
+
+        # Both get the same keys from here on, and have to stay the same
+        loaded_pilot = copy.deepcopy(pilot)
+        for tick in range(600):
+            pilot.control(world)
+            loaded_pilot.control(loaded)
+            step_world(world, 1 / 60)
+            step_world(loaded, 1 / 60)
+            assert world_checksum(loaded) == world_checksum(world), 'different after ' + str(tick + 1) + ' steps'
+        assert loaded.ScoreInfo.current_score == world.ScoreInfo.current_score
+        assert loaded.rng.random() == world.rng.random()
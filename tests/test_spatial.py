@@ -0,0 +1,93 @@
+import random
+
+import numpy as np
+
+from pilots import PILOTS
+from simulation import World, spawn_asteroid, break_asteroid, step_world, vec2
+from spatial import wrapped_delta
+
+# A world with `count` asteroids spread all over it that have moved about, and some broken
+def scattered_world(count, seed):
+    rng = random.Random(seed)
+    world = World(seed=seed, width=4800, height=3200)
+    world.asteroid_pool.release_all()
+    world.asteroid_index.rebuild()
+    for i in range(count):
+        spawn_asteroid(world, rng.randint(1, 3), vec2(rng.uniform(-2400, 2400), rng.uniform(-1600, 1600)),
+                       vec2(rng.uniform(-300, 300), rng.uniform(-300, 300)))
+    buffer = world.asteroid_buffer
+    for step in range(5):
+        buffer.position += buffer.velocity * 0.5
+        buffer.position[:, 0] = (buffer.position[:, 0] + 2400) % 4800 - 2400
+        buffer.position[:, 1] = (buffer.position[:, 1] + 1600) % 3200 - 1600
+        world.asteroid_index.moved()
+        for slot in rng.sample(np.flatnonzero(buffer.active).tolist(), count // 20):
+            break_asteroid(world, slot, 0.0)
+    return world, rng
+
+# Every asteroid's distance from (x, y), the short way around, inf for empty slots
+def brute_distances(world, x, y):
+    buffer = world.asteroid_buffer
+    delta = wrapped_delta(buffer.position, np.array([x, y]), world.width, world.height)
+    distances = np.hypot(delta[:, 0], delta[:, 1])
+    distances[~buffer.active] = np.inf
+    return distances
+
+def brute_raycast(world, x, y, direction, max_distance):
+    max_distance = min(max_distance, min(world.width, world.height) / 2)
+    buffer = world.asteroid_buffer
+    delta = wrapped_delta(buffer.position, np.array([x, y]), world.width, world.height)
+    along = delta @ np.array([direction.x, direction.y])
+    closest_squared = np.einsum('ij,ij->i', delta, delta) - along * along
+    radius = buffer.radius
+    half_chord = np.sqrt(np.maximum(radius * radius - closest_squared, 0.0))
+    entry = np.maximum(along - half_chord, 0.0)
+    hit = buffer.active & (closest_squared <= radius * radius) & (along + half_chord >= 0.0) & (entry <= max_distance)
+    if not hit.any():
+        return None
+    return float(entry[hit].min())
+
+def test_asteroid_index_answers_like_looking_at_every_asteroid():
+    # 20 asteroids is few enough that the index looks at all of them, 2000 isn't
+    for count in (20, 2000):
+        for seed in range(3):
+            world, rng = scattered_world(count, seed)
+            index = world.asteroid_index
+            assert len(index) == world.asteroid_buffer.active.sum()
+            hits = 0
+            for query in range(50):
+                x, y = rng.uniform(-2400, 2400), rng.uniform(-1600, 1600)
+                distances = brute_distances(world, x, y)
+
+                for k in (1, 5):
+                    slots, found = index.nearest(x, y, k)
+                    assert np.allclose(found, np.sort(distances)[:k])
+                    assert np.allclose(distances[slots], found)
+
+                radius = rng.uniform(50, 800)
+                slots, found = index.within_radius(x, y, radius)
+                assert set(slots.tolist()) == set(np.flatnonzero(distances <= radius).tolist())
+                assert (np.diff(found) >= 0).all()
+
+                angle = rng.uniform(0, 2 * np.pi)
+                direction = vec2(float(np.cos(angle)), float(np.sin(angle)))
+                max_distance = rng.uniform(100, 2000)
+                expected = brute_raycast(world, x, y, direction, max_distance)
+                hit = index.raycast(x, y, direction, max_distance)
+                if expected is None:
+                    assert hit is None
+                else:
+                    hits += 1
+                    assert hit is not None and np.isclose(hit[1], expected)
+            assert hits > 0
+
+# The autopilot only knows where asteroids are from the index, so it only does well if the index is right
+def test_autopilot_survives_and_scores():
+    for seed in range(4):
+        world = World(seed=seed)
+        pilot = PILOTS['auto'](seed)
+        while world.tick < 3600 and not world.is_game_over():
+            pilot.control(world)
+            step_world(world, 1 / 60)
+        assert not world.is_game_over()
+        assert world.ScoreInfo.current_score >= 1000
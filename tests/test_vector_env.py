@@ -0,0 +1,74 @@
+import numpy as np
+
+from vector_env import VectorEnv, SHOOT_ACTION
+
+# One world with a single small asteroid straight ahead of the player, 100 pixels away
+def one_asteroid_ahead(delta_time):
+    env = VectorEnv(1, seed=0, delta_time=delta_time)
+    env.reset()
+    env.asteroid_active[0] = False
+    env.asteroid_active[0, 0] = True
+    env.asteroid_stage[0, 0] = 1
+    env.asteroid_position[0, 0] = (100.0, 0.0)
+    env.asteroid_velocity[0, 0] = (0.0, 0.0)
+    return env
+
+# In one big step the bullet goes from 0 to 300, right past the asteroid, but the sweep still finds it
+def test_fast_bullet_does_not_tunnel():
+    env = one_asteroid_ahead(1.0)
+    actions = np.zeros((1, 3), dtype=np.int8)
+    actions[0, SHOOT_ACTION] = 1
+    observations, rewards, dones = env.step(actions)
+    assert rewards[0] == 50
+    assert not env.bullet_active[0].any()
+
+def test_asteroid_sweeping_through_the_player_hits_it():
+    env = one_asteroid_ahead(1.0)
+    env.asteroid_velocity[0, 0] = (-200.0, 0.0) # ends the step at -100, on the other side
+    env.step(np.zeros((1, 3), dtype=np.int8))
+    assert env.player_health[0] == env.starting_health - 1
+    assert 5.0 < env.invincibility[0] + 1.0 < 6.0 # hit part way through the step
+
+# A big asteroid going diagonally at full speed in both directions (about 99 pixels a second, not 70)
+# comes straight at a bullet, and only reaches it near the end of a long step. It starts further away
+# than a bullet and an asteroid going 70 could close in one step, so it mustn't be left out before the sweep
+def test_fast_diagonal_asteroid_is_swept():
+    env = one_asteroid_ahead(0.5)
+    env.asteroid_stage[0, 0] = 3
+    env.player_rotation[0] = 45.0
+    env.asteroid_position[0, 0] = np.array([1.0, 1.0]) / np.sqrt(2) * 240
+    env.asteroid_velocity[0, 0] = (-70.0, -70.0)
+    touching = env.bullet_radius + env.asteroid_radii[3]
+    assert 240 > touching + (env.bullet_speed + 70) * 0.5
+
+    actions = np.zeros((1, 3), dtype=np.int8)
+    actions[0, SHOOT_ACTION] = 1
+    observations, rewards, dones = env.step(actions)
+    assert rewards[0] == 10
+    assert not env.bullet_active[0].any()
+    assert env.asteroid_stage[0, 0] == 2
+
+# The same asteroid coming at the player
+def test_fast_diagonal_asteroid_hits_the_player():
+    env = one_asteroid_ahead(1.0)
+    env.invincibility[:] = 0.0
+    env.asteroid_stage[0, 0] = 3
+    env.asteroid_position[0, 0] = np.array([1.0, 1.0]) / np.sqrt(2) * 140
+    env.asteroid_velocity[0, 0] = (-70.0, -70.0)
+    touching = env.player_radius + env.asteroid_radii[3]
+    assert 140 > touching + 70
+    env.step(np.zeros((1, 3), dtype=np.int8))
+    assert env.player_health[0] == env.starting_health - 1
+
+def test_steps_many_worlds():
+    env = VectorEnv(64, seed=1)
+    env.reset()
+    rng = np.random.default_rng(1)
+    total = 0.0
+    for step in range(600):
+        actions = np.stack([rng.integers(-1, 2, 64), rng.random(64) < 0.3, rng.random(64) < 0.2], axis=1)
+        observations, rewards, dones = env.step(actions)
+        total += rewards.sum()
+        assert observations.shape == (64, env.observation_size)
+    assert total > 0
+    assert (env.asteroid_active.sum(axis=1) > 0).all()
@@ -0,0 +1,70 @@
+import numpy as np
+
+from canvas_view import CanvasLayer, particle_coordinates
+from inputs import InputQueue
+from simulation import RIGHT_KEY, UP_KEY, SPACE_KEY
+from view_layers import bind_keys
+
+# Just enough of a Tk canvas to see what a CanvasLayer asks it to do
+class FakeCanvas:
+    def __init__(self):
+        self.made = 0
+        self.calls = []
+
+    def create_rectangle(self, *coordinates, **options):
+        self.made += 1
+        return self.made
+
+    def coords(self, item, *coordinates):
+        self.calls.append(('coords', item))
+
+    def itemconfigure(self, item, state):
+        self.calls.append((state, item))
+
+def make_item(canvas):
+    return canvas.create_rectangle(0, 0, 0, 0)
+
+def test_canvas_layer_only_touches_what_changed():
+    canvas = FakeCanvas()
+    layer = CanvasLayer(canvas, make_item, particle_coordinates)
+    positions = np.array([[0.0, 0.0], [10.0, 10.0], [20.0, 20.0]])
+    active = np.array([True, False, True])
+    stages = np.zeros(3, dtype=np.int64)
+
+    assert layer.sync(positions, active, stages) == 2
+    assert canvas.made == 2 # the hidden slot never gets an item
+
+    canvas.calls.clear()
+    assert layer.sync(positions, active, stages) == 0
+    assert canvas.calls == []
+
+    # Less than half a pixel isn't worth redrawing, a whole pixel is
+    positions[0] += 0.2
+    positions[2] += 1.0
+    assert layer.sync(positions, active, stages) == 1
+    assert canvas.calls == [('coords', 2)]
+
+    canvas.calls.clear()
+    active[2] = False
+    assert layer.sync(positions, active, stages) == 1
+    assert canvas.calls == [('hidden', 2)]
+
+    # More slots show up when the buffer grows
+    assert layer.sync(np.zeros((5, 2)), np.ones(5, dtype=bool), np.zeros(5, dtype=np.int64)) == 4
+    assert layer.created == 5
+
+def test_keys_go_to_the_input_queue():
+    pressed = {}
+    released = {}
+    queue = InputQueue()
+    bind_keys(queue, pressed.__setitem__, released.__setitem__)
+    assert set(pressed) == {'Right', 'Left', 'Up'}
+    assert set(released) == {'Right', 'Left', 'Up', 'space'}
+
+    # Tk passes an event and turtle doesn't, both work
+    pressed['Right']('event')
+    released['Right']()
+    pressed['Up']()
+    released['space']('event')
+    assert [(event.key, event.pressed) for event in queue.pending] == [
+        (RIGHT_KEY, True), (RIGHT_KEY, False), (UP_KEY, True), (SPACE_KEY, True)]
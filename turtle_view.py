@@ -0,0 +1,276 @@
+import turtle
+
+from simulation import BULLET_SPRITE_INFO, ASTEROID_INFO, WINDOW_WIDTH, WINDOW_HEIGHT
+from profiler import NULL_PROFILER
+from camera import Camera
+from governor import DrawSettings
+from view_layers import SlotLayer, bind_keys, player_state
+
+#
+#  This file draws a World (see simulation.py) with Python turtles.
+#
+#  The world does not know this file exists. We make a TurtleView for a world,
+#  and every frame we call draw() to make the turtles match what is in the world.
+#  If we don't make a view, the game still runs, there is just nothing to look at!
+#
+#  Only the part of the world the camera can see gets turtles moved for it (see camera.py).
+#
+
+#
+#  Turtle helpers ---------------------------------------------------------------------
+#
+
+# Adds a shape to turtles so it can be used later with turtle.shape
+def add_shape_to_turtle(game_window, coordinates, name):
+    #check lengths
+    shape = turtle.Shape('compound', None)
+    for i in range(len(coordinates)):
+        shape.addcomponent(coordinates[i], 'black', 'white')
+    game_window.register_shape(name, shape)
+    return shape
+
+def make_entity_turtle():
+    entity_turtle = turtle.Turtle()
+    entity_turtle.penup()
+    entity_turtle.speed(0)
+    entity_turtle.setundobuffer(None) # we never undo, so don't keep a history of every move
+    return entity_turtle
+
+def make_bullet_turtle():
+    bullet_turtle = make_entity_turtle()
+    bullet_turtle.ht()
+    bullet_turtle.shape(BULLET_SPRITE_INFO['name'])
+    return bullet_turtle
+
+def make_asteroid_turtle():
+    asteroid_turtle = make_entity_turtle()
+    asteroid_turtle.ht()
+    asteroid_turtle.shape('circle')
+    asteroid_turtle.color('white')
+    asteroid_turtle.fillcolor('black')
+    return asteroid_turtle
+
+def make_particle_turtle():
+    particle_turtle = make_entity_turtle()
+    particle_turtle.ht()
+    particle_turtle.shape('square')
+    particle_turtle.shapesize(0.15, 0.15)
+    particle_turtle.color('white')
+    return particle_turtle
+
+def make_text_turtle(x, y):
+    text_turtle = turtle.Turtle()
+    text_turtle.ht()
+    text_turtle.color('white')
+    text_turtle.penup()
+    text_turtle.goto(x, y)
+    return text_turtle
+
+def set_turtle_text(text, turtle):
+    turtle.clear()
+    turtle.write(text, align='left', font=('fixedsys', 15, 'normal'))
+
+#
+#  Only drawing what changed ------------------------------------------------------------
+#
+#  Every turtle command (goto, setheading, shape...) does a surprising amount of work,
+#  and game_window.update() redraws *every* turtle on the screen, even ones that haven't moved.
+#
+#  So a layer only sends commands to the turtles whose picture would actually change
+#  (see SlotLayer in view_layers.py), and adds them to a "dirty" list.
+#  At the end of the frame only the dirty turtles get redrawn.
+#  A shape is only registered the first time a turtle uses it.
+#
+
+# A group of turtles, one for each slot in a buffer of entities (the bullets or the asteroids)
+class SpriteLayer(SlotLayer):
+    def __init__(self, make_turtle, sizes=None):
+        super().__init__()
+        self.make_turtle = make_turtle
+        self.sizes = sizes # turtle size for each stage, or None if they are all the same size
+
+    # Makes the turtles match the entities, and adds the turtles that changed to dirty
+    def sync(self, positions, active, stages, dirty):
+        pixels, changed_slots = self.changes(positions, active, stages)
+        if len(changed_slots) == 0:
+            return
+
+        pixel_list = pixels[changed_slots].tolist()
+        for i, slot in enumerate(changed_slots.tolist()):
+            entity_turtle = self.picture(slot, self.make_turtle)
+            if not active[slot]:
+                entity_turtle.ht() #hide_turtle
+            else:
+                if self.sizes is not None and stages[slot] != self.drawn_stage[slot]:
+                    size = self.sizes[stages[slot]]
+                    entity_turtle.shapesize(size, size)
+                entity_turtle.goto(pixel_list[i][0], pixel_list[i][1])
+                if not self.drawn_visible[slot]:
+                    entity_turtle.st() #show_turtle
+            dirty.append(entity_turtle)
+
+        self.remember(changed_slots, pixels, active, stages)
+
+# A line of text on the screen that is only rewritten when the text changes
+class HudText:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.turtle = None
+        self.text = None
+
+    def set(self, text):
+        if text != self.text:
+            if self.turtle is None:
+                self.turtle = make_text_turtle(self.x, self.y)
+            set_turtle_text(text, self.turtle)
+            self.text = text
+
+#
+#  The Turtle View ---------------------------------------------------------------------
+#
+
+class TurtleView:
+    def __init__(self, world, input_queue):
+        self.world = world
+
+        # Initialize the Turtle Window
+        self.game_window = turtle.Screen()
+        self.game_window.listen()
+
+        # Register the key events (see view_layers.py)
+        bind_keys(input_queue,
+                  lambda name, function: self.game_window.onkeypress(function, name),
+                  lambda name, function: self.game_window.onkeyrelease(function, name))
+
+        # Our shapes get added to turtle the first time something uses them (see use_shape)
+        self.registered_shapes = set()
+
+        # Set the screen width, height, colour
+        turtle.setup(WINDOW_WIDTH, WINDOW_HEIGHT)
+        self.game_window.bgcolor('black')
+
+        # We will be updated the screen manually, so we turn off the screen's updates
+        self.game_window.tracer(0, 0)
+
+        # One turtle for the player, and one for every slot in the bullet and asteroid buffers,
+        # each made the first time it has something to show
+        self.player_turtle = None
+        self.drawn_player = None # (x pixel, y pixel, heading, shape) we last drew the player with
+
+        def make_bullet():
+            self.use_shape(BULLET_SPRITE_INFO)
+            return make_bullet_turtle()
+        self.bullet_layer = SpriteLayer(make_bullet)
+        self.asteroid_layer = SpriteLayer(make_asteroid_turtle, sizes=ASTEROID_INFO['turtle_sizes'])
+        # There are never more particle turtles than the particle budget (see particles.py)
+        self.particle_layer = SpriteLayer(make_particle_turtle)
+
+        # Initialize score and health drawers
+        self.score_text = HudText((-WINDOW_WIDTH / 2) + 20, WINDOW_HEIGHT / 2 - 30)
+        self.health_text = HudText((-WINDOW_WIDTH / 2) + 20, WINDOW_HEIGHT / 2 - 70)
+
+        # Follows the player around worlds bigger than the window
+        self.camera = Camera(WINDOW_WIDTH, WINDOW_HEIGHT)
+
+        # What we're allowed to draw, turned down when frames take too long (see governor.py)
+        self.settings = DrawSettings()
+        self.frames_drawn = 0
+
+        # The turtles that changed this frame and need redrawing
+        self.dirty = []
+        self.last_frame_redraws = 0
+
+    # Adds a sprite's shape to turtle, if it hasn't been already
+    def use_shape(self, sprite_info):
+        if sprite_info['name'] not in self.registered_shapes:
+            add_shape_to_turtle(self.game_window, sprite_info['coordinates'], sprite_info['name'])
+            self.registered_shapes.add(sprite_info['name'])
+
+    # How many turtles have been made so far
+    def turtle_count(self):
+        hud = [text for text in (self.score_text, self.health_text) if text.turtle is not None]
+        return (self.bullet_layer.created + self.asteroid_layer.created + self.particle_layer.created + len(hud)
+                + (self.player_turtle is not None))
+
+    # Closing the turtle window stops the program by itself, so this is never True
+    def is_closed(self):
+        return False
+
+    # Calls function when key is pressed and let go
+    def bind_key(self, key, function):
+        self.game_window.onkey(function, key)
+
+    def draw_player(self):
+        state, sprite = player_state(self.world, self.camera)
+        if state == self.drawn_player:
+            return
+        x, y, heading, shape = state
+        if self.player_turtle is None:
+            self.player_turtle = make_entity_turtle()
+        if self.drawn_player is None or shape != self.drawn_player[3]:
+            self.use_shape(sprite)
+            self.player_turtle.shape(shape)
+        self.player_turtle.goto(x, y)
+        self.player_turtle.setheading(heading)
+        self.drawn_player = state
+        self.dirty.append(self.player_turtle)
+
+    def draw_bullets(self):
+        bullet_buffer = self.world.bullet_buffer
+        positions, visible = self.camera.cull(self.world, bullet_buffer.position, bullet_buffer.radius,
+                                              bullet_buffer.active)
+        self.bullet_layer.sync(positions, visible, bullet_buffer.health, self.dirty)
+
+    def draw_asteroids(self):
+        asteroid_buffer = self.world.asteroid_buffer
+        positions, visible = self.camera.cull(self.world, asteroid_buffer.position, asteroid_buffer.radius,
+                                              asteroid_buffer.active)
+        visible = self.settings.asteroids_to_draw(visible, asteroid_buffer.health)
+        self.asteroid_layer.sync(positions, visible, asteroid_buffer.health, self.dirty)
+
+    def draw_particles(self):
+        particles = self.world.particles
+        if particles is None:
+            return
+        positions, visible = self.camera.cull(self.world, particles.position, particles.radius, particles.active)
+        visible = self.settings.particles_to_draw(visible)
+        self.particle_layer.sync(positions, visible, particles.kind, self.dirty)
+
+    # The score and health only get rewritten when they change,
+    # writing text is one of the slowest things a turtle can do.
+    # When frames are running long they are only looked at every settings.hud_every frames
+    def draw_hud(self):
+        if not self.settings.hud_due(self.frames_drawn):
+            return
+        self.score_text.set("SCORE: " + str(self.world.ScoreInfo.current_score))
+        self.health_text.set("HEALTH: " + str(self.world.main_player.health))
+
+    # Redraws only the dirty turtles, then lets Tk put it on the screen.
+    # This is what game_window.update() does, except update() redraws every turtle there is.
+    # Turtle doesn't have a public way to redraw just one turtle, so we borrow its own
+    # _drawturtle, the same way update() does
+    def flush(self):
+        game_window = self.game_window
+        tracing = game_window._tracing
+        game_window._tracing = True
+        for dirty_turtle in self.dirty:
+            dirty_turtle._drawturtle()
+        game_window._tracing = tracing
+        game_window._update() # this also handles any key presses
+        self.last_frame_redraws = len(self.dirty)
+        self.dirty.clear()
+
+    # Make all the turtles match the world, then draw the screen
+    def draw(self, profiler=NULL_PROFILER):
+        profiler.start()
+        self.camera.begin_frame(self.world)
+        self.draw_player()
+        self.draw_asteroids()
+        self.draw_bullets()
+        self.draw_particles()
+        self.draw_hud()
+        profiler.mark('draw')
+        self.flush()
+        profiler.mark('update')
+        self.frames_drawn += 1
@@ -0,0 +1,455 @@
+import argparse
+import time
+
+import numpy as np
+
+import simulation
+from simulation import WINDOW_WIDTH, WINDOW_HEIGHT, Player, vec2
+from spatial import swept_contact_times
+
+#
+#  Many worlds at once ------------------------------------------------------------------------
+#
+#  To train an agent to play, it has to play millions of steps. A World (see simulation.py) is
+#  quick, but it is still one world, stepped by Python, one step at a time.
+#
+#  A VectorEnv holds K worlds side by side in big NumPy arrays, one row per world:
+#
+#     asteroid_position[w, i] -> [x, y] of asteroid slot i in world w
+#     player_position[w]      -> [x, y] of the player in world w
+#     score[w]                -> the score in world w
+#
+#  so one step() moves all K worlds forward with a few dozen NumPy calls, no matter how big K is.
+#
+#  The rules are the same as in simulation.py (same speeds, radii, points, bullet recycling,
+#  invincibility, wrapping, new rounds) but it is its own code with its own random numbers,
+#  so it won't play out exactly the same as a World made with the same seed.
+#
+#  Collisions are swept along the step like in simulation.py, so a fast bullet can't jump over an
+#  asteroid here either. Two things are simpler, to keep every world in the same few array calls:
+#     - a bullet only gets its first asteroid. If another bullet breaks that one first, it carries on
+#       and can hit something from the next step on (a World lets it hit something later in the same step)
+#     - the pieces of a broken asteroid can only be hit by bullets from the next step on, and the player
+#       is checked against the asteroids that are left after the bullets, for the whole step
+#
+#  Using it:
+#     env = VectorEnv(1024, seed=1)
+#     observations = env.reset()
+#     while training:
+#         actions = agent(observations)          # shape (K, 3): rotate, thrust, shoot
+#         observations, rewards, dones = env.step(actions)
+#
+#  Actions, one row per world:
+#     rotate  -> 1 turns left, -1 turns right, 0 doesn't turn (like holding Left / Right)
+#     thrust  -> non zero accelerates (like holding Up)
+#     shoot   -> non zero fires one bullet this step (like pressing Space)
+#
+#  Rewards are how much the score went up this step. A world is done when its player runs out
+#  of health, or after max_ticks steps. Done worlds start a new game straight away, so the
+#  observation returned for them is the first one of the new game.
+#
+
+ROTATE_ACTION = 0 # columns of the actions array
+THRUST_ACTION = 1
+SHOOT_ACTION = 2
+
+STARTING_ASTEROIDS = 5 # asteroids at the start of the game and of every round
+SMALLEST_PIECES = 4 # a stage 3 asteroid can break into at most 4 stage 1 pieces
+
+# Positions and velocities are 32 bit floats. That's plenty for a 1200 by 800 screen,
+# and half as much memory to get through every step as normal (64 bit) floats
+FLOAT = np.float32
+
+# (axis, size of the screen along it) for x and y.
+# The functions below do x and y separately: NumPy is much quicker comparing a whole column
+# with one number than comparing [x, y] pairs with [width, height] pairs
+AXES = ((0, WINDOW_WIDTH), (1, WINDOW_HEIGHT))
+
+# What's in an observation, one row per world:
+#     player:     x, y, velocity x, velocity y, cos(rotation), sin(rotation), health, invincibility
+#     asteroids:  for every asteroid slot: x, y (from the player, the short way around the screen),
+#                 velocity x, velocity y, radius, active
+PLAYER_FEATURES = 8
+ASTEROID_FEATURES = 6
+
+# The same wrap as border_wrap_arrays in simulation.py
+def border_wrap(positions):
+    for axis, size in AXES:
+        column = positions[..., axis]
+        np.subtract(column, size, out=column, where=column > size / 2)
+        np.add(column, size, out=column, where=column < -size / 2)
+
+# The same as wrapped_delta in spatial.py, for arrays of any shape ending in [x, y]
+def wrapped_difference(a, b):
+    delta = a - b
+    for axis, size in AXES:
+        column = delta[..., axis]
+        np.subtract(column, size, out=column, where=column > size / 2)
+        np.add(column, size, out=column, where=column < -size / 2)
+    return delta
+
+# The squared distance between a and b the short way around the screen.
+# Everything is always on the screen, so each side is at most one screen apart, and the short way
+# is whichever of |dx| and WINDOW_WIDTH - |dx| is smaller. That's a lot cheaper than wrapped_difference
+def wrapped_distance_squared(a, b):
+    # Copying the x's and y's out first is quicker than reading them from every other float
+    dx = np.ascontiguousarray(a[..., 0]) - np.ascontiguousarray(b[..., 0])
+    np.abs(dx, out=dx)
+    np.minimum(dx, WINDOW_WIDTH - dx, out=dx)
+    dy = np.ascontiguousarray(a[..., 1]) - np.ascontiguousarray(b[..., 1])
+    np.abs(dy, out=dy)
+    np.minimum(dy, WINDOW_HEIGHT - dy, out=dy)
+    dx *= dx
+    dy *= dy
+    dx += dy
+    return dx
+
+class VectorEnv:
+    def __init__(self, num_worlds, seed=None, delta_time=1 / 60, max_ticks=60 * 60 * 5,
+                 bullet_capacity=None):
+        self.num_worlds = num_worlds
+        self.delta_time = delta_time
+        self.max_ticks = max_ticks
+        self.rng = np.random.default_rng(seed)
+
+        # Every world gets the same player settings as the single player game
+        player = Player(health=3, position=vec2(0.0, 0.0), velocity=vec2(0.0, 0.0))
+        self.starting_health = player.health
+        self.player_radius = player.radius
+        self.rotation_speed = player.ROTATION_SPEED
+        self.acceleration_speed = player.ACCELERATION_SPEED
+        self.bullet_radius = 2.0
+
+        # Look up the game's numbers when the env is made, so batch.py style overrides still work
+        # Index 0 of every table is stage 0, which no asteroid has
+        self.bullet_speed = simulation.BULLET_SPEED
+        if bullet_capacity is None:
+            bullet_capacity = simulation.BULLET_BUFFER_SIZE
+        info = simulation.ASTEROID_INFO
+        self.asteroid_speeds = np.array([0.0 if speed is None else speed for speed in info['speeds']])
+        self.asteroid_radii = np.array([0.0 if radius is None else radius for radius in info['radii']], dtype=FLOAT)
+        self.asteroid_points = np.array([0 if points is None else points for points in info['points']])
+
+        # Asteroids only ever split, so a round never has more than this many at once
+        asteroid_capacity = STARTING_ASTEROIDS * SMALLEST_PIECES
+        self.asteroid_capacity = asteroid_capacity
+        self.bullet_capacity = bullet_capacity
+
+        K = num_worlds
+        self.player_position = np.zeros((K, 2), dtype=FLOAT)
+        self.player_velocity = np.zeros((K, 2), dtype=FLOAT)
+        self.player_rotation = np.zeros(K, dtype=FLOAT)
+        self.player_health = np.zeros(K, dtype=np.int64)
+        self.invincibility = np.zeros(K, dtype=FLOAT)
+
+        self.asteroid_position = np.zeros((K, asteroid_capacity, 2), dtype=FLOAT)
+        self.asteroid_velocity = np.zeros((K, asteroid_capacity, 2), dtype=FLOAT)
+        self.asteroid_stage = np.zeros((K, asteroid_capacity), dtype=np.int64)
+        self.asteroid_active = np.zeros((K, asteroid_capacity), dtype=bool)
+
+        self.bullet_position = np.zeros((K, bullet_capacity, 2), dtype=FLOAT)
+        self.bullet_velocity = np.zeros((K, bullet_capacity, 2), dtype=FLOAT)
+        self.bullet_active = np.zeros((K, bullet_capacity), dtype=bool)
+        # The tick each bullet was shot on, so when all of them are flying we can reuse the oldest
+        self.bullet_shot_tick = np.zeros((K, bullet_capacity), dtype=np.int64)
+
+        self.score = np.zeros(K, dtype=np.int64)
+        self.tick = np.zeros(K, dtype=np.int64)
+        self.total_ticks = 0
+        self.rounds_cleared = np.zeros(K, dtype=np.int64)
+
+        # Scores of the games that finished in the last step (the worlds were reset, so they'd be lost)
+        self.final_score = np.zeros(K, dtype=np.int64)
+
+        # The observations are written into the same array every step, copy them to keep them
+        self.observations = np.zeros((K, PLAYER_FEATURES + ASTEROID_FEATURES * asteroid_capacity),
+                                     dtype=np.float32)
+
+    @property
+    def observation_size(self):
+        return self.observations.shape[1]
+
+    # Random values between -scale and scale, like random_vec2_component_length in simulation.py
+    def random_components(self, shape, scale):
+        return (self.rng.random(shape + (2,)) - 0.5) * 2.0 * np.asarray(scale)[..., None]
+
+    # Starts a new game in the worlds where mask is True (every world if mask is None)
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.num_worlds, dtype=bool)
+        worlds = np.flatnonzero(mask)
+        count = len(worlds)
+        if count > 0:
+            self.player_position[worlds] = 0.0
+            self.player_velocity[worlds] = 0.0
+            self.player_rotation[worlds] = 0.0
+            self.player_health[worlds] = self.starting_health
+            self.invincibility[worlds] = 0.0
+            self.score[worlds] = 0
+            self.tick[worlds] = 0
+            self.rounds_cleared[worlds] = 0
+            self.bullet_active[worlds] = False
+
+            # The first asteroids of a game can be anywhere, and move slowly (like in World)
+            self.empty_asteroid_slots(worlds)
+            self.asteroid_active[worlds, :STARTING_ASTEROIDS] = True
+            self.asteroid_stage[worlds, :STARTING_ASTEROIDS] = 3
+            self.asteroid_position[worlds, :STARTING_ASTEROIDS] = self.random_components((count, STARTING_ASTEROIDS), 300)
+            self.asteroid_velocity[worlds, :STARTING_ASTEROIDS] = self.random_components((count, STARTING_ASTEROIDS), 30)
+        return self.observe()
+
+    def empty_asteroid_slots(self, worlds):
+        self.asteroid_active[worlds] = False
+        self.asteroid_stage[worlds] = 0
+        self.asteroid_velocity[worlds] = 0.0
+
+    # Every asteroid is gone in these worlds: clear the bullets and make new asteroids away from the player
+    def new_round(self, worlds):
+        count = len(worlds)
+        self.rounds_cleared[worlds] += 1
+        self.bullet_active[worlds] = False
+
+        positions = self.random_components((count, STARTING_ASTEROIDS), 300)
+        player_positions = self.player_position[worlds][:, None, :]
+        # Keep picking new spots for the ones that are too close to the player (like reset_round)
+        too_close = ((positions - player_positions) ** 2).sum(axis=2) < 300 ** 2
+        while too_close.any():
+            positions[too_close] = self.random_components((np.count_nonzero(too_close),), 300)
+            too_close = ((positions - player_positions) ** 2).sum(axis=2) < 300 ** 2
+
+        self.empty_asteroid_slots(worlds)
+        self.asteroid_active[worlds, :STARTING_ASTEROIDS] = True
+        self.asteroid_stage[worlds, :STARTING_ASTEROIDS] = 3
+        self.asteroid_position[worlds, :STARTING_ASTEROIDS] = positions
+        self.asteroid_velocity[worlds, :STARTING_ASTEROIDS] = self.random_components(
+            (count, STARTING_ASTEROIDS), self.asteroid_speeds[3])
+
+    #
+    #  One step of every world --------------------------------------------------------
+    #
+
+    def shoot(self, shooting):
+        worlds = np.flatnonzero(shooting)
+        if len(worlds) == 0:
+            return
+        # The first free bullet slot, or the oldest bullet if they are all flying
+        active = self.bullet_active[worlds]
+        age_order = np.where(active, self.bullet_shot_tick[worlds], np.iinfo(np.int64).min)
+        slots = np.argmin(age_order, axis=1)
+
+        direction = np.stack([np.cos(np.radians(self.player_rotation[worlds])),
+                              np.sin(np.radians(self.player_rotation[worlds]))], axis=1)
+        self.bullet_position[worlds, slots] = self.player_position[worlds]
+        self.bullet_velocity[worlds, slots] = direction * self.bullet_speed
+        self.bullet_active[worlds, slots] = True
+        self.bullet_shot_tick[worlds, slots] = self.total_ticks
+
+    def apply_actions(self, actions):
+        actions = np.asarray(actions)
+        delta_time = self.delta_time
+
+        # Shots first, with the rotation from before this step (like process_inputs)
+        self.shoot(actions[:, SHOOT_ACTION] != 0)
+
+        self.player_rotation += np.sign(actions[:, ROTATE_ACTION]) * self.rotation_speed * delta_time
+
+        thrust = (actions[:, THRUST_ACTION] != 0) * (self.acceleration_speed * delta_time)
+        radians = np.radians(self.player_rotation)
+        self.player_velocity[:, 0] += np.cos(radians) * thrust
+        self.player_velocity[:, 1] += np.sin(radians) * thrust
+
+    # How fast the fastest asteroid in each world is going, like fastest_speed in simulation.py.
+    # The speeds table can't be used for this: each part of a velocity is up to the stage's speed
+    # on its own (see random_components), so together they can be √2 times as fast
+    def fastest_asteroid_speeds(self):
+        speeds_squared = np.einsum('kaj,kaj->ka', self.asteroid_velocity, self.asteroid_velocity)
+        speeds_squared[~self.asteroid_active] = 0.0
+        return np.sqrt(speeds_squared.max(axis=1))
+
+    def handle_bullet_asteroid_collisions(self):
+        # Every bullet against every asteroid in every world: (K, bullets, asteroids)
+        # There are only a few of each per world, so this is less work than a grid would be
+        distance_squared = wrapped_distance_squared(self.bullet_position[:, :, None, :],
+                                                    self.asteroid_position[:, None, :, :])
+        touching = self.bullet_radius + self.asteroid_radii[self.asteroid_stage]
+        # Only pairs this close at the start of the step can touch by the end of it.
+        # Empty asteroid slots get a reach of -1, which nothing is closer than
+        fastest_approach = self.bullet_speed + self.fastest_asteroid_speeds()
+        reach = np.where(self.asteroid_active, touching + (fastest_approach * self.delta_time)[:, None], -1)
+        near = (distance_squared < (reach * np.abs(reach))[:, None, :]) & self.bullet_active[:, :, None]
+        near_worlds, bullets, asteroids = np.nonzero(near)
+        if len(near_worlds) == 0:
+            return
+
+        # Sweep just those pairs along the step, in only the worlds they are in
+        worlds, row = np.unique(near_worlds, return_inverse=True)
+        delta = wrapped_difference(self.asteroid_position[near_worlds, asteroids], self.bullet_position[near_worlds, bullets])
+        relative_velocity = self.asteroid_velocity[near_worlds, asteroids] - self.bullet_velocity[near_worlds, bullets]
+        times = np.full((len(worlds),) + near.shape[1:], np.inf, dtype=FLOAT)
+        times[row, bullets, asteroids] = swept_contact_times(delta, relative_velocity,
+                                                             touching[near_worlds, asteroids], self.delta_time)
+
+        # Like in simulation.py, each bullet is used up on the first asteroid it reaches,
+        # and each asteroid is broken by the first bullet to reach it (all of them, if they reach it together)
+        times[times > times.min(axis=2, keepdims=True)] = np.inf
+        first_hit = np.zeros(self.asteroid_active.shape, dtype=FLOAT)
+        first_hit[worlds] = times.min(axis=1)
+        hits = (times < np.inf) & (times == first_hit[worlds][:, None, :])
+
+        destroyed = np.zeros(self.asteroid_active.shape, dtype=bool)
+        destroyed[worlds] = hits.any(axis=1)
+        self.bullet_active[worlds] &= ~hits.any(axis=2)
+        if not destroyed.any():
+            return
+        self.asteroid_active &= ~destroyed
+
+        self.score += np.where(destroyed, self.asteroid_points[self.asteroid_stage], 0).sum(axis=1)
+
+        # Empty out the slots of the small ones, they don't split
+        gone_worlds, gone_slots = np.nonzero(destroyed & (self.asteroid_stage < 2))
+        self.asteroid_stage[gone_worlds, gone_slots] = 0
+        self.asteroid_velocity[gone_worlds, gone_slots] = 0.0
+
+        # Big and medium asteroids split in two.
+        # The first piece goes in the slot the asteroid was in, the second in the first free slot
+        splitting = destroyed & (self.asteroid_stage >= 2)
+        worlds, slots = np.nonzero(splitting)
+        if len(worlds) > 0:
+            stages = self.asteroid_stage[worlds, slots]
+            # Where each one was when it got hit
+            hit_times = first_hit[worlds, slots][:, None]
+            positions = self.asteroid_position[worlds, slots] + self.asteroid_velocity[worlds, slots] * hit_times
+            self.asteroid_active[worlds, slots] = True
+
+            # Number the splitting asteroids within each world (0, 1, 2...) and give
+            # each one the free slot with the same number. Stable argsort puts the free slots first
+            # Only the worlds with something splitting need sorting
+            split_worlds, row = np.unique(worlds, return_inverse=True)
+            free_slots = np.argsort(self.asteroid_active[split_worlds], axis=1, kind='stable')
+            counts = np.cumsum(splitting[split_worlds], axis=1) - 1
+            second_slots = free_slots[row, counts[row, slots]]
+            self.asteroid_active[worlds, second_slots] = True
+
+            for piece_slots in (slots, second_slots):
+                velocities = self.random_components((len(worlds),), self.asteroid_speeds[stages])
+                self.asteroid_stage[worlds, piece_slots] = stages - 1
+                # Started back where they'd be at the start of the step, like in simulation.py
+                self.asteroid_position[worlds, piece_slots] = positions - velocities * hit_times
+                self.asteroid_velocity[worlds, piece_slots] = velocities
+
+        cleared = np.flatnonzero(~self.asteroid_active.any(axis=1))
+        if len(cleared) > 0:
+            self.new_round(cleared)
+
+    def check_player_collisions(self):
+        # Only the asteroids this close at the start of the step can touch the player by the end of it
+        distance_squared = wrapped_distance_squared(self.asteroid_position, self.player_position[:, None, :])
+        player_speed = np.hypot(self.player_velocity[:, 0], self.player_velocity[:, 1])
+        touching = self.asteroid_radii[self.asteroid_stage] + self.player_radius
+        reach = touching + ((player_speed + self.fastest_asteroid_speeds()) * self.delta_time)[:, None]
+        # Hits while the player is still invincible don't count, so only look from when that runs out
+        start = np.maximum(self.invincibility, 0.0)
+        near = (distance_squared < reach * reach) & self.asteroid_active & (start < self.delta_time)[:, None]
+        worlds, asteroids = np.nonzero(near)
+        if len(worlds) == 0:
+            return
+
+        # Sweep just those pairs along what's left of the step after the invincibility
+        start = start[worlds]
+        player_position = self.player_position[worlds] + self.player_velocity[worlds] * start[:, None]
+        asteroid_position = self.asteroid_position[worlds, asteroids] + self.asteroid_velocity[worlds, asteroids] * start[:, None]
+        delta = wrapped_difference(asteroid_position, player_position)
+        relative_velocity = self.asteroid_velocity[worlds, asteroids] - self.player_velocity[worlds]
+        times = np.full(near.shape, np.inf, dtype=FLOAT)
+        times[worlds, asteroids] = swept_contact_times(delta, relative_velocity, touching[worlds, asteroids],
+                                                       self.delta_time - start) + start
+
+        # Every asteroid touching the player at the first hit takes away one health.
+        # After that the player is invincible, so any others this step don't count
+        first_hit = times.min(axis=1)
+        hit = first_hit < np.inf
+        hit_count = np.count_nonzero(times == first_hit[:, None], axis=1)
+        self.player_health -= np.where(hit, hit_count, 0)
+        # seconds of invincibility, counted from the moment of the hit
+        self.invincibility[hit] = 5.00 + first_hit[hit]
+
+    def move(self):
+        delta_time = self.delta_time
+        self.player_position += self.player_velocity * delta_time
+        border_wrap(self.player_position)
+
+        # Inactive slots move too, nobody looks at them and it's cheaper than skipping them
+        self.asteroid_position += self.asteroid_velocity * delta_time
+        border_wrap(self.asteroid_position)
+        self.bullet_position += self.bullet_velocity * delta_time
+        border_wrap(self.bullet_position)
+
+    # Moves every world forward by one step. Returns (observations, rewards, dones)
+    def step(self, actions):
+        previous_score = self.score.copy()
+
+        self.apply_actions(actions)
+        self.handle_bullet_asteroid_collisions()
+        self.check_player_collisions()
+        self.move()
+        np.subtract(self.invincibility, self.delta_time, out=self.invincibility, where=self.invincibility > 0.0)
+        self.tick += 1
+        self.total_ticks += 1
+
+        rewards = (self.score - previous_score).astype(np.float32)
+        dones = (self.player_health <= 0) | (self.tick >= self.max_ticks)
+        self.final_score[dones] = self.score[dones]
+        if dones.any():
+            self.reset(dones)
+        else:
+            self.observe()
+        return self.observations, rewards, dones
+
+    def observe(self):
+        observations = self.observations
+        K = self.num_worlds
+        radians = np.radians(self.player_rotation)
+        observations[:, 0:2] = self.player_position
+        observations[:, 2:4] = self.player_velocity
+        observations[:, 4] = np.cos(radians)
+        observations[:, 5] = np.sin(radians)
+        observations[:, 6] = self.player_health
+        observations[:, 7] = self.invincibility
+
+        asteroids = observations[:, PLAYER_FEATURES:].reshape(K, self.asteroid_capacity, ASTEROID_FEATURES)
+        active = self.asteroid_active
+        # Empty slots always have stage 0 and no velocity, so only their position needs zeroing
+        offsets = wrapped_difference(self.asteroid_position, self.player_position[:, None, :])
+        offsets *= active[:, :, None]
+        asteroids[:, :, 0:2] = offsets
+        asteroids[:, :, 2:4] = self.asteroid_velocity
+        asteroids[:, :, 4] = self.asteroid_radii[self.asteroid_stage]
+        asteroids[:, :, 5] = active
+        return observations
+
+# Runs random actions through a VectorEnv and prints how many world-steps a second it manages
+def __main__():
+    parser = argparse.ArgumentParser(description='Time the multi-world environment with random actions')
+    parser.add_argument('--worlds', type=int, default=4096)
+    parser.add_argument('--steps', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    env = VectorEnv(args.worlds, seed=args.seed)
+    env.reset()
+    rng = np.random.default_rng(args.seed)
+    actions = np.zeros((args.worlds, 3), dtype=np.int8)
+    games = 0
+    start = time.perf_counter()
+    for i in range(args.steps):
+        actions[:, ROTATE_ACTION] = rng.integers(-1, 2, args.worlds)
+        actions[:, THRUST_ACTION] = rng.random(args.worlds) < 0.3
+        actions[:, SHOOT_ACTION] = rng.random(args.worlds) < 0.1
+        observations, rewards, dones = env.step(actions)
+        games += np.count_nonzero(dones)
+    elapsed = time.perf_counter() - start
+    print(args.worlds, 'worlds x', args.steps, 'steps in', round(elapsed, 3), 'seconds:',
+          round(args.worlds * args.steps / elapsed), 'world-steps/s,', games, 'games finished')
+
+if __name__ == '__main__':
+    __main__()
@@ -0,0 +1,119 @@
+import numpy as np
+
+from simulation import RIGHT_KEY, LEFT_KEY, UP_KEY, SPACE_KEY, player_sprite_info
+
+#
+#  The parts of drawing a World that don't care what it is drawn with.
+#
+#  The turtle view (turtle_view.py) and the canvas view (canvas_view.py) draw the same things
+#  in the same way, they just make different kinds of pictures: a turtle each, or a canvas item each.
+#  What they both need lives here:
+#     - SlotLayer remembers what was last drawn for every slot of a buffer, and works out which slots changed
+#     - bind_keys sends the arrow keys and space to the input queue
+#     - player_state is what the player looks like this frame, from where the camera is
+#
+
+#
+#  Only drawing what changed ------------------------------------------------------------
+#
+#  Every picture we touch (a turtle's goto, a canvas item's coords...) costs a surprising amount,
+#  so we remember what we last drew for each slot: which pixel it was on, which stage it was,
+#  and whether it was showing. Each frame we compare all of that against the buffer at once
+#  with NumPy, and only the slots that come out different get touched.
+#
+#     slot          0      1      2      3
+#     drawn       (3,4)  (9,1)  hidden (5,5)
+#     now         (3,4)  (9,2)  hidden  gone
+#     changed       .      X      .      X     <- only these get their picture updated
+#
+#  Making a picture is slow too, and most asteroid slots are empty for most of the game.
+#  So a slot only gets its picture the first time something in it is shown. The window opens
+#  just as fast with 50 asteroid slots as with 5000.
+#
+
+# What was drawn for each slot in a buffer of entities (the bullets, the asteroids or the particles)
+# The turtle view's SpriteLayer and the canvas view's CanvasLayer build on this, and say how to
+# make, move, show and hide one picture
+class SlotLayer:
+    def __init__(self):
+        self.pictures = [] # None for slots that have never been shown
+        self.created = 0
+
+        self.drawn_pixels = np.zeros((0, 2))
+        self.drawn_visible = np.zeros(0, dtype=bool)
+        self.drawn_stage = np.zeros(0, dtype=np.int64)
+
+    # Makes room for `count` slots. The pictures themselves get made when they are first shown
+    # The asteroid buffer can grow while the game runs, so this is checked every frame
+    def grow(self, count):
+        extra = count - len(self.pictures)
+        if extra <= 0:
+            return
+        self.pictures.extend([None] * extra)
+        self.drawn_pixels = np.concatenate([self.drawn_pixels, np.zeros((extra, 2))])
+        self.drawn_visible = np.concatenate([self.drawn_visible, np.zeros(extra, dtype=bool)])
+        self.drawn_stage = np.concatenate([self.drawn_stage, np.full(extra, -1, dtype=np.int64)])
+
+    # The picture for a slot, made if this is the first time it is needed
+    def picture(self, slot, make_picture):
+        picture = self.pictures[slot]
+        if picture is None:
+            picture = self.pictures[slot] = make_picture()
+            self.created += 1
+        return picture
+
+    # Returns the pixel every slot is on now, and the slots whose picture needs updating
+    def changes(self, positions, active, stages):
+        self.grow(len(active))
+        pixels = np.rint(positions)
+        changed = (active != self.drawn_visible) | (
+            active & ((pixels != self.drawn_pixels).any(axis=1) | (stages != self.drawn_stage)))
+        return pixels, np.flatnonzero(changed)
+
+    # Call once the changed slots have been drawn
+    def remember(self, changed_slots, pixels, active, stages):
+        self.drawn_visible[changed_slots] = active[changed_slots]
+        self.drawn_pixels[changed_slots] = pixels[changed_slots]
+        self.drawn_stage[changed_slots] = stages[changed_slots]
+
+#
+#  Keys ----------------------------------------------------------------------------------
+#
+#  The keys only go into the input queue (see inputs.py), the world gets them at the start of its next step.
+#  Tk hands its key functions an event and turtle hands them nothing, so these take either.
+#
+#  bind_press(name, function) and bind_release(name, function) do the binding itself,
+#  with Tk's key names ('Right', 'space'...), which turtle uses too.
+#
+
+HELD_KEYS = [('Right', RIGHT_KEY), ('Left', LEFT_KEY), ('Up', UP_KEY)]
+
+def bind_keys(input_queue, bind_press, bind_release):
+    def press(key):
+        def on_press(*event):
+            input_queue.push(key, True)
+        return on_press
+    def release(key):
+        def on_release(*event):
+            input_queue.push(key, False)
+        return on_release
+    def Space(*event):
+        input_queue.push(SPACE_KEY, True)
+
+    for name, key in HELD_KEYS:
+        bind_press(name, press(key))
+        bind_release(name, release(key))
+    # Shots go off when space is let go, so holding it down doesn't fire over and over
+    bind_release('space', Space)
+
+#
+#  The player ----------------------------------------------------------------------------
+#
+
+# (x pixel, y pixel, heading, sprite name) the player should be drawn with, and its sprite
+# Views keep the last state they drew and skip the player when it comes out the same
+def player_state(world, camera):
+    main_player = world.main_player
+    sprite = player_sprite_info(world)
+    x, y = camera.view_point(world, main_player.position.x, main_player.position.y)
+    return (round(x), round(y), round(main_player.rotation), sprite['name']), sprite